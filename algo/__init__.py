@@ -0,0 +1,6 @@
+"""
+Алгоритмы без GUI: граф, поиск Дейкстры, arc_flags, чтение и запись графов.
+Импорт пакета не загружает Qt и pyqtgraph. NumPy, SciPy и multiprocessing загружаются при первом использовании
+(массивы algo.graph_io, предобработка 'sparse', algo.shared_graph и algo.service) -
+проверяется scripts/startup_benchmark.py
+"""
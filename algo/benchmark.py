@@ -0,0 +1,457 @@
+"""
+Замеры производительности запросов и предобработки arc_flags.
+
+Перебираются графы, количество регионов K, режим поиска (однонаправленный / двунаправленный)
+и использование arc_flags. Для каждой комбинации выполняется один и тот же набор случайных
+запросов (s, t), набор определяется зерном seed.
+"""
+from __future__ import annotations
+
+import csv
+import json
+import math
+import random
+import statistics
+import time
+import tracemalloc
+from functools import partial
+from typing import Callable, Iterable
+
+from algo.dijkstra.arc_flags import arc_flags_preprocessing
+from algo.dijkstra.dijkstra import dijkstra
+from algo.dijkstra.dijkstra_bidirectional import dijkstra_bidirectional
+from algo.dijkstra.dijkstra_unidirectional import dijkstra_unidirectional
+from algo.dijkstra.region_view import build_region_views, hottest_regions
+from algo.dijkstra.structures import QueryStats, CancellationToken
+from algo.graph import Graph
+from algo.graph_io import GraphData
+from algo.workload import Query
+
+# Режимы поиска: название -> функция запроса (graph, start, end, arc_flags, *, stats) -> (distance, path, count_op)
+QUERY_MODES: dict[str, Callable] = {
+    'unidirectional': dijkstra_unidirectional,
+    'bidirectional': dijkstra_bidirectional,
+    # однонаправленный с отсечением по нижним оценкам расстояний между регионами (Graph.region_bounds)
+    'unidirectional_bounds': partial(dijkstra_unidirectional, bounds=True),
+    # то же без отсечения по оценкам: только остановка, когда расстояние до конечной вершины окончательное
+    'unidirectional_early_stop': partial(dijkstra_unidirectional, early_stop=True),
+}
+
+# Колонки таблицы результатов (в этом порядке пишутся в CSV)
+RESULT_FIELDS = [
+    'graph', 'vertices', 'edges', 'k', 'mode', 'arc_flags', 'queries', 'found',
+    'time_mean', 'time_p50', 'time_p95', 'time_max',
+    'relaxed_mean', 'settled_mean', 'pruned_mean', 'stale_pops_mean', 'bound_pruned_mean',
+    'preprocessing_time', 'preprocessing_memory', 'preprocessing_backend', 'kind', 'rank', 'speedup',
+    'region_views', 'region_views_memory', 'region_views_time', 'region_views_coverage',
+]
+
+# По этим колонкам совпадают строки двух запусков при сравнении
+KEY_FIELDS = ('graph', 'k', 'mode', 'arc_flags', 'kind', 'rank', 'region_views')
+
+# Режим, относительно которого считается ускорение (колонка speedup): обычный алгоритм Дейкстры
+BASELINE_MODE = ('unidirectional', False)
+
+
+def random_queries(vertex_count: int, count: int, seed: int | None = None) -> list[tuple[int, int]]:
+    """ Набор случайных запросов (индекс начала, индекс конца), одинаковый при одинаковом seed """
+    rnd = random.Random(seed)
+    return [(rnd.randrange(vertex_count), rnd.randrange(vertex_count)) for _ in range(count)]
+
+
+def percentile(values: list[float], q: float) -> float:
+    """ Перцентиль q (от 0 до 100) по методу ближайшего ранга """
+    if not values:
+        return math.nan
+    ordered = sorted(values)
+    rank = max(0, math.ceil(q / 100 * len(ordered)) - 1)
+    return ordered[rank]
+
+
+def measure_preprocessing(graph: Graph, measure_memory: bool = True,
+                          cancel: CancellationToken | None = None,
+                          backend: str = 'python',
+                          workers: int = 1) -> tuple[float, int | None]:
+    """
+    Выполнить предобработку arc_flags и замерить ее
+    :param graph: граф, флаги ребер которого будут выставлены
+    :param measure_memory: дополнительно замерить пиковую память (отдельным прогоном под tracemalloc,
+    чтобы трассировка не искажала время)
+    :param cancel: признак отмены (при отмене - исключение PreprocessingCancelled)
+    :param backend: способ предобработки (arc_flags.PREPROCESSING_BACKENDS)
+    :param workers: количество процессов (больше 1 - только для 'sparse')
+    :return: время предобработки в секундах, пиковая выделенная память в байтах (None если не замерялась)
+    """
+    cancelled = (lambda: cancel.cancelled) if cancel is not None else None
+    t0 = time.perf_counter()
+    arc_flags_preprocessing(graph, cancelled=cancelled, backend=backend, workers=workers)
+    elapsed = time.perf_counter() - t0
+
+    peak = None
+    if measure_memory:
+        tracemalloc.start()
+        try:
+            arc_flags_preprocessing(graph, cancelled=cancelled, backend=backend, workers=workers)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return elapsed, peak
+
+
+def measure_region_views(graph: Graph, targets: list[int], count: int) -> dict:
+    """
+    Построить представления регионов (algo.dijkstra.region_view) для count самых популярных регионов
+    среди конечных вершин запросов и замерить их
+    :return: словарь с колонками region_views, region_views_memory (байты), region_views_time (секунды)
+    и region_views_coverage (доля запросов, регион конца которых получил представление)
+    """
+    regions = hottest_regions(graph, targets, count)
+    t0 = time.perf_counter()
+    memory = build_region_views(graph, regions)
+    elapsed = time.perf_counter() - t0
+    covered = sum(graph.vertex_at(t).k in graph.region_views for t in targets)
+    return {
+        'region_views': count,
+        'region_views_memory': memory,
+        'region_views_time': elapsed,
+        'region_views_coverage': covered / len(targets) if targets else math.nan,
+    }
+
+
+def run_queries(graph: Graph, queries: Iterable[tuple[int, ...]], mode: str, arc_flags: bool,
+                cancel: CancellationToken | None = None) -> dict:
+    """
+    Выполнить набор запросов одним режимом и собрать статистику
+    :param queries: пары (индекс начала, индекс конца) или запросы Query из algo.workload
+    :param cancel: признак отмены (при отмене - исключение QueryCancelled)
+    :return: словарь с колонками found, queries, time_*, relaxed_mean, settled_mean, pruned_mean, stale_pops_mean,
+    bound_pruned_mean
+    """
+    query = QUERY_MODES[mode]
+    times: list[float] = []
+    stats_list: list[QueryStats] = []
+    found = 0
+    for s, t, *_ in queries:
+        start, end = graph.vertex_at(s), graph.vertex_at(t)
+        stats = QueryStats()
+        t0 = time.perf_counter()
+        distance, path, count_op = query(graph, start, end, arc_flags=arc_flags, stats=stats, cancel=cancel)
+        times.append(time.perf_counter() - t0)
+        stats_list.append(stats)
+        found += distance != float('inf')
+
+    def mean(attribute: str) -> float:
+        return statistics.fmean(getattr(stats, attribute) for stats in stats_list) if stats_list else math.nan
+
+    return {
+        'queries': len(times),
+        'found': found,
+        'time_mean': statistics.fmean(times) if times else math.nan,
+        'time_p50': percentile(times, 50),
+        'time_p95': percentile(times, 95),
+        'time_max': max(times, default=math.nan),
+        'relaxed_mean': mean('relaxed'),
+        'settled_mean': mean('settled'),
+        'pruned_mean': mean('pruned'),
+        'stale_pops_mean': mean('stale_pops'),
+        'bound_pruned_mean': mean('bound_pruned'),
+    }
+
+
+def run_benchmark(graphs: dict[str, GraphData],
+                  ks: Iterable[int],
+                  modes: Iterable[str] = tuple(QUERY_MODES),
+                  arc_flags_options: Iterable[bool] = (False, True),
+                  queries_count: int = 100,
+                  seed: int | None = 0,
+                  measure_memory: bool = True,
+                  progress: Callable[[str], None] | None = None,
+                  queries: list[tuple[int, int]] | None = None,
+                  cancel: CancellationToken | None = None,
+                  region_views: Iterable[int] = (),
+                  backend: str = 'python') -> list[dict]:
+    """
+    Перебор всех комбинаций параметров
+    :param graphs: графы по названиям (регионы в них переназначаются для каждого K)
+    :param ks: количества регионов (None - оставить регионы графа как есть)
+    :param modes: режимы поиска из QUERY_MODES
+    :param arc_flags_options: использовать arc_flags или нет
+    :param queries_count: количество случайных запросов на каждую комбинацию
+    :param seed: зерно набора запросов (для каждого графа набор один и тот же при всех K и режимах)
+    :param measure_memory: замерять пиковую память предобработки
+    :param progress: функция для вывода хода выполнения (например, print)
+    :param queries: заданные пары (индекс начала, индекс конца) вместо случайных
+    :param cancel: признак отмены (при отмене - исключение QueryCancelled или PreprocessingCancelled)
+    :param region_views: количества самых популярных регионов, для которых строятся отфильтрованные
+    списки смежности (для каждого количества - дополнительные строки с arc_flags и памятью представлений)
+    :param backend: способ предобработки arc_flags (arc_flags.PREPROCESSING_BACKENDS)
+    :return: строки результатов с колонками RESULT_FIELDS
+    """
+    from algo.partition import assign_regions  # NumPy - только при замерах
+
+    modes, arc_flags_options, region_views = list(modes), list(arc_flags_options), list(region_views)
+    rows = []
+    for name, data in graphs.items():
+        graph_queries = queries if queries is not None else random_queries(data.vertex_count, queries_count, seed)
+        for k in ks:
+            if k is None:
+                graph, k = data.to_graph(), data.k
+            else:
+                graph = GraphData(pos=data.pos, adj=data.adj, regions=assign_regions(data.pos, k),
+                                  texts=data.texts, edge_ids=data.edge_ids).to_graph(k)
+            preprocessing_time, preprocessing_memory = None, None
+            if True in arc_flags_options:
+                if progress:
+                    progress(f"{name}: предобработка arc_flags, K={k}")
+                preprocessing_time, preprocessing_memory = measure_preprocessing(graph, measure_memory, cancel,
+                                                                                 backend)
+
+            for mode in modes:
+                for arc_flags in arc_flags_options:
+                    if progress:
+                        progress(f"{name}: K={k}, {mode}, arc_flags={arc_flags}")
+                    row = {
+                        'graph': name,
+                        'vertices': graph.vertex_count,
+                        'edges': graph.edges_count,
+                        'k': k,
+                        'mode': mode,
+                        'arc_flags': arc_flags,
+                        'preprocessing_time': preprocessing_time,
+                        'preprocessing_memory': preprocessing_memory,
+                        'preprocessing_backend': backend if preprocessing_time is not None else None,
+                    }
+                    row |= run_queries(graph, graph_queries, mode, arc_flags, cancel)
+                    rows.append(row)
+
+            if True not in arc_flags_options:
+                continue
+            for count in region_views:
+                views = measure_region_views(graph, [t for _, t, *_ in graph_queries], count)
+                for mode in modes:
+                    if progress:
+                        progress(f"{name}: K={k}, {mode}, arc_flags, представления {count} регионов")
+                    rows.append({
+                        'graph': name,
+                        'vertices': graph.vertex_count,
+                        'edges': graph.edges_count,
+                        'k': k,
+                        'mode': mode,
+                        'arc_flags': True,
+                        'preprocessing_time': preprocessing_time,
+                        'preprocessing_memory': preprocessing_memory,
+                        'preprocessing_backend': backend if preprocessing_time is not None else None,
+                    } | views | run_queries(graph, graph_queries, mode, True, cancel))
+            graph.region_views.clear()
+    return add_speedup(rows)
+
+
+def run_workload(graph: Graph, queries: list[Query], name: str = 'graph',
+                 modes: Iterable[str] = tuple(QUERY_MODES),
+                 arc_flags_options: Iterable[bool] = (False, True),
+                 progress: Callable[[str], None] | None = None,
+                 preprocess: bool = True,
+                 backend: str = 'python',
+                 workers: int = 1,
+                 measure_memory: bool = False) -> list[dict]:
+    """
+    Выполнить сохраненный набор запросов (algo.workload) всеми режимами на графе с его регионами.
+    Результаты группируются по виду запроса и рангу Дейкстры (колонки kind и rank)
+    :param graph: граф (предобработка arc_flags выполняется здесь, если нужна)
+    :param queries: набор запросов
+    :param name: название графа в результатах
+    :param preprocess: выполнить и замерить предобработку для запросов с arc_flags (False - флаги графа уже
+    посчитаны, например загружены из файла; preprocessing_time в результатах - None)
+    :param backend: способ предобработки (arc_flags.PREPROCESSING_BACKENDS)
+    :param workers: количество процессов предобработки (больше 1 - только для 'sparse')
+    :param measure_memory: замерять пиковую память предобработки
+    """
+    arc_flags_options = list(arc_flags_options)
+    preprocessing_time, preprocessing_memory = None, None
+    if preprocess and True in arc_flags_options:
+        preprocessing_time, preprocessing_memory = measure_preprocessing(graph, measure_memory, backend=backend,
+                                                                         workers=workers)
+
+    groups: dict[tuple[str, int | None], list[Query]] = {}
+    for query in queries:
+        groups.setdefault((query.kind, query.rank), []).append(query)
+
+    rows = []
+    for mode in modes:
+        for arc_flags in arc_flags_options:
+            if progress:
+                progress(f"{name}: {mode}, arc_flags={arc_flags}")
+            for (kind, rank), group in sorted(groups.items(), key=lambda item: (item[0][0], item[0][1] or 0)):
+                rows.append({
+                    'graph': name,
+                    'vertices': graph.vertex_count,
+                    'edges': graph.edges_count,
+                    'k': graph.K,
+                    'mode': mode,
+                    'arc_flags': arc_flags,
+                    'kind': kind,
+                    'rank': rank,
+                    'preprocessing_time': preprocessing_time,
+                    'preprocessing_memory': preprocessing_memory,
+                    'preprocessing_backend': backend if preprocessing_time is not None else None,
+                } | run_queries(graph, group, mode, arc_flags))
+    return add_speedup(rows)
+
+
+def compare_backends(data: GraphData, k: int | None = None, queries_count: int = 100, seed: int | None = 0,
+                     backends: Iterable[str] = ('python', 'sparse')) -> list[dict]:
+    """
+    Сравнить способы предобработки на одном графе: время, отличие флагов от первого способа
+    и проверка запросами - поиск с arc_flags на флагах каждого способа должен находить те же расстояния,
+    что и алгоритм Дейкстры без флагов
+    :param data: граф
+    :param k: количество регионов (None - регионы графа как есть)
+    :param queries_count: количество случайных запросов для проверки
+    :param seed: зерно запросов
+    :param backends: способы предобработки (первый - эталон для сравнения флагов)
+    :return: строки с колонками backend, preprocessing_time, flags_differ (ребер с другими флагами),
+    wrong_distances (запросов с неверным расстоянием), speedup (ускорение относительно первого способа)
+    """
+    if k is not None:
+        from algo.partition import assign_regions
+        data = GraphData(pos=data.pos, adj=data.adj, regions=assign_regions(data.pos, k), texts=data.texts,
+                         edge_ids=data.edge_ids)
+    queries = random_queries(data.vertex_count, queries_count, seed)
+    rows, reference = [], None
+    for backend in backends:
+        graph = data.to_graph(k)
+        elapsed, _ = measure_preprocessing(graph, measure_memory=False, backend=backend)
+        flags = {edge_id: graph.edge_by_id(edge_id)._flags for edge_id in data.ids().tolist()}
+        if reference is None:
+            reference = (flags, elapsed)
+        wrong = 0
+        for s, t in queries:
+            expected = dijkstra(graph, graph.vertex_at(s))[0][t]
+            distance, _, _ = dijkstra_unidirectional(graph, graph.vertex_at(s), graph.vertex_at(t), arc_flags=True)
+            wrong += not math.isclose(distance, math.inf if expected is None else expected)
+        rows.append({
+            'backend': backend,
+            'vertices': graph.vertex_count,
+            'edges': graph.edges_count,
+            'k': graph.K,
+            'preprocessing_time': elapsed,
+            'flags_differ': sum(flags[edge_id] != reference[0][edge_id] for edge_id in flags),
+            'wrong_distances': wrong,
+            'speedup': reference[1] / elapsed if elapsed else None,
+        })
+    return rows
+
+
+def add_speedup(rows: list[dict]) -> list[dict]:
+    """
+    Заполнить колонку speedup: во сколько раз среднее время запроса меньше, чем у BASELINE_MODE
+    на том же графе, K и группе запросов (None, если такой строки нет)
+    """
+    def group(row: dict) -> tuple:
+        return row['graph'], row['k'], row.get('kind'), row.get('rank')
+
+    baseline = {group(row): row['time_mean'] for row in rows if (row['mode'], row['arc_flags']) == BASELINE_MODE}
+    for row in rows:
+        base = baseline.get(group(row))
+        row['speedup'] = base / row['time_mean'] if base and row['time_mean'] else None
+    return rows
+
+
+def save_results(rows: list[dict], path: str) -> None:
+    """ Сохранить результаты в .json или .csv (по расширению файла) """
+    if path.endswith('.json'):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+        return
+    fields = RESULT_FIELDS + sorted({key for row in rows for key in row} - set(RESULT_FIELDS))
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def load_results(path: str) -> list[dict]:
+    """ Загрузить результаты, сохраненные save_results """
+    if path.endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return [{key: _parse_csv_value(value) for key, value in row.items()} for row in csv.DictReader(f)]
+
+
+def _parse_csv_value(value: str):
+    """ Вернуть значению из CSV его тип (bool, int, float, None или str) """
+    if value == '':
+        return None
+    if value in ('True', 'False'):
+        return value == 'True'
+    for parse in (int, float):
+        try:
+            return parse(value)
+        except ValueError:
+            pass
+    return value
+
+
+def compare_results(baseline: list[dict], current: list[dict], metric: str = 'time_mean',
+                    threshold: float = 0.1) -> list[dict]:
+    """
+    Сравнить два запуска по метрике
+    :param baseline: результаты эталонного запуска
+    :param current: результаты нового запуска
+    :param metric: сравниваемая колонка
+    :param threshold: допустимое относительное ухудшение (0.1 - на 10%)
+    :return: строки с ключом комбинации, значениями и флагом regression для всех общих комбинаций
+    """
+    base_by_key = {tuple(row.get(f) for f in KEY_FIELDS): row for row in baseline}
+    comparison = []
+    for row in current:
+        key = tuple(row.get(f) for f in KEY_FIELDS)
+        base = base_by_key.get(key)
+        if base is None or base.get(metric) in (None, 0) or row.get(metric) is None:
+            continue
+        ratio = row[metric] / base[metric]
+        comparison.append(dict(zip(KEY_FIELDS, key)) | {
+            'metric': metric,
+            'baseline': base[metric],
+            'current': row[metric],
+            'ratio': ratio,
+            'regression': ratio > 1 + threshold,
+        })
+    return comparison
+
+
+def plot_results(rows: list[dict], path: str, metric: str = 'time_mean', x: str = 'k') -> None:
+    """
+    Построить графики зависимости метрики от K (или от ранга Дейкстры при x='rank')
+    по одному графику на каждый граф, отдельная линия для каждого режима поиска. Требуется matplotlib
+    """
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+    except ImportError as e:
+        raise RuntimeError("Для построения графиков установите matplotlib") from e
+
+    names = list(dict.fromkeys(row['graph'] for row in rows))
+    fig, axes = plt.subplots(1, len(names), figsize=(6 * len(names), 4), squeeze=False)
+    for ax, name in zip(axes[0], names):
+        lines: dict[str, list[tuple[int, float]]] = {}
+        for row in rows:
+            if row['graph'] == name and row.get(metric) is not None and row.get(x) is not None:
+                label = row['mode'] + (' (arc_flags)' if row['arc_flags'] else '')
+                lines.setdefault(label, []).append((row[x], row[metric]))
+        for label, points in lines.items():
+            points.sort()
+            ax.plot([position for position, _ in points], [value for _, value in points], marker='o', label=label)
+        ax.set_title(name)
+        if x == 'rank':
+            ax.set_xscale('log', base=2)
+            ax.set_xlabel('Ранг Дейкстры')
+        else:
+            ax.set_xlabel('K (количество регионов)')
+        ax.set_ylabel(metric)
+        ax.legend()
+    fig.tight_layout()
+    fig.savefig(path)
+    plt.close(fig)
@@ -1,20 +1,71 @@
 from __future__ import annotations
 
-from algo.dijkstra.dijkstra import dijkstra
+import heapq
+import math
+import threading
+from typing import Callable, Iterable
+
+from algo.dijkstra.dijkstra import dijkstra, dijkstra_step
+from algo.dijkstra.structures import PriorityQueue, DijkstraNode
 from algo.dijkstra.utils import path_dict_to_path, print_weighted_path
+from algo.edge import Edge
 from algo.graph import Graph
 from algo.config import DEBUG
 
 
-def arc_flags_preprocessing(weighted_graph: Graph):
+class PreprocessingCancelled(Exception):
+    """ Предобработка прервана (флаги графа заполнены не полностью) """
+
+
+# Способы предобработки: 'python' - поиск Дейкстры на Graph,
+# 'sparse' - scipy.sparse.csgraph (algo.dijkstra.arc_flags_sparse)
+PREPROCESSING_BACKENDS = ('python', 'sparse')
+
+
+def default_backend() -> str:
+    """ 'sparse', если установлен scipy, иначе 'python' """
+    try:
+        import scipy.sparse.csgraph  # noqa: F401
+    except ImportError:
+        return 'python'
+    return 'sparse'
+
+
+def arc_flags_preprocessing(weighted_graph: Graph,
+                            progress: Callable[[int, int], None] | None = None,
+                            cancelled: Callable[[], bool] | None = None,
+                            backend: str = 'python',
+                            workers: int = 1):
     """
-    Предобработка arc_flags
+    Предобработка arc_flags. Кроме флагов ребер заполняет weighted_graph.region_bounds (см. region_bounds).
+    Флаги строятся заново, после этого устаревшие регионы (stale_regions) снова используют флаги
     :param weighted_graph: Взвешенный граф, где осуществить предобработку
+    :param progress: вызывается после каждой вершины: (обработано вершин, всего вершин)
+    :param cancelled: проверяется перед каждой вершиной, если вернула True - предобработка прерывается
+    исключением PreprocessingCancelled
+    :param backend: способ предобработки из PREPROCESSING_BACKENDS
+    :param workers: количество процессов (больше 1 - только для 'sparse')
     """
+    if backend == 'sparse':
+        from algo.dijkstra.arc_flags_sparse import arc_flags_preprocessing_sparse
+        return arc_flags_preprocessing_sparse(weighted_graph, progress, cancelled, workers)
+    if backend != 'python':
+        raise ValueError(f"Unknown preprocessing backend {backend!r}, expected one of {PREPROCESSING_BACKENDS}")
+    if workers > 1:
+        raise ValueError("Parallel preprocessing requires the 'sparse' backend")
+
     if DEBUG:
         print("\n*** Начало обработки arc_flags ***")
 
-    for vertex in weighted_graph._vertices:  # для каждой вершины графа
+    # Пока флаги строятся, запросы их не используют (в том числе при прерывании предобработки)
+    weighted_graph.mark_stale(range(weighted_graph.K))
+    mark = weighted_graph._stale_mark
+    for edge in weighted_graph._edges_by_id.values():
+        edge._flags = [False] * weighted_graph.K  # флаги по прежним весам не должны остаться
+    total = weighted_graph.vertex_count
+    for done, vertex in enumerate(weighted_graph._vertices):  # для каждой вершины графа
+        if cancelled is not None and cancelled():
+            raise PreprocessingCancelled()
         vertex_index = weighted_graph.index_of(vertex)
 
         # вызвать обратный алгоритм Дейкстры - дерево кратчайших путей
@@ -37,5 +88,226 @@ def arc_flags_preprocessing(weighted_graph: Graph):
             for edge in path:
                 edge.set_flag(vertex.k)
 
+        if progress is not None:
+            progress(done + 1, total)
+
+    weighted_graph.region_bounds = region_bounds(weighted_graph, cancelled)
+    weighted_graph.clear_stale(mark)
+
+    if DEBUG:
+        print("\n*** Конец обработки arc_flags ***")
+
+
+def region_bounds(weighted_graph: Graph, cancelled: Callable[[], bool] | None = None) -> list[list[float]]:
+    """
+    Таблица K x K нижних оценок расстояний между регионами: bounds[a][b] - наименьшее расстояние
+    от вершины региона a до вершины региона b (inf - из a в b пути нет, на диагонали 0).
+    Для каждого региона b - один обратный поиск Дейкстры сразу из всех его вершин
+    (любой путь в регион входит через граничную вершину, поэтому это расстояния между границами регионов)
+    :param weighted_graph: граф
+    :param cancelled: проверяется перед каждым регионом (True - исключение PreprocessingCancelled)
+    """
+    k = weighted_graph.K
+    bounds = [[float('inf')] * k for _ in range(k)]
+    regions = [vertex.k for vertex in weighted_graph._vertices]
+    for target in range(k):
+        if cancelled is not None and cancelled():
+            raise PreprocessingCancelled()
+        distances: list[float | None] = [None] * weighted_graph.vertex_count
+        priority_queue: PriorityQueue[DijkstraNode] = PriorityQueue()
+        for i, region in enumerate(regions):
+            if region == target:
+                distances[i] = 0
+                priority_queue.push(DijkstraNode(i, 0))
+        while not priority_queue.empty:
+            dijkstra_step(weighted_graph, priority_queue, distances, {}, reverse=True)
+        for i, distance in enumerate(distances):
+            if distance is not None and distance < bounds[regions[i]][target]:
+                bounds[regions[i]][target] = distance
+    return bounds
+
+
+def _improved_targets(weighted_graph: Graph, edge: Edge, weight: float, weights: dict[int, float]) -> list[int]:
+    """
+    Вершины t, расстояние до которых из edge.u сократится, если вес edge станет weight: weight + d(v, t) < d(u, t).
+    Любой путь, который стал короче, проходит через edge и заканчивается в такой вершине.
+    Поиск из v раскрывает только улучшенные вершины (если t не улучшилась, через нее не улучшится и следующая
+    вершина пути), старые расстояния из u дает второй поиск, который продвигается не дальше текущего
+    расстояния первого. Поэтому оба поиска ограничены шаром вокруг u радиуса наибольшего нового расстояния
+    до улучшенной вершины, а не всем графом
+    :param weights: веса ребер, уже измененные раньше в том же пакете (номер ребра -> вес)
+    """
+    def weight_of(e: Edge) -> float:
+        return weights.get(e.id, e.weight)
+
+    # Старые расстояния из u (вес edge еще прежний), вычисляются по мере надобности
+    old_settled: dict[int, float] = {}
+    old_best = {edge.u: 0.0}
+    old_queue = [(0.0, edge.u)]
+
+    def old_distance(t: int, limit: float) -> float:
+        """ d(u, t), если оно не больше limit, иначе inf """
+        while t not in old_settled and old_queue and old_queue[0][0] <= limit:
+            distance, x = heapq.heappop(old_queue)
+            if x in old_settled:
+                continue
+            old_settled[x] = distance
+            for e in weighted_graph.edges_of_index(x):
+                candidate = distance + weight_of(e)
+                if candidate < old_best.get(e.v, math.inf):
+                    old_best[e.v] = candidate
+                    heapq.heappush(old_queue, (candidate, e.v))
+        return old_settled.get(t, math.inf)
+
+    improved = []
+    settled = set()
+    best = {edge.v: weight}
+    queue = [(weight, edge.v)]
+    while queue:
+        distance, t = heapq.heappop(queue)
+        if t in settled:
+            continue
+        settled.add(t)
+        if old_distance(t, distance) <= distance:
+            continue  # расстояние до t не сократилось - дальше t поиск не идет
+        improved.append(t)
+        for e in weighted_graph.edges_of_index(t):
+            candidate = distance + weight_of(e)
+            if candidate < best.get(e.v, math.inf):
+                best[e.v] = candidate
+                heapq.heappush(queue, (candidate, e.v))
+    return improved
+
+
+def update_weights(weighted_graph: Graph, changes: Iterable[tuple[int, float]]) -> set[int]:
+    """
+    Изменить веса ребер и пометить устаревшими флаги регионов, деревья кратчайших путей которых могли измениться:
+    * ребро стало тяжелее - регионы, флаг которых у ребра стоит (остальные деревья это ребро не используют);
+    * ребро (u, v) стало легче - регионы вершин, расстояние до которых из u сократилось (_improved_targets).
+    Изменения разбираются по порядку, каждое - с учетом весов предыдущих. Стоимость уменьшения - два поиска
+    в шаре вокруг u радиуса наибольшего нового расстояния до вершины, путь в которую сократился
+    (если не сократился ни один - поиск останавливается сразу); увеличение - O(K).
+    Регионы помечаются устаревшими до записи новых весов, поэтому запрос в другом потоке не увидит новые веса
+    со старыми флагами. Регионы, которые уже восстанавливаются, помечаются заново (их деревья могли быть
+    построены по старым весам)
+    :param weighted_graph: граф
+    :param changes: пары (номер ребра, новый вес)
+    :return: регионы, помеченные устаревшими
+    """
+    changes = [(weighted_graph.edge_by_id(edge_id), weight) for edge_id, weight in changes]
+    stale: set[int] = set(weighted_graph.stale_regions)
+
+    weights: dict[int, float] = {}  # новые веса уже разобранных изменений
+    decreased = False
+    for edge, weight in changes:
+        current = weights.get(edge.id, edge.weight)
+        if weight > current:
+            stale.update(region for region, flag in enumerate(edge._flags) if flag)
+        elif weight < current:
+            improved = _improved_targets(weighted_graph, edge, weight, weights)
+            if improved:
+                decreased = True
+                stale.update(weighted_graph.vertex_at(t).k for t in improved)
+        weights[edge.id] = weight
+
+    weighted_graph.mark_stale(stale)
+    if decreased:
+        weighted_graph.region_bounds = None  # расстояния между регионами могли сократиться
+    for edge, weight in changes:
+        edge.weight = weight
+    weighted_graph.version += 1
+
     if DEBUG:
-        print("\n*** Конец обработки arc_flags ***")
\ No newline at end of file
+        print(f"Изменено весов: {len(changes)}, устаревшие регионы: {sorted(stale)}")
+    return stale
+
+
+def boundary_vertices(weighted_graph: Graph, region: int) -> list[int]:
+    """ Индексы граничных вершин региона: вершин региона, в которые входит ребро из другого региона """
+    vertices = weighted_graph._vertices
+    return [i for i, vertex in enumerate(vertices)
+            if vertex.k == region and any(vertices[edge.u].k != region
+                                          for edge in weighted_graph.reversed_edges_of_index(i))]
+
+
+def repair_arc_flags(weighted_graph: Graph, cancelled: Callable[[], bool] | None = None,
+                     progress: Callable[[int, int], None] | None = None, backend: str = 'python') -> list[int]:
+    """
+    Пересчитать флаги устаревших регионов (stale_regions). Для региона r флаг r ставится:
+    * на все ребра, оба конца которых в r;
+    * на ребра деревьев кратчайших путей в граничные вершины r (boundary_vertices).
+    Этого достаточно: кратчайший путь из x в вершину r после последнего входа в r идет по ребрам внутри r,
+    а до входа - это кратчайший путь в граничную вершину, т.е. путь ее дерева. Остальные ребра флаг r теряют.
+    Стоимость - по одному обратному поиску на граничную вершину устаревших регионов (а не на каждую вершину,
+    как в arc_flags_preprocessing), флаги ребер меняются только после того, как деревья региона построены.
+    Регион снимается с учета, только если за время пересчета его не пометили устаревшим снова
+    :param cancelled: проверяется перед каждым деревом (True - пересчет прерывается, регион остается устаревшим)
+    :param progress: вызывается после каждого региона: (пересчитано регионов, всего устаревших регионов)
+    :param backend: способ построения деревьев из PREPROCESSING_BACKENDS
+    :return: регионы, флаги которых восстановлены
+    """
+    if backend not in PREPROCESSING_BACKENDS:
+        raise ValueError(f"Unknown preprocessing backend {backend!r}, expected one of {PREPROCESSING_BACKENDS}")
+    repaired = []
+    stale = list(weighted_graph.stale_regions.items())
+    for done, (region, mark) in enumerate(stale):
+        roots = boundary_vertices(weighted_graph, region)
+        if backend == 'sparse':
+            from algo.dijkstra.arc_flags_sparse import tree_edges_sparse
+            tree = tree_edges_sparse(weighted_graph, roots, cancelled)
+            if tree is None:
+                return repaired
+        else:
+            tree = set()
+            for root in roots:
+                if cancelled is not None and cancelled():
+                    return repaired
+                # Ребра дерева - ровно ребра path_dict (каждое ведет из вершины дерева к ее предку)
+                _, path_dict = dijkstra(weighted_graph, weighted_graph.vertex_at(root), True)
+                tree.update(edge.id for edge in path_dict.values())
+
+        vertices = weighted_graph._vertices
+        for edge in list(weighted_graph._edges_by_id.values()):
+            if edge.id in tree or vertices[edge.u].k == region == vertices[edge.v].k:
+                edge.set_flag(region)
+            else:
+                edge.clear_flag(region)
+        if weighted_graph.stale_regions.get(region) == mark:
+            del weighted_graph.stale_regions[region]
+            repaired.append(region)
+        if progress is not None:
+            progress(done + 1, len(stale))
+
+    if weighted_graph.region_bounds is None and not weighted_graph.stale_regions:
+        try:
+            weighted_graph.region_bounds = region_bounds(weighted_graph, cancelled)
+        except PreprocessingCancelled:
+            pass
+    return repaired
+
+
+class FlagRepairThread(threading.Thread):
+    """ Фоновый поток: периодически восстанавливает флаги устаревших регионов (repair_arc_flags) """
+
+    def __init__(self, weighted_graph: Graph, interval: float = 0.5, backend: str = 'python') -> None:
+        """
+        :param weighted_graph: граф
+        :param interval: пауза между проверками, секунды
+        :param backend: способ построения деревьев из PREPROCESSING_BACKENDS
+        """
+        super().__init__(daemon=True)
+        self.graph = weighted_graph
+        self.interval = interval
+        self.backend = backend
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self._stopped.is_set():
+            if self.graph.stale_regions:
+                repair_arc_flags(self.graph, cancelled=self._stopped.is_set, backend=self.backend)
+            self._stopped.wait(self.interval)
+
+    def stop(self) -> None:
+        """ Остановить поток и дождаться его завершения """
+        self._stopped.set()
+        self.join()
@@ -0,0 +1,173 @@
+"""
+Предобработка arc_flags на разреженных матрицах (требуется scipy).
+
+Граф выгружается в матрицу CSR, деревья кратчайших путей строятся scipy.sparse.csgraph.dijkstra
+(нативный код) сразу для пачки корней, а флаги выставляются массово в NumPy:
+в дереве с корнем t ребро (u, v) получает флаг региона t, если v - следующая вершина на пути из u в t.
+Результат тот же, что у arc_flags_preprocessing, с точностью до выбора среди равных по длине кратчайших путей
+"""
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable
+
+import numpy as np
+
+from algo.dijkstra.arc_flags import PreprocessingCancelled
+from algo.graph import Graph
+
+ROOTS_PER_BATCH = 256  # Сколько деревьев строится за один вызов csgraph
+BATCH_CELLS = 1 << 24  # Но не больше стольких элементов в матрицах результата (корни x N) за один вызов
+
+
+def _csgraph():
+    try:
+        from scipy.sparse import csr_matrix
+        from scipy.sparse.csgraph import dijkstra
+    except ImportError as e:
+        raise RuntimeError("Для предобработки на разреженных матрицах установите scipy") from e
+    return csr_matrix, dijkstra
+
+
+def graph_arrays(weighted_graph: Graph) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """ Начала, концы и веса ребер графа в порядке Graph._edges_by_id """
+    edges = list(weighted_graph._edges_by_id.values())
+    u = np.fromiter((edge.u for edge in edges), dtype=np.int64, count=len(edges))
+    v = np.fromiter((edge.v for edge in edges), dtype=np.int64, count=len(edges))
+    weights = np.fromiter((edge.weight for edge in edges), dtype=np.float64, count=len(edges))
+    return u, v, weights
+
+
+def reversed_matrix(weighted_graph: Graph, u: np.ndarray, v: np.ndarray, weights: np.ndarray):
+    """
+    Матрица CSR обратного графа (элемент [v, u] - вес ребра u -> v).
+    Из параллельных ребер остается самое легкое, нулевые веса заменяются наименьшим положительным числом
+    (нули в разреженной матрице означают отсутствие ребра)
+    :return: матрица и номер строки ребра (в u, v) для каждой пары (u, v) в порядке возрастания u * N + v
+    """
+    csr_matrix, _ = _csgraph()
+    n = weighted_graph.vertex_count
+    keys = u * n + v
+    order = np.lexsort((np.arange(len(keys)), weights, keys))  # по ключу, затем по весу, затем по порядку
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = keys[order][1:] != keys[order][:-1]
+    rows = order[first]
+    data = np.maximum(weights[rows], np.nextafter(0, 1))
+    matrix = csr_matrix((data, (v[rows], u[rows])), shape=(n, n))
+    return matrix, rows
+
+
+# Данные процесса-обработчика при workers > 1: (dijkstra, матрица, rows, sorted_keys, regions)
+_WORKER_STATE = None
+
+
+def _init_worker(matrix, rows: np.ndarray, sorted_keys: np.ndarray, regions: np.ndarray) -> None:
+    global _WORKER_STATE
+    _WORKER_STATE = (_csgraph()[1], matrix, rows, sorted_keys, regions)
+
+
+def _tree_flags(dijkstra, matrix, rows: np.ndarray, sorted_keys: np.ndarray, regions: np.ndarray,
+                roots: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Флаги деревьев кратчайших путей с корнями roots
+    :return: номера ребер (строки graph_arrays) и регионы - пары, для которых нужно поставить флаг
+    """
+    n = len(regions)
+    # predecessors[i, x] - следующая после x вершина на пути из x в roots[i] (-9999 - пути нет или x - корень)
+    _, predecessors = dijkstra(matrix, directed=True, indices=roots, return_predecessors=True)
+    tree, x = np.nonzero(predecessors >= 0)
+    edge_rows = rows[np.searchsorted(sorted_keys, x * n + predecessors[tree, x])]
+    return edge_rows, regions[roots[tree]]
+
+
+def _tree_flags_worker(start: int, stop: int) -> tuple[np.ndarray, np.ndarray]:
+    return _tree_flags(*_WORKER_STATE, np.arange(start, stop))
+
+
+def tree_edges_sparse(weighted_graph: Graph, roots: list[int],
+                      cancelled: Callable[[], bool] | None = None) -> set[int] | None:
+    """
+    Номера ребер деревьев кратчайших путей в вершины roots (для repair_arc_flags)
+    :param cancelled: проверяется перед каждой пачкой корней
+    :return: номера ребер (Edge.id) или None, если построение прервано
+    """
+    _, dijkstra = _csgraph()
+    edges = list(weighted_graph._edges_by_id.values())
+    if not roots or not edges:
+        return set()
+    n = weighted_graph.vertex_count
+    u, v, weights = graph_arrays(weighted_graph)
+    matrix, rows = reversed_matrix(weighted_graph, u, v, weights)
+    sorted_keys = (u * n + v)[rows]
+    regions = np.zeros(n, dtype=np.int64)  # регион корня здесь не нужен
+    roots = np.asarray(roots, dtype=np.int64)
+    batch = max(1, min(ROOTS_PER_BATCH, BATCH_CELLS // max(n, 1)))
+    tree = np.zeros(len(edges), dtype=bool)
+    for start in range(0, len(roots), batch):
+        if cancelled is not None and cancelled():
+            return None
+        edge_rows, _ = _tree_flags(dijkstra, matrix, rows, sorted_keys, regions, roots[start:start + batch])
+        tree[edge_rows] = True
+    return {edges[row].id for row in np.flatnonzero(tree).tolist()}
+
+
+def arc_flags_preprocessing_sparse(weighted_graph: Graph,
+                                   progress: Callable[[int, int], None] | None = None,
+                                   cancelled: Callable[[], bool] | None = None,
+                                   workers: int = 1) -> None:
+    """
+    Предобработка arc_flags на разреженных матрицах: флаги ребер и weighted_graph.region_bounds
+    :param weighted_graph: Взвешенный граф, где осуществить предобработку
+    :param progress: вызывается после каждой пачки корней: (обработано вершин, всего вершин)
+    :param cancelled: проверяется перед каждой пачкой, если вернула True - предобработка прерывается
+    исключением PreprocessingCancelled
+    :param workers: количество процессов, между которыми делятся пачки корней (1 - в этом процессе)
+    """
+    _, dijkstra = _csgraph()
+    weighted_graph.region_views.clear()
+    mark = weighted_graph._stale_mark  # регионы, помеченные устаревшими позже, остаются устаревшими
+    n, k = weighted_graph.vertex_count, weighted_graph.K
+    u, v, weights = graph_arrays(weighted_graph)
+    matrix, rows = reversed_matrix(weighted_graph, u, v, weights)
+    sorted_keys = (u * n + v)[rows]
+    regions = np.fromiter((vertex.k for vertex in weighted_graph._vertices), dtype=np.int64, count=n)
+
+    flags = np.zeros((len(u), k), dtype=bool)
+    batch = max(1, min(ROOTS_PER_BATCH, BATCH_CELLS // max(n, 1)))
+    batches = [(start, min(start + batch, n)) for start in range(0, n, batch)]
+    if workers > 1:
+        with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                 initargs=(matrix, rows, sorted_keys, regions)) as pool:
+            futures = [pool.submit(_tree_flags_worker, start, stop) for start, stop in batches]
+            for done, future in enumerate(as_completed(futures)):
+                if cancelled is not None and cancelled():
+                    pool.shutdown(cancel_futures=True)
+                    raise PreprocessingCancelled()
+                edge_rows, edge_regions = future.result()
+                flags[edge_rows, edge_regions] = True
+                if progress is not None:
+                    progress(min((done + 1) * batch, n), n)
+    else:
+        for start, stop in batches:
+            if cancelled is not None and cancelled():
+                raise PreprocessingCancelled()
+            edge_rows, edge_regions = _tree_flags(dijkstra, matrix, rows, sorted_keys, regions,
+                                                  np.arange(start, stop))
+            flags[edge_rows, edge_regions] = True
+            if progress is not None:
+                progress(stop, n)
+
+    for edge, edge_flags in zip(weighted_graph._edges_by_id.values(), flags.tolist()):
+        edge._flags = edge_flags
+
+    # Нижние оценки расстояний между регионами: поиск сразу из всех вершин региона (min_only)
+    bounds = np.full((k, k), np.inf)
+    for target in range(k):
+        sources = np.flatnonzero(regions == target)
+        if len(sources) == 0:
+            continue
+        distances = dijkstra(matrix, directed=True, indices=sources, min_only=True)
+        reached = np.isfinite(distances)
+        np.minimum.at(bounds[:, target], regions[reached], distances[reached])
+    weighted_graph.region_bounds = bounds.tolist()
+    weighted_graph.clear_stale(mark)
@@ -2,7 +2,7 @@
 from __future__ import annotations
 
 from algo.config import DEBUG
-from algo.dijkstra.structures import PriorityQueue, DijkstraNode
+from algo.dijkstra.structures import PriorityQueue, DijkstraNode, QueryStats, CancellationToken, SearchSpace
 from algo.edge import Edge
 from algo.graph import Graph
 from algo.vertex import Vertex
@@ -15,7 +15,13 @@ def dijkstra_step(weighted_graph: Graph,
                   reverse: bool = False,
                   arc_flags: bool = False,
                   visited: set = None,
-                  end: Vertex = None) -> int:
+                  end: Vertex = None,
+                  stats: QueryStats = None,
+                  settled: list[int] = None,
+                  cancel: CancellationToken = None,
+                  space: SearchSpace = None,
+                  bounds: list[float] = None,
+                  end_index: int = None) -> int:
     """
     Функция шага алгоритма Дейкстры.
     Функция полностью проверяет одну вершину из приоритетной очереди
@@ -27,9 +33,20 @@ def dijkstra_step(weighted_graph: Graph,
     :param arc_flags: включить оптимизацию arc_flags
     :param visited: множество уже посещенных вершин (None если не нужно отмечать посещенные вершины (для dijkstra, unidirectional_dijkstra)
     :param end: конечная вершина, к который мы ищем путь
+    :param stats: статистика запроса, в которую добавляются счетчики шага (None - не собирать)
+    :param settled: список, в который добавляется исследованная на шаге вершина (None - не записывать)
+    :param cancel: признак отмены поиска, проверяется в начале шага (QueryCancelled, если поиск отменен)
+    :param space: пространство поиска, в которое записываются исследованная вершина и ребра шага (None - не записывать)
+    :param bounds: нижние оценки расстояния от каждого региона до вершины end_index (Graph.region_bounds):
+    вершина не исследуется, если расстояние до нее плюс оценка не меньше уже известного расстояния до end_index
+    :param end_index: индекс конечной вершины (нужен вместе с bounds)
     :return: количество операций
     """
+    if cancel is not None:
+        cancel.check()
     count_op = 0  # счетчик количества операций
+    pruned = 0  # счетчик ребер, отброшенных arc_flags
+    pushes = 0  # счетчик добавлений в очередь
     if priority_queue.empty:  # если очередь с приоритетом пустая
         return 0  # функция завершается
     dijkstra_node = priority_queue.pop()
@@ -38,6 +55,26 @@ def dijkstra_step(weighted_graph: Graph,
     dist_u: float = distances[u]  # Рассмотреть все ребра и вершины для данной вершины
     # dist_u - сохраненное расстояние, по которому можно добраться до u по известным маршрутам
 
+    if dijkstra_node.distance > dist_u:
+        # Устаревшая запись: вершина уже исследована с меньшим расстоянием, повторно ее не рассматриваем
+        if DEBUG:
+            print(f"\tУстаревшая запись очереди для вершины {u}, пропускаем")
+        if stats is not None:
+            stats.pops += 1
+            stats.stale_pops += 1
+        return 0
+
+    if bounds is not None:
+        best = distances[end_index]
+        if best is not None and dist_u + bounds[weighted_graph.vertex_at(u).k] >= best:
+            # Через эту вершину путь до end_index короче известного не получится
+            if DEBUG:
+                print(f"\tВершина {u} отброшена по нижней оценке расстояния до региона конечной вершины")
+            if stats is not None:
+                stats.pops += 1
+                stats.bound_pruned += 1
+            return 0
+
     # Рассмотреть все ребра и вершины для данной вершины (выходящие или входящие в зависимости от reversed)
 
     if not reverse:
@@ -45,6 +82,20 @@ def dijkstra_step(weighted_graph: Graph,
     else:
         edges = weighted_graph.reversed_edges_of_index(u)  # получить входящие в вершину ребра
 
+    if arc_flags and end.k in weighted_graph.stale_regions:
+        arc_flags = False  # флаги региона устарели после изменения весов (update_weights) - не используем
+
+    # Если для региона end построено представление (algo.dijkstra.region_view), перебираются только ребра
+    # с флагом региона и флаги не проверяются. Пространство поиска записывается по всем ребрам,
+    # чтобы были видны отброшенные
+    view = weighted_graph.region_views.get(end.k) if arc_flags and space is None else None
+    if view is not None:
+        filtered = view.reversed_edges_of(u) if reverse else view.edges_of(u)
+        pruned = len(edges) - len(filtered)
+        count_op += pruned
+        edges = filtered
+    check_flags = arc_flags and view is None
+
     if DEBUG:
         print(f"\tИсследуем вершину: {u}")
         print(f"\tИсследуемые ребра: {edges}")
@@ -62,12 +113,17 @@ def dijkstra_step(weighted_graph: Graph,
         # Это расстояние до всех известных вершины, соединенных ребром с u
 
         # Если включена оптимизация arc_flags
-        if arc_flags:
+        if check_flags:
             # Если это ребро не находится на пути в нужный регион вершины
             if not we.get_flag(end.k):
                 if DEBUG:
                     print(f"\t\t(оптимизация arc flags) ребро пропущено, так не содержится в кратчайшим пути до региона '{end.k}'")
+                pruned += 1
+                if space is not None:
+                    space.pruned.append(we.id)
                 continue   # ребро не рассматриваем
+        if space is not None:
+            space.relaxed.append(we.id)
 
         # Условие Дейкстры: старого расстояния не существует или найден более короткий путь
         if dist_v is None or dist_v > dist_u + we.weight:
@@ -77,6 +133,7 @@ def dijkstra_step(weighted_graph: Graph,
             path_dict[vertex] = we
             # Перемещаем все вершины с новыми путями в очередь с приоритетом
             priority_queue.push(DijkstraNode(vertex, distances[vertex]))
+            pushes += 1
 
             if DEBUG:
                 print(f"\t\t! Найден более короткий путь до вершины {vertex}")
@@ -90,6 +147,16 @@ def dijkstra_step(weighted_graph: Graph,
             pass
     if visited is not None:
         visited.add(u)  # отметить что вершина посещена
+    if settled is not None:
+        settled.append(u)
+    if space is not None:
+        (space.settled_reverse if reverse else space.settled).append(u)
+    if stats is not None:
+        stats.pops += 1
+        stats.settled += 1
+        stats.relaxed += count_op - pruned
+        stats.pruned += pruned
+        stats.pushes += pushes
     return count_op
 
 
@@ -1,25 +1,37 @@
+import time
+from typing import Callable
+
 from algo.config import DEBUG
 from algo.dijkstra.dijkstra import dijkstra_step
-from algo.dijkstra.structures import WeightedPath, PriorityQueue, DijkstraNode
+from algo.dijkstra.structures import (WeightedPath, PriorityQueue, DijkstraNode, QueryStats, CancellationToken,
+                                      FrontierSnapshot, SNAPSHOT_STEPS, SearchSpace)
 from algo.dijkstra.utils import path_dict_to_path, print_weighted_path
 from algo.edge import Edge
 from algo.graph import Graph
-from algo.utils import clock
 from algo.vertex import Vertex
 
 
-@clock
-def dijkstra_bidirectional(weighted_graph: Graph, start: Vertex, end: Vertex, arc_flags=False) -> tuple[
-    float, WeightedPath, int]:
+def dijkstra_bidirectional(weighted_graph: Graph, start: Vertex, end: Vertex, arc_flags=False, *,
+                           stats: QueryStats = None,
+                           cancel: CancellationToken = None,
+                           on_snapshot: Callable[[FrontierSnapshot], None] = None,
+                           space: SearchSpace = None) -> tuple[float, WeightedPath, int]:
     """
     Функция двунаправленного поиска кратчайшего маршрута из start в end с применением алгоритма Дейкстры
     :param weighted_graph: взвешенный граф
     :param start: вершина начала поиска
     :param end: вершина конца поиска
     :param arc_flags: включить оптимизацию arc_flags
+    :param stats: статистика запроса, которую нужно заполнить (None - не собирать)
+    :param cancel: признак отмены, проверяется на каждом шаге (при отмене - исключение QueryCancelled)
+    :param on_snapshot: вызывается каждые SNAPSHOT_STEPS исследованных вершин (с каждой стороны)
+    со снимком хода поиска
+    :param space: пространство поиска, в которое записываются исследованные вершины и ребра (None - не записывать)
     :return: расстояние между вершинами, путь от начала до конца, количество операций
     """
     count_op = 0  # Счетчик кол-ва операций
+    if stats is not None:
+        t0 = time.perf_counter()
 
     if DEBUG:
         print("\t* Начало двунаправленного поиска")
@@ -43,11 +55,17 @@ def dijkstra_bidirectional(weighted_graph: Graph, start: Vertex, end: Vertex, ar
     queue_end = PriorityQueue[DijkstraNode]()
     queue_start.push(DijkstraNode(start_index, 0))
     queue_end.push(DijkstraNode(end_index, 0))
+    if stats is not None:
+        stats.pushes += 2
 
     # Для start и end заводим собственные множества посещенных вершин
     visited_start = set()
     visited_end = set()
 
+    # Для снимков хода поиска: исследованные с прошлого снимка вершины с каждой стороны
+    settled_start: list[int] | None = [] if on_snapshot is not None else None
+    settled_end: list[int] | None = [] if on_snapshot is not None else None
+
     if DEBUG:
         print(f"\n\tИНИЦИАЛИЗАЦИЯ")
         print(f"\t{start_index=}")
@@ -67,7 +85,11 @@ def dijkstra_bidirectional(weighted_graph: Graph, start: Vertex, end: Vertex, ar
             step += 1
             print(f"\n\tШАГ №{step} - START:")
         count_op += dijkstra_step(weighted_graph, queue_start, distances_start, path_dict_start, visited=visited_start,
-                                  arc_flags=arc_flags, end=end)
+                                  arc_flags=arc_flags, end=end, stats=stats, settled=settled_start, cancel=cancel,
+                                  space=space)
+        if settled_start is not None and len(settled_start) >= SNAPSHOT_STEPS:
+            on_snapshot(FrontierSnapshot(settled_start, queue_start.vertices()))
+            settled_start = []
         if DEBUG:
             print(f"\tРасстояния до каждой вершины от start: {distances_start}")
             print(f"\tОчередь с приоритетом для start: {queue_start}")
@@ -83,7 +105,11 @@ def dijkstra_bidirectional(weighted_graph: Graph, start: Vertex, end: Vertex, ar
             print(f"\n\tШАГ №{step} - END:")
         count_op += dijkstra_step(weighted_graph, queue_end, distances_end, path_dict_end, visited=visited_end,
                                   reverse=True,
-                                  arc_flags=arc_flags, end=end)
+                                  arc_flags=arc_flags, end=end, stats=stats, settled=settled_end, cancel=cancel,
+                                  space=space)
+        if settled_end is not None and len(settled_end) >= SNAPSHOT_STEPS:
+            on_snapshot(FrontierSnapshot(settled_end, queue_end.vertices(), reverse=True))
+            settled_end = []
         if DEBUG:
             print(f"\tРасстояния до каждой вершины от end: {distances_end}")
             print(f"\tОчередь с приоритетом для end: {queue_end}")
@@ -93,6 +119,15 @@ def dijkstra_bidirectional(weighted_graph: Graph, start: Vertex, end: Vertex, ar
         if visited_start & visited_end:  # {A, Z} & {Z, C} = Z
             break
 
+    if on_snapshot is not None:
+        # Последние исследованные вершины (снимок в конце поиска)
+        on_snapshot(FrontierSnapshot(settled_start, queue_start.vertices()))
+        on_snapshot(FrontierSnapshot(settled_end, queue_end.vertices(), reverse=True))
+
+    if stats is not None:
+        t1 = time.perf_counter()
+        stats.search_time += t1 - t0
+
     if not visited_start & visited_end:
         if DEBUG:
             print("\n\t* Результат: ")
@@ -106,34 +141,56 @@ def dijkstra_bidirectional(weighted_graph: Graph, start: Vertex, end: Vertex, ar
         print(f"\n\tКонцы встретились в вершине {connecting_vertex}")
     # Лучшее (кратчайшее) расстояние
     best_path_length = distances_start[connecting_vertex] + distances_end[connecting_vertex]
-    # На данный момент лучший путь содержит общую посещенную вершину
-    # Лучший маршрут
-    best_path = (path_dict_to_path(start_index, connecting_vertex, path_dict_start) +  # start -> z
-                 path_dict_to_path(end_index, connecting_vertex, path_dict_end, reverse=True))  # z -> end
+    # На данный момент лучший путь содержит общую посещенную вершину.
+    # Сам маршрут строится один раз в конце: запоминаем только ребро, через которое он проходит
+    # (None - маршрут проходит через connecting_vertex)
+    best_edge: Edge | None = None
 
     if DEBUG:
         print(f"\n\t ПОИСК ЛУЧШЕГО ПУТИ:")
         print(f"\t Лучшее (кратчайшее) расстояние: {best_path_length}")
-        print(f"\t Лучший путь: {best_path}")
         print(f"\n\t ПЕРЕБОР ВСЕХ ВЕРШИН ГРАФА:")
 
+    count_op_search = count_op  # операций выполнено до перебора
+    if arc_flags and end.k in weighted_graph.stale_regions:
+        arc_flags = False  # флаги региона устарели после изменения весов (update_weights) - не используем
+    pruned = 0  # ребер отброшено arc_flags при переборе
+    # Ребра с флагом региона end (algo.dijkstra.region_view): флаги при переборе не проверяются.
+    # Отброшенные представлением ребра учитываются так же, как отброшенные проверкой флагов (и как в dijkstra_step):
+    # ребро без флага, конец которого достигнут из end, - операция и stats.pruned
+    view = weighted_graph.region_views.get(end.k) if arc_flags and space is None else None
+    edges_of = view.edges_of if view is not None else weighted_graph.edges_of_index
+    check_flags = arc_flags and view is None
     # ! Кратчайший путь не обязательно пройдёт через вершину connecting_vertex
     # Перебираем каждую посещенную из start вершину (кроме connecting_vertex)
     for u in (visited_start - {connecting_vertex}):
+        if cancel is not None:
+            cancel.check()
         if DEBUG:
             print(f"\t\tВЕРШИНА {u}:")
-        for we in weighted_graph.edges_of_index(
-                u):  # для каждого исходящего ребра этой вершины (которое состоит из u и v)
+        edges = edges_of(u)
+        if view is not None:
+            skipped = (sum(distances_end[we.v] is not None for we in weighted_graph.edges_of_index(u))
+                       - sum(distances_end[we.v] is not None for we in edges))
+            pruned += skipped
+            count_op += skipped
+        for we in edges:  # для каждого исходящего ребра этой вершины (которое состоит из u и v)
             # Есть ли до конца этого ребра существует путь из end
             if distances_end[we.v] is not None:
                 count_op += 1
                 if DEBUG:
                     print(f"\t\t\tРЕБРО {we}:")
-                if arc_flags:  # Включена оптимизация arc flags
+                if check_flags:  # Включена оптимизация arc flags
                     if not we.get_flag(end.k):  # Если это ребро не лежит на кратчайшем пути в регион вершины end
-                        print(
-                            f"\t\t\t(оптимизация arc flags) ребро пропущено, так не содержится в кратчайшим пути до региона '{end.k}'")
+                        if DEBUG:
+                            print(f"\t\t\t(оптимизация arc flags) ребро пропущено, "
+                                  f"так не содержится в кратчайшим пути до региона '{end.k}'")
+                        pruned += 1
+                        if space is not None:
+                            space.pruned.append(we.id)
                         continue  # пропустить его
+                if space is not None:
+                    space.relaxed.append(we.id)
                 path_length = distances_start[u] + we.weight + distances_end[
                     we.v]  # считаем продолжительность нового пути через вершину u
                 if path_length < best_path_length:  # Если новый путь короче предыдущего наилучшего пути
@@ -141,17 +198,31 @@ def dijkstra_bidirectional(weighted_graph: Graph, start: Vertex, end: Vertex, ar
                         print(f"\t\t\t! Найдена более короткий путь")
                         print(f"\t\t\tСтарая длина пути: {best_path_length}")
                         print(f"\t\t\tНовая длина пути: {path_length}")
-                        print(f"\t\t\tСтарый путь: {best_path}")
+                        print(f"\t\t\tНовое ребро пути: {we}")
                     best_path_length = path_length
-                    best_path = (path_dict_to_path(start_index, u, path_dict_start) +  # start -> u
-                                 [we] +  # u -> v
-                                 path_dict_to_path(end_index, we.v, path_dict_end, reverse=True))  # v -> end
-                    if DEBUG:
-                        print(f"\t\t\tНовый путь: {best_path}")
+                    best_edge = we
                 else:
                     if DEBUG:
                         print(f"\t\t\t Ребро не дает путь короче, отбрасываем")
 
+    if stats is not None:
+        t2 = time.perf_counter()
+        stats.repair_time += t2 - t1
+        stats.relaxed += count_op - count_op_search - pruned
+        stats.pruned += pruned
+
+    # Лучший маршрут
+    if best_edge is None:
+        best_path = (path_dict_to_path(start_index, connecting_vertex, path_dict_start) +  # start -> z
+                     path_dict_to_path(end_index, connecting_vertex, path_dict_end, reverse=True))  # z -> end
+    else:
+        best_path = (path_dict_to_path(start_index, best_edge.u, path_dict_start) +  # start -> u
+                     [best_edge] +  # u -> v
+                     path_dict_to_path(end_index, best_edge.v, path_dict_end, reverse=True))  # v -> end
+
+    if stats is not None:
+        stats.path_time += time.perf_counter() - t2
+
     if DEBUG:
         print("\n\t* Результат: ")
         print("\t\t Кратчайший путь из Los Angeles в Boston:")
@@ -0,0 +1,65 @@
+""" Поиск из одной вершины до всех вершин региона """
+from __future__ import annotations
+
+import time
+from array import array
+
+from algo.dijkstra.dijkstra import dijkstra_step
+from algo.dijkstra.structures import PriorityQueue, DijkstraNode, QueryStats, CancellationToken
+from algo.edge import Edge
+from algo.graph import Graph
+from algo.vertex import Vertex
+
+
+def region_vertices(weighted_graph: Graph, region: int) -> list[int]:
+    """ Индексы вершин региона по возрастанию """
+    return [i for i, vertex in enumerate(weighted_graph._vertices) if vertex.k == region]
+
+
+def dijkstra_to_region(weighted_graph: Graph, start: Vertex, region: int, arc_flags=True, *,
+                       stats: QueryStats = None,
+                       cancel: CancellationToken = None) -> tuple[list[int], array]:
+    """
+    Расстояния из start до каждой вершины региона.
+    Ребра без флага региона отбрасываются (arc_flags), поиск останавливается, как только исследованы
+    все вершины региона. Это дешевле, чем dijkstra до всех вершин графа или отдельный запрос до каждой вершины
+    :param weighted_graph: взвешенный граф (для arc_flags - после предобработки)
+    :param start: вершина начала поиска
+    :param region: регион целей
+    :param arc_flags: включить оптимизацию arc_flags
+    :param stats: статистика запроса, которую нужно заполнить (None - не собирать)
+    :param cancel: признак отмены, проверяется на каждом шаге (при отмене - исключение QueryCancelled)
+    :return: индексы вершин региона (region_vertices) и расстояния до них в том же порядке
+    (inf - вершина недостижима)
+    """
+    if stats is not None:
+        t0 = time.perf_counter()
+    targets = region_vertices(weighted_graph, region)
+    if not targets:
+        return targets, array('d')
+    # dijkstra_step берет регион для arc_flags из конечной вершины: подходит любая вершина региона
+    end = weighted_graph.vertex_at(targets[0])
+
+    start_index = weighted_graph.index_of(start)
+    distances: list[float | None] = [None] * weighted_graph.vertex_count
+    distances[start_index] = 0
+    path_dict: dict[int, Edge] = {}
+    priority_queue: PriorityQueue[DijkstraNode] = PriorityQueue()
+    priority_queue.push(DijkstraNode(start_index, 0))
+    if stats is not None:
+        stats.pushes += 1
+
+    settled: list[int] = []
+    remaining = len(targets)  # сколько вершин региона еще не исследовано
+    while remaining and not priority_queue.empty:
+        dijkstra_step(weighted_graph, priority_queue, distances, path_dict, arc_flags=arc_flags, end=end,
+                      stats=stats, settled=settled, cancel=cancel)
+        if settled:
+            if weighted_graph.vertex_at(settled[0]).k == region:
+                remaining -= 1
+            settled.clear()
+
+    result = array('d', (float('inf') if distances[i] is None else distances[i] for i in targets))
+    if stats is not None:
+        stats.search_time += time.perf_counter() - t0
+    return targets, result
@@ -1,27 +1,44 @@
 from __future__ import annotations
 
+import time
+from typing import Callable
+
 from algo.config import DEBUG
 from algo.dijkstra.dijkstra import dijkstra, dijkstra_step
-from algo.dijkstra.structures import WeightedPath, PriorityQueue, DijkstraNode
+from algo.dijkstra.structures import (WeightedPath, PriorityQueue, DijkstraNode, QueryStats, CancellationToken,
+                                      FrontierSnapshot, SNAPSHOT_STEPS, SearchSpace)
 from algo.dijkstra.utils import path_dict_to_path, print_weighted_path
 from algo.edge import Edge
 from algo.graph import Graph
-from algo.utils import clock
 from algo.vertex import Vertex
 
 
-@clock
-def dijkstra_unidirectional(weighted_graph: Graph, start: Vertex, end: Vertex, arc_flags=False) -> tuple[
-    float, WeightedPath, int]:
+def dijkstra_unidirectional(weighted_graph: Graph, start: Vertex, end: Vertex, arc_flags=False, *,
+                            stats: QueryStats = None,
+                            cancel: CancellationToken = None,
+                            on_snapshot: Callable[[FrontierSnapshot], None] = None,
+                            space: SearchSpace = None,
+                            bounds: bool = False,
+                            early_stop: bool = False) -> tuple[float, WeightedPath, int]:
     """
     Однонаправленный поиск кратчайшего пути используя алгоритм Дейкстры
     :param weighted_graph: взвешенный граф
     :param start: вершина начала поиска
     :param end: вершина конца поиска
     :param arc_flags: включить оптимизацию arc_flags
+    :param stats: статистика запроса, которую нужно заполнить (None - не собирать)
+    :param cancel: признак отмены, проверяется на каждом шаге (при отмене - исключение QueryCancelled)
+    :param on_snapshot: вызывается каждые SNAPSHOT_STEPS исследованных вершин со снимком хода поиска
+    :param space: пространство поиска, в которое записываются исследованные вершины и ребра (None - не записывать)
+    :param bounds: отбрасывать вершины по нижним оценкам расстояний между регионами (Graph.region_bounds)
+    и завершать поиск, как только расстояние до end окончательное (без таблицы оценок - обычный поиск)
+    :param early_stop: завершать поиск, как только расстояние до end окончательное, без отсечения по оценкам
+    (с ним сравнивается bounds=True: так видна доля экономии, которую дают сами оценки)
     :return: расстояние между вершинами, путь от начала до конца, количество операций
     """
     count_op = 0  # Счетчик кол-ва операций
+    if stats is not None:
+        t0 = time.perf_counter()
 
     if DEBUG:
         print("\t* Начало однонаправленного поиска")
@@ -35,6 +52,13 @@ def dijkstra_unidirectional(weighted_graph: Graph, start: Vertex, end: Vertex, a
     path_dict: dict[int, Edge] = {}  # Как добраться до каждой вершины
     priority_queue: PriorityQueue[DijkstraNode] = PriorityQueue()
     priority_queue.push(DijkstraNode(start_index, 0))
+    if stats is not None:
+        stats.pushes += 1
+    settled: list[int] | None = [] if on_snapshot is not None else None  # исследованные с прошлого снимка
+    # Нижние оценки расстояния от каждого региона до региона end
+    bounds_to_end = None
+    if bounds and weighted_graph.region_bounds is not None:
+        bounds_to_end = [row[end.k] for row in weighted_graph.region_bounds]
 
     if DEBUG:
         print(f"\n\tИНИЦИАЛИЗАЦИЯ")
@@ -49,13 +73,27 @@ def dijkstra_unidirectional(weighted_graph: Graph, start: Vertex, end: Vertex, a
             step += 1
             print(f"\n\tШАГ №{step}")
         # Вызвать шаг алгоритма Дейкстры и прибавить количество выполненных операций
-        count_op += dijkstra_step(weighted_graph, priority_queue, distances, path_dict, arc_flags=arc_flags, end=end)
+        count_op += dijkstra_step(weighted_graph, priority_queue, distances, path_dict, arc_flags=arc_flags, end=end,
+                                  stats=stats, settled=settled, cancel=cancel, space=space,
+                                  bounds=bounds_to_end, end_index=end_index)
+        # С оценками (или early_stop) поиск завершается, когда в очереди не осталось вершин ближе известного
+        # расстояния до end
+        done = ((early_stop or bounds_to_end is not None) and distances[end_index] is not None and
+                (priority_queue.empty or priority_queue.peek().distance >= distances[end_index]))
+        if settled is not None and (len(settled) >= SNAPSHOT_STEPS or priority_queue.empty or done):
+            on_snapshot(FrontierSnapshot(settled, priority_queue.vertices()))
+            settled = []
+        if done:
+            break
         if DEBUG:
             print(f"\tРасстояния до каждой вершины: {distances}")
             print(f"\tОчередь с приоритетом: {priority_queue}")
             print(f"\tСловарь путей: {path_dict}")
 
     distance = distances[end_index]  # получить расстояние конкретно до end
+    if stats is not None:
+        t1 = time.perf_counter()
+        stats.search_time += t1 - t0
 
     if DEBUG:
         print("\n\t* Результат: ")
@@ -66,6 +104,8 @@ def dijkstra_unidirectional(weighted_graph: Graph, start: Vertex, end: Vertex, a
         distance, path = float('inf'), []
     else:
         path: WeightedPath = path_dict_to_path(start_index, end_index, path_dict)
+        if stats is not None:
+            stats.path_time += time.perf_counter() - t1
         if DEBUG:
             print("\t\t Кратчайший путь из Los Angeles в Boston:")
             print('\t\t ', end='')
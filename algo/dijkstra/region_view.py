@@ -0,0 +1,71 @@
+"""
+Отфильтрованные списки смежности регионов для запросов arc_flags.
+
+Для региона r в компактном виде (CSR) хранятся только ребра, у которых стоит флаг r.
+Запрос arc_flags к вершине региона r перебирает только эти ребра и флаги не проверяет.
+Память ограничивается тем, что представления строятся только для самых популярных регионов
+"""
+from __future__ import annotations
+
+import sys
+from array import array
+from collections import Counter
+from typing import Iterable
+
+from algo.edge import Edge
+from algo.graph import Graph
+
+
+class RegionView:
+    """
+    Ребра с флагом региона: выходящие из вершин (для прямого поиска) и входящие в вершины (для обратного).
+    Ребра вершины u - срез edges[starts[u]:starts[u + 1]]
+    """
+
+    def __init__(self, graph: Graph, region: int) -> None:
+        self.region = region
+        self.starts, self.edges = self._compact(graph, graph.edges_of_index)
+        self.reverse_starts, self.reverse_edges = self._compact(graph, graph.reversed_edges_of_index)
+
+    def _compact(self, graph: Graph, edges_of) -> tuple[array, list[Edge]]:
+        starts = array('q', [0])
+        edges: list[Edge] = []
+        region = self.region
+        for u in range(graph.vertex_count):
+            edges += [edge for edge in edges_of(u) if edge.get_flag(region)]
+            starts.append(len(edges))
+        return starts, edges
+
+    def edges_of(self, u: int) -> list[Edge]:
+        """ Выходящие из вершины ребра с флагом региона """
+        return self.edges[self.starts[u]:self.starts[u + 1]]
+
+    def reversed_edges_of(self, u: int) -> list[Edge]:
+        """ Входящие в вершину ребра с флагом региона """
+        return self.reverse_edges[self.reverse_starts[u]:self.reverse_starts[u + 1]]
+
+    @property
+    def memory(self) -> int:
+        """ Занимаемая память в байтах (массивы смещений и списки ссылок на ребра; сами ребра общие с графом) """
+        return sum(sys.getsizeof(part) for part in (self.starts, self.edges, self.reverse_starts, self.reverse_edges))
+
+
+def hottest_regions(graph: Graph, targets: Iterable[int], limit: int) -> list[int]:
+    """
+    Регионы, к которым чаще всего идут запросы
+    :param graph: граф
+    :param targets: индексы конечных вершин запросов
+    :param limit: сколько регионов вернуть
+    """
+    counts = Counter(graph.vertex_at(t).k for t in targets)
+    return [region for region, _ in counts.most_common(limit)]
+
+
+def build_region_views(graph: Graph, regions: Iterable[int]) -> int:
+    """
+    Построить представления для регионов (после предобработки arc_flags) и подключить их к графу
+    вместо прежних. Запросы arc_flags к остальным регионам проверяют флаги как обычно
+    :return: память всех представлений в байтах
+    """
+    graph.region_views = {region: RegionView(graph, region) for region in regions}
+    return sum(view.memory for view in graph.region_views.values())
@@ -0,0 +1,147 @@
+"""
+Возобновляемый поиск из одной вершины во многие.
+
+Когда из одного источника (например, склада) запрашиваются расстояния до многих целей по очереди,
+поиск не начинается заново: очередь с приоритетом, расстояния и словарь путей сохраняются между запросами.
+Если цель уже исследована, ответ готов сразу, иначе поиск продолжается ровно до исследования цели.
+N запросов из одного источника стоят примерно как один поиск.
+
+SearchPool хранит поиски для разных источников и ограничивает память: не больше max_searches поисков
+(вытесняется давно не использованный) и поиски, не использованные idle_seconds, удаляются.
+Оптимизация arc_flags не применяется - флаги зависят от региона цели, а поиск общий для всех целей
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+
+from algo.dijkstra.dijkstra import dijkstra_step
+from algo.dijkstra.structures import WeightedPath, PriorityQueue, DijkstraNode, QueryStats, CancellationToken
+from algo.dijkstra.utils import path_dict_to_path
+from algo.edge import Edge
+from algo.graph import Graph
+from algo.metrics import METRICS, MetricsRegistry
+from algo.vertex import Vertex
+
+
+class ResumableSearch:
+    """ Поиск Дейкстры из source, который продолжается по мере запросов новых целей """
+
+    def __init__(self, weighted_graph: Graph, source: Vertex) -> None:
+        self.graph = weighted_graph
+        self.version = weighted_graph.version  # версия графа, для которой верны сохраненные расстояния
+        self.source_index = weighted_graph.index_of(source)
+        self.distances: list[float | None] = [None] * weighted_graph.vertex_count
+        self.distances[self.source_index] = 0
+        self.path_dict: dict[int, Edge] = {}
+        self.queue: PriorityQueue[DijkstraNode] = PriorityQueue()
+        self.queue.push(DijkstraNode(self.source_index, 0))
+        self.settled: set[int] = set()  # исследованные вершины (расстояние до них окончательное)
+
+    @property
+    def stale(self) -> bool:
+        """ Граф изменился после начала поиска - сохраненные расстояния могут быть неверны """
+        return self.version != self.graph.version
+
+    @property
+    def finished(self) -> bool:
+        """ Исследованы все достижимые вершины """
+        return self.queue.empty
+
+    def advance(self, target_index: int, *, stats: QueryStats = None, cancel: CancellationToken = None) -> int:
+        """
+        Продолжить поиск, пока вершина target_index не будет исследована (или пока очередь не опустеет)
+        :return: количество операций
+        """
+        count_op = 0
+        while target_index not in self.settled and not self.queue.empty:
+            count_op += dijkstra_step(self.graph, self.queue, self.distances, self.path_dict, visited=self.settled,
+                                      stats=stats, cancel=cancel)
+        return count_op
+
+    def query(self, end: Vertex, *, stats: QueryStats = None,
+              cancel: CancellationToken = None) -> tuple[float, WeightedPath, int]:
+        """
+        Кратчайший путь из источника в end
+        :param end: вершина конца поиска
+        :param stats: статистика запроса (учитывается только продолжение поиска)
+        :param cancel: признак отмены (после QueryCancelled поиск можно продолжить следующим запросом)
+        :return: расстояние, путь от источника до end, количество операций
+        """
+        if stats is not None:
+            t0 = time.perf_counter()
+        end_index = self.graph.index_of(end)
+        count_op = self.advance(end_index, stats=stats, cancel=cancel)
+        if stats is not None:
+            t1 = time.perf_counter()
+            stats.search_time += t1 - t0
+
+        if end_index not in self.settled:
+            return float('inf'), [], count_op
+        path = path_dict_to_path(self.source_index, end_index, self.path_dict)
+        if stats is not None:
+            stats.path_time += time.perf_counter() - t1
+        return self.distances[end_index], path, count_op
+
+
+class SearchPool:
+    """
+    Возобновляемые поиски по источникам. Обращения записываются в метрики как кэш 'resumable_search':
+    попадание - поиск из этого источника уже был (даже если его пришлось продолжить)
+    """
+
+    def __init__(self, weighted_graph: Graph, max_searches: int = 16, idle_seconds: float = 300.0,
+                 registry: MetricsRegistry | None = None) -> None:
+        """
+        :param weighted_graph: граф
+        :param max_searches: сколько поисков хранить одновременно (каждый - O(количество вершин) памяти)
+        :param idle_seconds: через сколько секунд без обращений поиск удаляется
+        :param registry: куда записывать попадания и промахи (по умолчанию METRICS)
+        """
+        self.graph = weighted_graph
+        self.max_searches = max_searches
+        self.idle_seconds = idle_seconds
+        self.registry = registry if registry is not None else METRICS
+        self._searches: OrderedDict[int, tuple[ResumableSearch, float]] = OrderedDict()  # от давних к недавним
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._searches)
+
+    def query(self, start: Vertex, end: Vertex, *, stats: QueryStats = None,
+              cancel: CancellationToken = None) -> tuple[float, WeightedPath, int]:
+        """ Кратчайший путь из start в end: продолжение сохраненного поиска из start или новый поиск """
+        with self._lock:
+            now = time.monotonic()
+            self._evict_idle(now)
+            source = self.graph.index_of(start)
+            search, _ = self._searches.pop(source, (None, None))
+            hit = search is not None and not search.stale
+            if not hit:
+                search = ResumableSearch(self.graph, start)
+            self.registry.record_cache('resumable_search', hit)
+            self._searches[source] = (search, now)
+            while len(self._searches) > self.max_searches:
+                self._searches.popitem(last=False)
+            # Отмена проверяется до извлечения вершины из очереди, поэтому отмененный поиск можно продолжать
+            return search.query(end, stats=stats, cancel=cancel)
+
+    def evict_idle(self) -> int:
+        """ Удалить поиски, не использованные idle_seconds, и вернуть их количество """
+        with self._lock:
+            return self._evict_idle(time.monotonic())
+
+    def _evict_idle(self, now: float) -> int:
+        evicted = 0
+        while self._searches:
+            source, (_, used) = next(iter(self._searches.items()))
+            if now - used < self.idle_seconds:
+                break
+            del self._searches[source]
+            evicted += 1
+        return evicted
+
+    def clear(self) -> None:
+        with self._lock:
+            self._searches.clear()
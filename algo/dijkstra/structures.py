@@ -1,8 +1,10 @@
 """ Структуры данных для алгоритма Дейкстры """
 from __future__ import annotations
 
+import threading
 from _heapq import heappush, heappop
-from dataclasses import dataclass
+from array import array
+from dataclasses import dataclass, field
 from typing import TypeVar, Generic
 
 from algo.edge import Edge
@@ -34,6 +36,14 @@ class PriorityQueue(Generic[T]):
         # Если простая очередь
         # return self._container.pop(0)
 
+    def peek(self) -> T:
+        """ Элемент с наименьшим приоритетом (без извлечения) """
+        return self._container[0]
+
+    def vertices(self) -> list[int]:
+        """ Вершины в очереди (фронт поиска), без учета порядка """
+        return [node.vertex for node in self._container]
+
     def __repr__(self):
         return repr(self._container)
 
@@ -50,4 +60,76 @@ class DijkstraNode:
         return self.distance < other.distance
 
 
+@dataclass
+class QueryStats:
+    """
+    Статистика одного запроса. Заполняется, только если передана в функцию поиска (параметр stats),
+    иначе счетчики не собираются и время не замеряется
+    """
+    settled: int = 0  # исследовано вершин (извлечены из очереди с актуальным расстоянием)
+    relaxed: int = 0  # рассмотрено ребер (проверено условие Дейкстры)
+    pruned: int = 0  # ребер отброшено оптимизацией arc_flags
+    bound_pruned: int = 0  # вершин отброшено по нижним оценкам расстояний между регионами
+    pushes: int = 0  # добавлений в очередь с приоритетом
+    pops: int = 0  # извлечений из очереди с приоритетом
+    stale_pops: int = 0  # извлечено устаревших записей (до вершины уже найден путь короче)
+    search_time: float = 0.0  # время поиска, секунды
+    repair_time: float = 0.0  # время поиска лучшего пути через место встречи (двунаправленный поиск)
+    path_time: float = 0.0  # время построения маршрута по словарю путей
+
+    @property
+    def total_time(self) -> float:
+        """ Суммарное время всех этапов """
+        return self.search_time + self.repair_time + self.path_time
+
+
+@dataclass
+class SearchSpace:
+    """
+    Пространство поиска одного запроса. Записывается, только если передано в функцию поиска (параметр space).
+    Хранятся индексы вершин и номера ребер (Edge.id) в компактных массивах array('q')
+    """
+    settled: array = field(default_factory=lambda: array('q'))  # исследованные вершины в порядке исследования
+    settled_reverse: array = field(default_factory=lambda: array('q'))  # то же для обратного поиска (от конца)
+    relaxed: array = field(default_factory=lambda: array('q'))  # рассмотренные ребра
+    pruned: array = field(default_factory=lambda: array('q'))  # ребра, отброшенные arc_flags
+
+
+class QueryCancelled(Exception):
+    """ Поиск прерван через CancellationToken """
+
+
+class CancellationToken:
+    """
+    Признак отмены поиска. cancel() вызывается из любого потока,
+    а функция поиска проверяет признак на каждом шаге (check) и прерывается исключением QueryCancelled
+    """
+
+    def __init__(self) -> None:
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def check(self) -> None:
+        """ Выбросить QueryCancelled, если поиск отменен """
+        if self._event.is_set():
+            raise QueryCancelled()
+
+
+@dataclass
+class FrontierSnapshot:
+    """ Снимок хода поиска: какие вершины исследованы с прошлого снимка и какие сейчас во фронте (в очереди) """
+    settled: list[int] = field(default_factory=list)  # индексы вершин, исследованных с прошлого снимка
+    frontier: list[int] = field(default_factory=list)  # индексы вершин в очереди
+    reverse: bool = False  # снимок обратного поиска (от конечной вершины) в двунаправленном поиске
+
+
+SNAPSHOT_STEPS = 256  # Через сколько исследованных вершин делается снимок хода поиска
+
+
 WeightedPath = list[Edge]  # Обозначение WeightedPath (маршрут) как список ребер
@@ -2,11 +2,12 @@ from __future__ import annotations
 
 
 class Edge:
-    def __init__(self, u, v, weight, k):
+    def __init__(self, u, v, weight, k, id=None):
         self.u = u  # Откуда, Начало
         self.v = v  # Куда, Конец
         self.weight = weight  # Вес ребра
         self._flags = [False] * k  # Флаги ребра для каждого региона
+        self.id = id  # Постоянный номер ребра в графе (выдается графом при добавлении, если не задан)
 
     def reversed(self) -> Edge:
         """ Возвращает обратное ребро """
@@ -16,6 +17,10 @@ class Edge:
         """ Поставить n-ый флаг равным True"""
         self._flags[n] = True
 
+    def clear_flag(self, n):
+        """ Поставить n-ый флаг равным False"""
+        self._flags[n] = False
+
     def get_flag(self, bit) -> bool:
         """ Получить значение n-ого флага"""
         return self._flags[bit]
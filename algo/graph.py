@@ -1,20 +1,41 @@
 from functools import reduce
 from operator import add
-from typing import List, Tuple
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
 from algo.edge import Edge
 from algo.vertex import Vertex
 
 
 class Graph:
-    def __init__(self, k: int, vertices: List[Vertex] = []) -> None:
+    def __init__(self, k: int, vertices: Optional[List[Vertex]] = None) -> None:
         # _vertices - список вершин графа
-        self._vertices: List[Vertex] = vertices
+        self._vertices: List[Vertex] = vertices if vertices is not None else []
+        vertices = self._vertices
+        # _index - индекс каждой вершины, чтобы не искать ее в списке (для одинаковых вершин - первый индекс)
+        self._index: Dict[Vertex, int] = {}
+        for i, vertex in enumerate(vertices):
+            self._index.setdefault(vertex, i)
 
         # Используются списки смежности (_edges), у каждой вершины есть список выходящих ребер
         # с которыми она связана с другими вершинами
         self._edges: List[List[Edge]] = [[] for _ in vertices]  # список исходящих из вершин ребер
         self._reverse_edges: List[List[Edge]] = [[] for _ in vertices]  # список входящих в вершину ребер
+        # _edges_by_id - ребра по постоянным номерам (номер ребра не меняется при удалении других ребер)
+        self._edges_by_id: Dict[int, Edge] = {}
+        self._next_edge_id = 0
+        # region_views - отфильтрованные списки смежности регионов (algo.dijkstra.region_view),
+        # сбрасываются при изменении ребер
+        self.region_views: Dict[int, object] = {}
+        # version - номер изменения графа (увеличивается при добавлении вершин и изменении ребер),
+        # по нему сохраненные результаты поиска понимают, что устарели
+        self.version = 0
+        # region_bounds - нижние оценки расстояний между регионами K x K (заполняются предобработкой arc_flags,
+        # None - не посчитаны или устарели после добавления ребра)
+        self.region_bounds: Optional[List[List[float]]] = None
+        # stale_regions - регионы, флаги которых устарели после изменения весов (запросы к ним флаги не используют),
+        # для каждого - номер последней отметки (восстановление снимает отметку, только если она не менялась)
+        self.stale_regions: Dict[int, int] = {}
+        self._stale_mark = 0
 
         self.K = k  # Количество регионов
 
@@ -26,32 +47,88 @@ class Graph:
     @property
     def edges_count(self) -> int:
         """ Количество ребер """
-        return len(self._edges)
+        return len(self._edges_by_id)
 
     def add_vertex(self, vertex: Vertex) -> int:
         """ Добавить новую вершину и возвращаем ее индекс """
         self._vertices.append(vertex)
         self._edges.append([])  # Добавляем пустой список для ребер
+        self._reverse_edges.append([])  # и для входящих ребер
+        self._index.setdefault(vertex, self.vertex_count - 1)
+        self.version += 1
         return self.vertex_count - 1  # Возвращаем индекс по добавленным вершинам
 
-    def add_edge(self, edge: Edge) -> None:
-        """ Добавить новое ребро """
+    def add_edge(self, edge: Edge) -> int:
+        """ Добавить новое ребро и вернуть его номер (если номер у ребра не задан, выдается следующий свободный) """
+        if edge.id is None:
+            edge.id = self._next_edge_id
+        elif edge.id in self._edges_by_id:
+            raise ValueError(f"Edge id {edge.id} is already in graph")
+        self._next_edge_id = max(self._next_edge_id, edge.id + 1)
+        self.region_views.clear()
+        self.region_bounds = None  # новое ребро может сократить расстояния
+        self.version += 1
+        self._edges_by_id[edge.id] = edge
         self._edges[edge.u].append(edge)  # из u выходит edge
         self._reverse_edges[edge.v].append(edge)  # в v входит edge
 
         # Нижние строчки отвечают за то, что граф двунаправленный
         # self._edges[edge.v].append(edge.reversed())  # из v выходит reversed edge
         # self._reverse_edges[edge.u].append(edge.reversed())  # в u входит reversed edge
+        return edge.id
 
-    def add_edge_by_indices(self, u: int, v: int, weight: float) -> None:
+    def add_edge_by_indices(self, u: int, v: int, weight: float, edge_id: Optional[int] = None) -> int:
         """ Добавить ребро между двумя вершинами по индексам """
-        self.add_edge(Edge(u, v, weight, self.K))
+        return self.add_edge(Edge(u, v, weight, self.K, edge_id))
 
-    def add_edge_by_vertices(self, first: Vertex, second: Vertex, weight: float) -> None:
+    def add_edge_by_vertices(self, first: Vertex, second: Vertex, weight: float) -> int:
         """ Добавить ребро между двумя вершинами в графе first и second """
-        u: int = self._vertices.index(first)
-        v: int = self._vertices.index(second)
-        self.add_edge_by_indices(u, v, weight)
+        u: int = self.index_of(first)
+        v: int = self.index_of(second)
+        return self.add_edge_by_indices(u, v, weight)
+
+    def edge_by_id(self, edge_id: int) -> Edge:
+        """ Найти ребро по постоянному номеру """
+        try:
+            return self._edges_by_id[edge_id]
+        except KeyError:
+            raise ValueError(f"Edge id {edge_id} is not in graph") from None
+
+    def remove_edge(self, edge_id: int) -> Edge:
+        """ Удалить ребро по постоянному номеру (номера остальных ребер не меняются) """
+        edge = self.edge_by_id(edge_id)
+        del self._edges_by_id[edge_id]
+        self.region_views.clear()
+        self.version += 1
+        self._edges[edge.u].remove(edge)
+        self._reverse_edges[edge.v].remove(edge)
+        return edge
+
+    def update_weights(self, changes: Iterable[Tuple[int, float]]) -> Set[int]:
+        """
+        Изменить веса ребер пакетом (номер ребра, новый вес). Флаги регионов, на которые изменения
+        могут повлиять, помечаются устаревшими (stale_regions) до восстановления repair_arc_flags
+        :return: регионы, помеченные устаревшими
+        """
+        from algo.dijkstra.arc_flags import update_weights  # arc_flags сам зависит от Graph
+        return update_weights(self, changes)
+
+    def mark_stale(self, regions: Iterable[int]) -> None:
+        """ Пометить флаги регионов устаревшими """
+        for region in regions:
+            self._stale_mark += 1
+            self.stale_regions[region] = self._stale_mark
+            self.region_views.pop(region, None)
+
+    def clear_stale(self, mark: int) -> None:
+        """
+        Снять пометку с регионов, флаги которых построены заново: кроме помеченных устаревшими после mark
+        (значение _stale_mark до начала построения), их флаги могли быть построены по старым весам
+        """
+        for region, region_mark in list(self.stale_regions.items()):
+            if region_mark <= mark:
+                del self.stale_regions[region]
+        self.region_views.clear()
 
     def vertex_at(self, i: int) -> Vertex:
         """ Вернуть вершину под индексом (Поиск вершины по индексу) """
@@ -59,7 +136,10 @@ class Graph:
 
     def index_of(self, vertex: Vertex) -> int:
         """ Найти индекс вершины """
-        return self._vertices.index(vertex)
+        try:
+            return self._index[vertex]
+        except KeyError:
+            raise ValueError(f"{vertex!r} is not in graph") from None
 
     def neighbors_of_index(self, index: int) -> List[Vertex]:
         """ Получить соседей вершины по индексу """
@@ -0,0 +1,287 @@
+"""
+Чтение и запись графов в файлы: JSON (формат GUI) и бинарный формат .npz.
+NumPy импортируется при первом обращении к массивам: load_graph для JSON строит Graph без NumPy
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+from dataclasses import dataclass, field, replace
+from typing import TYPE_CHECKING
+
+from algo.graph import Graph
+from algo.vertex import Vertex
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Цвета регионов в порядке номеров регионов (совпадают с gui.config.COLORS)
+REGION_COLORS: list[tuple[int, int, int]] = [
+    (255, 0, 0),
+    (0, 255, 0),
+    (0, 0, 255),
+    (0, 255, 255),
+    (255, 0, 255),
+    (255, 255, 0),
+    (0, 0, 0),
+    (255, 255, 255),
+]
+
+JSON_CHUNK = 65536  # Сколько строк массива записывается в JSON за один раз
+
+
+@dataclass
+class GraphData:
+    """ Граф в виде массивов: так его удобно генерировать, сохранять и загружать """
+    pos: np.ndarray  # (N, 2) координаты вершин
+    adj: np.ndarray  # (M, 2) ориентированные ребра (u, v)
+    regions: np.ndarray  # (N,) номер региона каждой вершины
+    texts: list[str] | None = field(default=None)  # названия вершин (None - "Point i")
+    edge_ids: np.ndarray | None = field(default=None)  # (M,) постоянные номера ребер (None - номера строк adj)
+    arc_flags: np.ndarray | None = field(default=None)  # (M, K) флаги ребер после предобработки (None - нет)
+    region_bounds: np.ndarray | None = field(default=None)  # (K, K) нижние оценки расстояний между регионами
+    # (N,) исходные номера вершин после перестановки algo.reorder (None - номера строк pos)
+    vertex_ids: np.ndarray | None = field(default=None)
+
+    @property
+    def vertex_count(self) -> int:
+        return len(self.pos)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.adj)
+
+    @property
+    def k(self) -> int:
+        """ Количество регионов """
+        return int(self.regions.max()) + 1 if len(self.regions) else 1
+
+    def weights(self) -> np.ndarray:
+        """ Веса ребер - евклидовы длины отрезков """
+        return edge_lengths(self.pos, self.adj)
+
+    def ids(self) -> np.ndarray:
+        """ Постоянные номера ребер в порядке строк adj """
+        import numpy as np
+        return self.edge_ids if self.edge_ids is not None else np.arange(self.edge_count, dtype=np.int64)
+
+    def original_ids(self) -> np.ndarray:
+        """ Исходные номера вершин в порядке строк pos """
+        import numpy as np
+        return self.vertex_ids if self.vertex_ids is not None else np.arange(self.vertex_count, dtype=np.int64)
+
+    def text_at(self, i: int) -> str:
+        if self.texts is not None:
+            return self.texts[i]
+        return f"Point {self.vertex_ids[i] if self.vertex_ids is not None else i}"
+
+    def to_graph(self, k: int | None = None) -> Graph:
+        """ Построить Graph для алгоритмов поиска """
+        k = max(self.k, k or 0)
+        vertices = [Vertex(self.text_at(i), int(r)) for i, r in enumerate(self.regions.tolist())]
+        graph = Graph(k=k, vertices=vertices)
+        for (u, v), weight, edge_id in zip(self.adj.tolist(), self.weights().tolist(), self.ids().tolist()):
+            graph.add_edge_by_indices(u, v, weight, edge_id)
+        # Сохраненная предобработка подходит, только если количество регионов то же
+        if self.arc_flags is not None and self.arc_flags.shape[1] == k:
+            for edge_id, flags in zip(self.ids().tolist(), self.arc_flags.tolist()):
+                graph.edge_by_id(edge_id)._flags = flags
+            if self.region_bounds is not None:
+                graph.region_bounds = self.region_bounds.tolist()
+        return graph
+
+    def with_arc_flags(self, graph: Graph) -> GraphData:
+        """ Копия с флагами ребер и оценками расстояний между регионами из предобработанного graph """
+        import numpy as np
+        arc_flags = np.array([graph.edge_by_id(edge_id)._flags for edge_id in self.ids().tolist()],
+                             dtype=bool).reshape(-1, graph.K)
+        bounds = np.array(graph.region_bounds, dtype=np.float64) if graph.region_bounds is not None else None
+        return replace(self, arc_flags=arc_flags, region_bounds=bounds)
+
+    def fingerprint(self) -> str:
+        """ Хеш всего, от чего зависит предобработка (координаты, ребра, номера ребер, регионы) """
+        import numpy as np
+        digest = hashlib.sha256()
+        for array in (self.pos.astype(np.float64), self.adj.astype(np.int64), self.ids().astype(np.int64),
+                      self.regions.astype(np.int64)):
+            digest.update(str(array.shape).encode())
+            digest.update(np.ascontiguousarray(array).tobytes())
+        return digest.hexdigest()
+
+
+def edge_lengths(pos: np.ndarray, adj: np.ndarray) -> np.ndarray:
+    """ Евклидовы длины ребер adj при координатах вершин pos """
+    import numpy as np
+    if len(adj) == 0:
+        return np.zeros(0, dtype=np.float64)
+    delta = pos[adj[:, 1]] - pos[adj[:, 0]]
+    # Не np.hypot: умножение, сложение и корень округляются одинаково в NumPy и в math,
+    # поэтому graph_from_json (без NumPy) получает те же веса до последнего бита
+    return np.sqrt(delta[:, 0] * delta[:, 0] + delta[:, 1] * delta[:, 1])
+
+
+def save_json(data: GraphData, path: str) -> None:
+    """
+    Сохранить граф в JSON формата GUI (pos, adj, edge_ids, points_colors, texts и, если есть, arc_flags,
+    region_bounds и vertex_ids). Массивы пишутся в файл кусками, без построения одного большого списка Python
+    """
+    import numpy as np
+    if data.k > len(REGION_COLORS):
+        raise ValueError(f"В JSON можно сохранить не более {len(REGION_COLORS)} регионов (по числу цветов), "
+                         f"а в графе их {data.k}. Используйте формат .npz")
+
+    colors = np.array(REGION_COLORS, dtype=np.int64)[data.regions]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"pos": ')
+        _write_json_array(f, data.pos)
+        f.write(', "adj": ')
+        _write_json_array(f, data.adj)
+        f.write(', "edge_ids": ')
+        _write_json_array(f, data.ids())
+        if data.vertex_ids is not None:
+            f.write(', "vertex_ids": ')
+            _write_json_array(f, data.vertex_ids)
+        f.write(', "points_colors": ')
+        _write_json_array(f, colors)
+        if data.arc_flags is not None:
+            f.write(', "arc_flags": ')
+            _write_json_array(f, data.arc_flags.astype(np.int8))
+        if data.region_bounds is not None:
+            f.write(', "region_bounds": ')
+            _write_json_array(f, data.region_bounds)
+        f.write(', "texts": [')
+        for start in range(0, data.vertex_count, JSON_CHUNK):
+            end = min(start + JSON_CHUNK, data.vertex_count)
+            if start:
+                f.write(", ")
+            f.write(", ".join(json.dumps(data.text_at(i), ensure_ascii=False) for i in range(start, end)))
+        f.write("]}")
+
+
+def _write_json_array(f, array: np.ndarray) -> None:
+    """ Записать массив в JSON по частям """
+    f.write("[")
+    for start in range(0, len(array), JSON_CHUNK):
+        if start:
+            f.write(", ")
+        f.write(json.dumps(array[start:start + JSON_CHUNK].tolist())[1:-1])
+    f.write("]")
+
+
+def load_json(path: str) -> GraphData:
+    """ Загрузить граф из JSON формата GUI """
+    import numpy as np
+    with open(path, "r", encoding="utf-8") as f:
+        graph_data = json.load(f)
+    color_index = {color: i for i, color in enumerate(REGION_COLORS)}
+    regions = np.array([color_index[tuple(color)] for color in graph_data["points_colors"]], dtype=np.int64)
+    adj = np.array(graph_data["adj"], dtype=np.int64).reshape(-1, 2)
+    edge_ids = np.array(graph_data["edge_ids"], dtype=np.int64) if "edge_ids" in graph_data else None
+    vertex_ids = np.array(graph_data["vertex_ids"], dtype=np.int64) if "vertex_ids" in graph_data else None
+    arc_flags = (np.array(graph_data["arc_flags"], dtype=bool).reshape(len(adj), -1)
+                 if "arc_flags" in graph_data else None)
+    region_bounds = np.array(graph_data["region_bounds"], dtype=np.float64) if "region_bounds" in graph_data else None
+    return GraphData(pos=np.array(graph_data["pos"], dtype=np.float64).reshape(-1, 2),
+                     adj=adj,
+                     regions=regions,
+                     texts=list(graph_data.get("texts", [])) or None,
+                     edge_ids=edge_ids,
+                     vertex_ids=vertex_ids,
+                     arc_flags=arc_flags,
+                     region_bounds=region_bounds)
+
+
+def save_npz(data: GraphData, path: str) -> None:
+    """
+    Сохранить граф в бинарный формат .npz.
+    Кроме массивов pos, adj, edge_ids и regions записываются веса ребер (weights) и, если есть,
+    arc_flags, region_bounds и vertex_ids. Названия вершин не сохраняются
+    """
+    import numpy as np
+    arrays = {
+        "pos": data.pos.astype(np.float64, copy=False),
+        "adj": data.adj.astype(np.int64, copy=False),
+        "edge_ids": data.ids().astype(np.int64, copy=False),
+        "regions": data.regions.astype(np.int32, copy=False),
+        "weights": data.weights(),
+    }
+    if data.arc_flags is not None:
+        arrays["arc_flags"] = data.arc_flags.astype(bool, copy=False)
+    if data.vertex_ids is not None:
+        arrays["vertex_ids"] = data.vertex_ids.astype(np.int64, copy=False)
+    if data.region_bounds is not None:
+        arrays["region_bounds"] = data.region_bounds.astype(np.float64, copy=False)
+    with open(path, "wb") as f:
+        np.savez(f, **arrays)
+
+
+def load_npz(path: str) -> GraphData:
+    """ Загрузить граф из бинарного формата .npz """
+    import numpy as np
+    with np.load(path) as arrays:
+        optional = {name: arrays[name] for name in ("edge_ids", "arc_flags", "region_bounds", "vertex_ids")
+                    if name in arrays.files}
+        return GraphData(pos=arrays["pos"], adj=arrays["adj"], regions=arrays["regions"].astype(np.int64), **optional)
+
+
+def load_dimacs(graph_path: str, coordinates_path: str) -> GraphData:
+    """
+    Загрузить граф в формате DIMACS (9th DIMACS Challenge): ребра "a u v w" из graph_path (.gr)
+    и координаты "v id x y" из coordinates_path (.co), вершины нумеруются с 1.
+    Веса из файла не сохраняются - в GraphData вес ребра равен евклидовой длине, все вершины в регионе 0
+    """
+    import numpy as np
+    def lines(path: str, tag: str):
+        with open(path, "r", encoding="ascii") as f:
+            yield from (line for line in f if line.startswith(tag))
+
+    coordinates = np.loadtxt(lines(coordinates_path, "v "), usecols=(1, 2, 3), dtype=np.float64, ndmin=2)
+    pos = np.zeros((len(coordinates), 2), dtype=np.float64)
+    pos[coordinates[:, 0].astype(np.int64) - 1] = coordinates[:, 1:]
+    adj = np.loadtxt(lines(graph_path, "a "), usecols=(1, 2), dtype=np.int64, ndmin=2).reshape(-1, 2) - 1
+    return GraphData(pos=pos, adj=adj, regions=np.zeros(len(pos), dtype=np.int64))
+
+
+def save_graph_data(data: GraphData, path: str) -> None:
+    """ Сохранить граф, формат выбирается по расширению файла (.json или .npz) """
+    if path.endswith(".npz"):
+        save_npz(data, path)
+    else:
+        save_json(data, path)
+
+
+def load_graph_data(path: str) -> GraphData:
+    """ Загрузить граф, формат выбирается по расширению файла (.json или .npz) """
+    if path.endswith(".npz"):
+        return load_npz(path)
+    return load_json(path)
+
+
+def graph_from_json(graph_data: dict, k: int | None = None) -> Graph:
+    """ Построить Graph из разобранного JSON формата GUI без NumPy (результат тот же, что у load_json + to_graph) """
+    color_index = {color: i for i, color in enumerate(REGION_COLORS)}
+    regions = [color_index[tuple(color)] for color in graph_data["points_colors"]]
+    k = max(max(regions, default=0) + 1, k or 0)
+    texts = graph_data.get("texts") or [f"Point {i}" for i in graph_data.get("vertex_ids", range(len(regions)))]
+    graph = Graph(k=k, vertices=[Vertex(text, region) for text, region in zip(texts, regions)])
+    pos, adj = graph_data["pos"], graph_data["adj"]
+    edge_ids = graph_data.get("edge_ids", range(len(adj)))
+    for (u, v), edge_id in zip(adj, edge_ids):
+        dx, dy = pos[v][0] - pos[u][0], pos[v][1] - pos[u][1]
+        graph.add_edge_by_indices(u, v, math.sqrt(dx * dx + dy * dy), edge_id)
+    arc_flags = graph_data.get("arc_flags")
+    if arc_flags is not None and len(arc_flags) and len(arc_flags[0]) == k:
+        for edge_id, flags in zip(edge_ids, arc_flags):
+            graph.edge_by_id(edge_id)._flags = [bool(flag) for flag in flags]
+        if "region_bounds" in graph_data:
+            graph.region_bounds = [[float(bound) for bound in row] for row in graph_data["region_bounds"]]
+    return graph
+
+
+def load_graph(path: str, k: int | None = None) -> Graph:
+    """ Загрузить граф из файла сразу в виде Graph (JSON читается без NumPy) """
+    if path.endswith(".npz"):
+        return load_npz(path).to_graph(k)
+    with open(path, "r", encoding="utf-8") as f:
+        return graph_from_json(json.load(f), k)
@@ -0,0 +1,228 @@
+"""
+Метрики запросов и предобработки.
+
+Для каждого режима поиска (однонаправленный / двунаправленный, с arc_flags и без) хранится
+гистограмма задержек и счетчики, для предобработки - гистограмма длительностей, для кэшей - попадания и промахи.
+Запись одного значения - O(1) без выделения памяти, поэтому метрики можно не выключать под нагрузкой.
+Экспорт - текстовый формат Prometheus и JSON.
+"""
+from __future__ import annotations
+
+import json
+import math
+import threading
+import time
+from functools import wraps
+from typing import Callable
+
+from algo.dijkstra.structures import QueryStats
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class LatencyHistogram:
+    """
+    Гистограмма в стиле HDR: интервал [2^e, 2^(e+1)) делится на SUB_BUCKETS равных корзин,
+    поэтому относительная погрешность перцентилей не больше 1 / SUB_BUCKETS при любом масштабе значений.
+    Значения хранятся в микросекундах
+    """
+    SUB_BUCKETS = 32  # корзин на каждую степень двойки (погрешность ~3%)
+
+    def __init__(self) -> None:
+        self._buckets: dict[int, int] = {}  # номер корзины -> количество значений
+        self.count = 0
+        self.total = 0.0  # сумма значений, секунды
+        self.min = math.inf
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        """ Добавить значение (в секундах) """
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        index = self._bucket_index(seconds * 1e6)
+        self._buckets[index] = self._buckets.get(index, 0) + 1
+
+    @classmethod
+    def _bucket_index(cls, micros: float) -> int:
+        if micros < 1:
+            return 0  # все значения меньше микросекунды - в одной корзине
+        mantissa, exponent = math.frexp(micros)  # micros = mantissa * 2^exponent, mantissa в [0.5, 1)
+        return exponent * cls.SUB_BUCKETS + int((mantissa - 0.5) * 2 * cls.SUB_BUCKETS) + 1
+
+    @classmethod
+    def _bucket_upper(cls, index: int) -> float:
+        """ Верхняя граница корзины в секундах """
+        if index == 0:
+            return 1e-6
+        exponent, sub = divmod(index - 1, cls.SUB_BUCKETS)
+        return (0.5 + (sub + 1) / (2 * cls.SUB_BUCKETS)) * 2.0 ** exponent / 1e6
+
+    def percentile(self, q: float) -> float:
+        """ Перцентиль q (от 0 до 1) в секундах - верхняя граница корзины, в которую он попал """
+        if not self.count:
+            return math.nan
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+            if seen >= rank:
+                return min(self._bucket_upper(index), self.max)
+        return self.max
+
+    def merge(self, other: LatencyHistogram) -> None:
+        """ Добавить значения другой гистограммы """
+        for index, count in other._buckets.items():
+            self._buckets[index] = self._buckets.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def snapshot(self) -> dict:
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None,
+            'mean': self.total / self.count if self.count else None,
+            **{f'p{round(q * 100)}': self.percentile(q) if self.count else None for q in QUANTILES},
+        }
+
+
+def mode_label(mode: str, arc_flags: bool) -> str:
+    """ Название режима в метриках, например 'bidirectional_arc_flags' """
+    return f"{mode}_arc_flags" if arc_flags else mode
+
+
+class MetricsRegistry:
+    """ Набор метрик. Методы можно вызывать из разных потоков """
+
+    # Счетчики запроса, которые берутся из QueryStats
+    STATS_COUNTERS = ('settled', 'relaxed', 'pruned', 'stale_pops')
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.query_latency: dict[str, LatencyHistogram] = {}
+        self.query_counters: dict[str, dict[str, int]] = {}
+        self.preprocessing: dict[str, LatencyHistogram] = {}
+        self.cache: dict[str, dict[str, int]] = {}
+
+    def record_query(self, mode: str, arc_flags: bool, seconds: float, found: bool = True,
+                     stats: QueryStats | None = None) -> None:
+        """ Записать выполненный запрос """
+        label = mode_label(mode, arc_flags)
+        with self._lock:
+            histogram = self.query_latency.get(label)
+            if histogram is None:
+                histogram = self.query_latency[label] = LatencyHistogram()
+                self.query_counters[label] = dict.fromkeys(('queries', 'not_found') + self.STATS_COUNTERS, 0)
+            histogram.record(seconds)
+            counters = self.query_counters[label]
+            counters['queries'] += 1
+            if not found:
+                counters['not_found'] += 1
+            if stats is not None:
+                for name in self.STATS_COUNTERS:
+                    counters[name] += getattr(stats, name)
+
+    def record_preprocessing(self, seconds: float, backend: str = 'python') -> None:
+        """ Записать длительность предобработки arc_flags """
+        with self._lock:
+            self.preprocessing.setdefault(backend, LatencyHistogram()).record(seconds)
+
+    def record_cache(self, name: str, hit: bool) -> None:
+        """ Записать обращение к кэшу name (попадание или промах) """
+        with self._lock:
+            counters = self.cache.setdefault(name, {'hits': 0, 'misses': 0})
+            counters['hits' if hit else 'misses'] += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self.query_latency.clear()
+            self.query_counters.clear()
+            self.preprocessing.clear()
+            self.cache.clear()
+
+    def snapshot(self) -> dict:
+        """ Все метрики в виде словаря (для JSON) """
+        with self._lock:
+            return {
+                'timestamp': time.time(),
+                'queries': {label: {'latency': histogram.snapshot()} | self.query_counters[label]
+                            for label, histogram in self.query_latency.items()},
+                'preprocessing': {backend: histogram.snapshot() for backend, histogram in self.preprocessing.items()},
+                'cache': {name: counters | {'hit_rate': _hit_rate(counters)} for name, counters in self.cache.items()},
+            }
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self) -> str:
+        """ Метрики в текстовом формате Prometheus (задержки - как summary с квантилями) """
+        with self._lock:
+            lines = []
+            _summary(lines, 'arcflags_query_latency_seconds', 'Query latency by search mode', 'mode',
+                     self.query_latency)
+            for counter in ('queries',) + ('not_found',) + self.STATS_COUNTERS:
+                name = f'arcflags_query_{counter}_total'
+                lines.append(f'# TYPE {name} counter')
+                for label, counters in self.query_counters.items():
+                    lines.append(f'{name}{{mode="{label}"}} {counters[counter]}')
+            _summary(lines, 'arcflags_preprocessing_seconds', 'Arc flags preprocessing duration', 'backend',
+                     self.preprocessing)
+            for kind in ('hits', 'misses'):
+                name = f'arcflags_cache_{kind}_total'
+                lines.append(f'# TYPE {name} counter')
+                for cache, counters in self.cache.items():
+                    lines.append(f'{name}{{cache="{cache}"}} {counters[kind]}')
+            return '\n'.join(lines) + '\n'
+
+    def save(self, path: str) -> None:
+        """ Сохранить метрики: .json - снимок JSON, иначе - формат Prometheus """
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.to_json() if path.endswith('.json') else self.to_prometheus())
+
+
+def _hit_rate(counters: dict[str, int]) -> float | None:
+    total = counters['hits'] + counters['misses']
+    return counters['hits'] / total if total else None
+
+
+def _summary(lines: list[str], name: str, help_text: str, label: str,
+             histograms: dict[str, LatencyHistogram]) -> None:
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} summary')
+    for value, histogram in histograms.items():
+        for q in QUANTILES:
+            lines.append(f'{name}{{{label}="{value}",quantile="{q}"}} {histogram.percentile(q):.9f}')
+        lines.append(f'{name}_sum{{{label}="{value}"}} {histogram.total:.9f}')
+        lines.append(f'{name}_count{{{label}="{value}"}} {histogram.count}')
+
+
+# Метрики процесса по умолчанию
+METRICS = MetricsRegistry()
+
+
+def measured(query: Callable, mode: str, registry: MetricsRegistry | None = None) -> Callable:
+    """
+    Обернуть функцию запроса (dijkstra_unidirectional, dijkstra_bidirectional):
+    время, результат и статистика каждого вызова записываются в метрики
+    :param query: функция запроса (graph, start, end, arc_flags, *, stats) -> (distance, path, count_op)
+    :param mode: название режима в метриках
+    :param registry: куда записывать (по умолчанию METRICS)
+    """
+    registry = registry if registry is not None else METRICS
+
+    @wraps(query)
+    def wrapper(weighted_graph, start, end, arc_flags=False, *, stats: QueryStats = None, **kwargs):
+        stats = stats if stats is not None else QueryStats()
+        t0 = time.perf_counter()
+        result = query(weighted_graph, start, end, arc_flags, stats=stats, **kwargs)
+        registry.record_query(mode, arc_flags, time.perf_counter() - t0, result[0] != math.inf, stats)
+        return result
+
+    return wrapper
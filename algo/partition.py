@@ -0,0 +1,40 @@
+""" Разбиение вершин графа на регионы """
+from __future__ import annotations
+
+import math
+
+import numpy as np
+
+
+def assign_regions(pos: np.ndarray, k: int) -> np.ndarray:
+    """
+    Разбить вершины на k пространственных регионов примерно равного размера:
+    плоскость делится на вертикальные полосы, каждая полоса - на прямоугольники
+    :param pos: координаты вершин (N, 2)
+    :param k: количество регионов
+    :return: номер региона каждой вершины (N,)
+    """
+    n = len(pos)
+    if k <= 1 or n == 0:
+        return np.zeros(n, dtype=np.int64)
+
+    strips = math.ceil(math.sqrt(k))
+    regions_in_strip = np.full(strips, k // strips)
+    regions_in_strip[:k % strips] += 1
+    first_region = np.concatenate([[0], np.cumsum(regions_in_strip)[:-1]])
+
+    # Полосы по x: размер полосы пропорционален количеству регионов в ней
+    rank_x = np.empty(n, dtype=np.int64)
+    rank_x[np.argsort(pos[:, 0], kind="stable")] = np.arange(n)
+    strip_bounds = np.cumsum(regions_in_strip) * n / k
+    strip = np.searchsorted(strip_bounds, rank_x, side="right")
+
+    # Внутри полосы - по y
+    order = np.lexsort((pos[:, 1], strip))
+    strip_size = np.bincount(strip, minlength=strips)
+    strip_start = np.concatenate([[0], np.cumsum(strip_size)[:-1]])
+    rank_in_strip = np.empty(n, dtype=np.int64)
+    rank_in_strip[order] = np.arange(n) - strip_start[strip[order]]
+
+    local = rank_in_strip * regions_in_strip[strip] // np.maximum(strip_size[strip], 1)
+    return first_region[strip] + local
@@ -0,0 +1,227 @@
+"""
+Планировщик запросов: режим поиска выбирается для каждого запроса отдельно.
+
+route(graph, start, end) сам решает, какой поиск выполнить (однонаправленный / двунаправленный / с отсечением
+по оценкам расстояний между регионами) и использовать ли arc_flags. Признаки запроса вычисляются за O(1):
+    - в одном ли регионе start и end;
+    - нижняя оценка расстояния между их регионами (Graph.region_bounds - единственные «ориентиры» в графе,
+      координат у вершин Graph нет);
+    - есть ли действующие флаги arc_flags для региона end (предобработка выполнена, регион не устарел).
+
+Запросы делятся на классы по признакам. В каждом классе сначала пробуются все подходящие режимы
+(по min_samples раз), затем выбирается режим с наименьшим средним временем (скользящее среднее),
+а каждый explore_every-й запрос класса отдается режиму, который дольше всех не выполнялся, - так планировщик
+замечает, что соотношение режимов изменилось. Решения записываются в журнал (последние log_size),
+режим и arc_flags можно задать явно (для замеров) - такие запросы тоже пополняют историю
+"""
+from __future__ import annotations
+
+import math
+import statistics
+import threading
+import time
+import weakref
+from collections import deque
+from dataclasses import dataclass
+
+from algo.benchmark import QUERY_MODES
+from algo.dijkstra.structures import WeightedPath, QueryStats, CancellationToken
+from algo.graph import Graph
+from algo.metrics import METRICS, MetricsRegistry
+from algo.vertex import Vertex
+
+Engine = tuple[str, bool]  # (режим из QUERY_MODES, arc_flags)
+
+# Причины выбора режима в журнале решений
+REASON_OVERRIDE = 'override'  # режим задан при вызове
+REASON_EXPLORE = 'explore'  # режим пробуется (мало замеров или периодическая проверка)
+REASON_HISTORY = 'history'  # режим с наименьшим средним временем в классе запроса
+
+
+@dataclass(frozen=True)
+class QueryFeatures:
+    """ Дешевые признаки запроса, по которым выбирается режим """
+    same_region: bool
+    lower_bound: float | None  # нижняя оценка расстояния между регионами start и end (None - нет таблицы оценок)
+    # 0 - один регион, 1 - оценка 0 (соседние регионы), 2 - не больше медианы оценок, 3 - дальше;
+    # без таблицы оценок - 0 или 1
+    distance_class: int
+    arc_flags: bool  # флаги arc_flags для региона end действуют
+
+    @property
+    def key(self) -> tuple[int, bool]:
+        """ Класс запроса: история времени ведется отдельно для каждого класса """
+        return self.distance_class, self.arc_flags
+
+
+@dataclass
+class PlanDecision:
+    """ Запись журнала решений """
+    features: QueryFeatures
+    engine: Engine
+    reason: str
+    seconds: float = 0.0  # время выполнения запроса
+    found: bool = True
+
+
+@dataclass
+class EngineHistory:
+    """ История режима в одном классе запросов """
+    count: int = 0
+    mean: float = 0.0  # скользящее среднее времени, секунды
+    last_used: int = 0  # номер запроса класса, на котором режим выполнялся в последний раз
+
+
+class QueryPlanner:
+    """
+    Выбор режима поиска по признакам запроса и истории времени. Состояние относится к одному графу
+    (planner_for хранит планировщик для каждого графа), методы можно вызывать из разных потоков
+    """
+
+    def __init__(self, min_samples: int = 3, explore_every: int = 50, alpha: float = 0.1, log_size: int = 1000,
+                 registry: MetricsRegistry | None = None) -> None:
+        """
+        :param min_samples: сколько раз попробовать каждый режим в классе, прежде чем выбирать по истории
+        :param explore_every: каждый такой запрос класса выполняется давно не использованным режимом (0 - никогда)
+        :param alpha: вес нового замера в скользящем среднем
+        :param log_size: сколько последних решений хранить в журнале
+        :param registry: куда записывать выполненные запросы (по умолчанию METRICS)
+        """
+        self.min_samples = min_samples
+        self.explore_every = explore_every
+        self.alpha = alpha
+        self.registry = registry if registry is not None else METRICS
+        self.log: deque[PlanDecision] = deque(maxlen=log_size)
+        self._history: dict[tuple[tuple[int, bool], Engine], EngineHistory] = {}
+        self._queries: dict[tuple[int, bool], int] = {}  # класс -> количество запросов
+        self._lock = threading.Lock()
+        self._flags_key = None  # (версия графа, таблица оценок), для которых вычислен _flags_present
+        self._flags_present = False
+        self._bounds = None  # таблица оценок, для которой вычислена _bounds_median
+        self._bounds_median = 0.0
+
+    def features(self, weighted_graph: Graph, start: Vertex, end: Vertex) -> QueryFeatures:
+        same_region = start.k == end.k
+        bounds = weighted_graph.region_bounds
+        lower_bound = None
+        if bounds is not None:
+            if bounds is not self._bounds:
+                positive = [bound for row in bounds for bound in row if 0 < bound < math.inf]
+                self._bounds, self._bounds_median = bounds, statistics.median(positive) if positive else 0.0
+            lower_bound = bounds[start.k][end.k]
+            if same_region:
+                distance_class = 0
+            elif lower_bound == 0:
+                distance_class = 1
+            else:
+                distance_class = 2 if lower_bound <= self._bounds_median else 3
+        else:
+            distance_class = 0 if same_region else 1
+        arc_flags = self._has_flags(weighted_graph) and end.k not in weighted_graph.stale_regions
+        return QueryFeatures(same_region, lower_bound, distance_class, arc_flags)
+
+    def _has_flags(self, weighted_graph: Graph) -> bool:
+        """
+        Выполнялась ли предобработка: хотя бы у одного ребра есть флаг. Проверка проходит по всем ребрам,
+        поэтому результат запоминается до изменения графа или новой предобработки (новая таблица region_bounds)
+        """
+        key = (weighted_graph.version, id(weighted_graph.region_bounds))
+        if key != self._flags_key:
+            self._flags_present = any(any(edge._flags) for edge in weighted_graph._edges_by_id.values())
+            self._flags_key = key
+        return self._flags_present
+
+    @staticmethod
+    def candidates(features: QueryFeatures) -> list[Engine]:
+        """ Подходящие режимы в порядке, в котором они пробуются впервые """
+        if not features.arc_flags:
+            return [('bidirectional', False), ('unidirectional', False)]
+        engines = [('unidirectional', True), ('bidirectional', True)]
+        if features.lower_bound is not None:
+            engines.insert(0, ('unidirectional_bounds', True))
+        if features.same_region:
+            engines.append(('bidirectional', False))  # внутри региона флаги почти ничего не отсекают
+        return engines
+
+    def plan(self, features: QueryFeatures) -> tuple[Engine, str]:
+        """ Выбрать режим для запроса с признаками features: (режим, причина) """
+        key = features.key
+        engines = self.candidates(features)
+        with self._lock:
+            n = self._queries[key] = self._queries.get(key, 0) + 1
+            history = [self._history.setdefault((key, engine), EngineHistory()) for engine in engines]
+            for engine, h in zip(engines, history):
+                if h.count < self.min_samples:
+                    return engine, REASON_EXPLORE
+            if self.explore_every and n % self.explore_every == 0:
+                _, engine = min(zip(history, engines), key=lambda item: item[0].last_used)
+                return engine, REASON_EXPLORE
+            _, engine = min(zip(history, engines), key=lambda item: item[0].mean)
+            return engine, REASON_HISTORY
+
+    def observe(self, features: QueryFeatures, engine: Engine, seconds: float) -> None:
+        """ Добавить время выполненного запроса в историю """
+        key = features.key
+        with self._lock:
+            h = self._history.setdefault((key, engine), EngineHistory())
+            h.mean = seconds if h.count == 0 else h.mean + self.alpha * (seconds - h.mean)
+            h.count += 1
+            h.last_used = self._queries.get(key, 0)
+
+    def summary(self) -> list[dict]:
+        """ История по классам и режимам: количество запросов и среднее время """
+        with self._lock:
+            return [{'distance_class': key[0], 'arc_flags': key[1], 'mode': engine[0], 'engine_arc_flags': engine[1],
+                     'count': h.count, 'mean': h.mean}
+                    for (key, engine), h in sorted(self._history.items()) if h.count]
+
+
+_planners: weakref.WeakKeyDictionary[Graph, QueryPlanner] = weakref.WeakKeyDictionary()
+_planners_lock = threading.Lock()
+
+
+def planner_for(weighted_graph: Graph) -> QueryPlanner:
+    """ Планировщик графа (создается при первом запросе и удаляется вместе с графом) """
+    with _planners_lock:
+        planner = _planners.get(weighted_graph)
+        if planner is None:
+            planner = _planners[weighted_graph] = QueryPlanner()
+        return planner
+
+
+def route(weighted_graph: Graph, start: Vertex, end: Vertex, *,
+          mode: str | None = None,
+          arc_flags: bool | None = None,
+          planner: QueryPlanner | None = None,
+          stats: QueryStats = None,
+          cancel: CancellationToken = None) -> tuple[float, WeightedPath, int]:
+    """
+    Кратчайший путь из start в end, режим поиска выбирает планировщик
+    :param mode: задать режим из QUERY_MODES (None - выбирает планировщик)
+    :param arc_flags: задать использование arc_flags (None - выбирает планировщик)
+    :param planner: планировщик (None - планировщик графа, planner_for)
+    :param stats: статистика запроса, которую нужно заполнить (None - не собирать)
+    :param cancel: признак отмены
+    :return: расстояние между вершинами, путь от начала до конца, количество операций
+    """
+    if mode is not None and mode not in QUERY_MODES:
+        raise ValueError(f"Unknown query mode {mode!r}, expected one of {sorted(QUERY_MODES)}")
+    planner = planner if planner is not None else planner_for(weighted_graph)
+    features = planner.features(weighted_graph, start, end)
+    if mode is not None and arc_flags is not None:
+        engine, reason = (mode, arc_flags), REASON_OVERRIDE
+    else:
+        engine, reason = planner.plan(features)
+        if mode is not None or arc_flags is not None:
+            engine = (mode if mode is not None else engine[0], arc_flags if arc_flags is not None else engine[1])
+            reason = REASON_OVERRIDE
+
+    t0 = time.perf_counter()
+    distance, path, count_op = QUERY_MODES[engine[0]](weighted_graph, start, end, arc_flags=engine[1],
+                                                      stats=stats, cancel=cancel)
+    seconds = time.perf_counter() - t0
+    found = distance != math.inf
+    planner.observe(features, engine, seconds)
+    planner.log.append(PlanDecision(features, engine, reason, seconds, found))
+    planner.registry.record_query(engine[0], engine[1], seconds, found, stats)
+    return distance, path, count_op
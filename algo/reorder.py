@@ -0,0 +1,132 @@
+"""
+Перенумерация вершин и ребер для локальности памяти.
+
+Номера вершин - порядок добавления (щелчки в GUI, строки файла), поэтому соседние в графе вершины
+лежат в массивах далеко друг от друга и поиск обращается к памяти вразброс. После перенумерации близкие
+вершины получают близкие номера, а ребра одной вершины идут подряд:
+    hilbert     - порядок вершин вдоль кривой Гильберта по координатам pos
+    region_bfs  - по регионам, внутри региона - обход в ширину (связные участки получают соседние номера)
+
+Переставляются все массивы GraphData (координаты, регионы, названия, ребра, флаги arc_flags).
+Постоянные номера ребер (edge_ids) не меняются, исходные номера вершин сохраняются в GraphData.vertex_ids,
+VertexMapping переводит номера между исходными и внутренними
+"""
+from __future__ import annotations
+
+from collections import deque
+from typing import Iterable
+
+import numpy as np
+
+from algo.graph_io import GraphData
+
+REORDER_METHODS = ('hilbert', 'region_bfs')
+
+HILBERT_BITS = 16  # Координаты округляются до решетки 2^16 x 2^16
+
+
+def hilbert_order(pos: np.ndarray, bits: int = HILBERT_BITS) -> np.ndarray:
+    """ Порядок вершин вдоль кривой Гильберта: order[новый номер] = старый номер """
+    n = len(pos)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    side = (1 << bits) - 1
+    low, high = pos.min(axis=0), pos.max(axis=0)
+    scale = np.where(high > low, side / np.maximum(high - low, np.finfo(np.float64).tiny), 0)
+    x, y = ((pos - low) * scale).astype(np.int64).T
+    d = np.zeros(n, dtype=np.int64)
+    s = 1 << (bits - 1)
+    while s > 0:  # xy2d: на каждом уровне - номер четверти и поворот координат внутри нее
+        rx, ry = (x & s) > 0, (y & s) > 0
+        d += s * s * ((3 * rx) ^ ry)
+        flip = ~ry & rx
+        x, y = np.where(flip, side - x, x), np.where(flip, side - y, y)
+        x, y = np.where(ry, x, y), np.where(ry, y, x)
+        s >>= 1
+    return np.argsort(d, kind='stable')
+
+
+def region_bfs_order(data: GraphData) -> np.ndarray:
+    """
+    Порядок вершин по регионам, внутри региона - обход в ширину по ребрам региона (без учета направления),
+    каждый новый обход начинается с вершины с наименьшим номером
+    """
+    n = data.vertex_count
+    regions = data.regions
+    inside = regions[data.adj[:, 0]] == regions[data.adj[:, 1]]
+    both = np.concatenate([data.adj[inside], data.adj[inside][:, ::-1]])
+    both = both[np.argsort(both[:, 0], kind='stable')]
+    starts = np.searchsorted(both[:, 0], np.arange(n + 1)).tolist()
+    neighbours = both[:, 1].tolist()
+
+    visited = [False] * n
+    order = []
+    for root in np.argsort(regions, kind='stable').tolist():
+        if visited[root]:
+            continue
+        visited[root] = True
+        queue = deque([root])
+        while queue:
+            u = queue.popleft()
+            order.append(u)
+            for v in neighbours[starts[u]:starts[u + 1]]:
+                if not visited[v]:
+                    visited[v] = True
+                    queue.append(v)
+    return np.array(order, dtype=np.int64)
+
+
+def reorder(data: GraphData, method: str = 'hilbert') -> GraphData:
+    """
+    Перенумеровать вершины способом method из REORDER_METHODS, ребра упорядочить по новым номерам начала и конца
+    :return: копия графа с переставленными массивами (vertex_ids - исходные номера вершин)
+    """
+    if method == 'hilbert':
+        order = hilbert_order(data.pos)
+    elif method == 'region_bfs':
+        order = region_bfs_order(data)
+    else:
+        raise ValueError(f"Unknown reorder method {method!r}, expected one of {REORDER_METHODS}")
+    return permute(data, order)
+
+
+def permute(data: GraphData, order: np.ndarray) -> GraphData:
+    """ Переставить вершины в порядке order (order[новый номер] = старый номер) """
+    new_index = np.empty(data.vertex_count, dtype=np.int64)
+    new_index[order] = np.arange(data.vertex_count)
+    adj = new_index[data.adj]
+    edge_order = np.lexsort((adj[:, 1], adj[:, 0]))
+    return GraphData(pos=data.pos[order],
+                     adj=adj[edge_order],
+                     regions=data.regions[order],
+                     texts=[data.texts[i] for i in order.tolist()] if data.texts is not None else None,
+                     edge_ids=data.ids()[edge_order],
+                     arc_flags=data.arc_flags[edge_order] if data.arc_flags is not None else None,
+                     region_bounds=data.region_bounds,
+                     vertex_ids=data.original_ids()[order])
+
+
+def edge_span(data: GraphData) -> float:
+    """ Средняя разность номеров начала и конца ребра - чем меньше, тем ближе соседи в памяти """
+    return float(np.abs(data.adj[:, 0] - data.adj[:, 1]).mean()) if data.edge_count else 0.0
+
+
+class VertexMapping:
+    """ Перевод номеров вершин: исходные (как во входных файлах) <-> внутренние (индексы Graph после reorder) """
+
+    def __init__(self, original_ids: Iterable[int]) -> None:
+        self.original: list[int] = list(original_ids)  # внутренний индекс -> исходный номер
+        self._internal = {original: i for i, original in enumerate(self.original)}
+
+    @classmethod
+    def of(cls, data: GraphData) -> VertexMapping:
+        return cls(data.original_ids().tolist())
+
+    def to_internal(self, original: int) -> int:
+        try:
+            return self._internal[original]
+        except KeyError:
+            raise ValueError(f"Vertex {original} is not in graph") from None
+
+    def to_original(self, index: int) -> int:
+        return self.original[index]
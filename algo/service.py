@@ -0,0 +1,269 @@
+"""
+Локальный HTTP/JSON сервис запросов кратчайшего пути.
+
+Граф с флагами один раз копируется в разделяемую память (algo.shared_graph), процессы-обработчики
+подключаются к ней без копирования. Одновременные запросы собираются в пачки по региону конечной вершины
+(за batch_window секунд или до max_batch запросов) и пачкой отправляются в процесс-обработчик.
+Если запросов в работе больше max_pending, новые сразу получают ответ 503 (обратное давление),
+а не копятся в очереди.
+
+Запросы:
+    POST /route   {"source": 0, "target": 10, "arc_flags": true} -> {"distance": ..., "edges": [...], "settled": ...}
+    GET  /health  состояние сервиса и размер графа
+    GET  /metrics метрики в формате Prometheus (algo.metrics)
+
+HTTP реализован на asyncio (HTTP/1.1 с keep-alive, тело - только с Content-Length), без сторонних библиотек
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import math
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, NamedTuple
+
+from algo.dijkstra.structures import QueryStats
+from algo.metrics import METRICS, MetricsRegistry
+from algo.shared_graph import SharedGraph, SharedGraphInfo
+
+if TYPE_CHECKING:
+    from algo.reorder import VertexMapping
+
+MAX_BODY = 1 << 20  # Наибольший размер тела запроса, байты
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large',
+           503: 'Service Unavailable'}
+
+_GRAPH: SharedGraph | None = None  # Граф процесса-обработчика
+
+
+def _attach_worker(info: SharedGraphInfo) -> None:
+    """ Инициализация процесса-обработчика: подключиться к графу в разделяемой памяти """
+    global _GRAPH
+    _GRAPH = SharedGraph.attach(info)
+
+
+def _ping() -> bool:
+    return _GRAPH is not None
+
+
+def _run_batch(queries: list[tuple[int, int, bool]]) -> list[tuple[float, list[int], int]]:
+    """ Выполнить пачку запросов в процессе-обработчике """
+    return [_GRAPH.shortest_path(source, target, arc_flags) for source, target, arc_flags in queries]
+
+
+class Overloaded(Exception):
+    """ Запросов в работе больше max_pending """
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class _Pending(NamedTuple):
+    source: int
+    target: int
+    arc_flags: bool
+    future: asyncio.Future
+
+
+class QueryService:
+    """ Прием запросов, пачки по регионам и пул процессов-обработчиков """
+
+    def __init__(self, graph: SharedGraph, workers: int = 2, max_pending: int = 1024, batch_window: float = 0.002,
+                 max_batch: int = 64, registry: MetricsRegistry | None = None,
+                 mapping: VertexMapping | None = None) -> None:
+        """
+        :param graph: граф в разделяемой памяти (создан этим процессом)
+        :param workers: количество процессов-обработчиков
+        :param max_pending: сколько запросов может быть в работе одновременно (остальные - 503)
+        :param batch_window: сколько секунд собирается пачка запросов одного региона
+        :param max_batch: наибольший размер пачки
+        :param registry: куда записывать метрики запросов (по умолчанию METRICS)
+        :param mapping: исходные номера вершин перенумерованного графа (algo.reorder): в запросах /route
+        вершины задаются исходными номерами
+        """
+        self.graph = graph
+        self.workers = workers
+        self.max_pending = max_pending
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.registry = registry if registry is not None else METRICS
+        self.mapping = mapping
+        self.pending = 0  # запросов в работе
+        self._batches: dict[int, list[_Pending]] = {}  # регион -> собираемая пачка
+        self._pool: ProcessPoolExecutor | None = None
+        self._server: asyncio.AbstractServer | None = None
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8080) -> None:
+        """ Запустить процессы-обработчики (дождаться их подключения к графу) и начать прием соединений """
+        self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                         initializer=_attach_worker, initargs=(self.graph.info,))
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self._pool, _ping) for _ in range(self.workers)))
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+
+    @property
+    def port(self) -> int:
+        return self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+
+    async def route(self, source: int, target: int, arc_flags: bool = True) -> tuple[float, list[int], int]:
+        """
+        Кратчайший путь из source в target
+        :return: расстояние (inf - пути нет), номера ребер пути, количество исследованных вершин
+        :raises Overloaded: запросов в работе слишком много
+        """
+        if self.pending >= self.max_pending:
+            raise Overloaded()
+        n = self.graph.info.vertex_count
+        if not (0 <= source < n and 0 <= target < n):
+            raise ValueError(f"vertex index out of range [0, {n})")
+        self.pending += 1
+        try:
+            future = asyncio.get_running_loop().create_future()
+            region = self.graph.regions[target]
+            batch = self._batches.setdefault(region, [])
+            batch.append(_Pending(source, target, arc_flags, future))
+            if len(batch) == 1:
+                asyncio.get_running_loop().call_later(self.batch_window, self._flush, region, batch)
+            if len(batch) >= self.max_batch:
+                self._flush(region, batch)
+            return await future
+        finally:
+            self.pending -= 1
+
+    def _flush(self, region: int, batch: list[_Pending]) -> None:
+        """ Отправить пачку в процесс-обработчик (если она еще не отправлена) """
+        if self._batches.get(region) is not batch:
+            return
+        del self._batches[region]
+        task = asyncio.get_running_loop().run_in_executor(
+            self._pool, _run_batch, [(item.source, item.target, item.arc_flags) for item in batch])
+        task.add_done_callback(lambda done: self._resolve(batch, done))
+
+    @staticmethod
+    def _resolve(batch: list[_Pending], done: asyncio.Future) -> None:
+        error = done.exception()
+        for i, item in enumerate(batch):
+            if item.future.done():
+                continue
+            if error is not None:
+                item.future.set_exception(error)
+            else:
+                item.future.set_result(done.result()[i])
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """ Соединение HTTP/1.1: запросы обрабатываются по очереди, пока клиент не закроет соединение """
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except HttpError as e:
+                    await write_response(writer, e.status, {'error': str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                status, payload = await self._dispatch(method, path, body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                await write_response(writer, status, payload, keep_alive=keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method: str, path: str, body: bytes) -> tuple[int, dict | str]:
+        if path == '/health':
+            info = self.graph.info
+            return 200, {'status': 'ok', 'vertices': info.vertex_count, 'edges': info.edge_count, 'k': info.k,
+                         'workers': self.workers, 'pending': self.pending}
+        if path == '/metrics':
+            return 200, self.registry.to_prometheus()
+        if path != '/route':
+            return 404, {'error': f"unknown path {path}"}
+        if method != 'POST':
+            return 405, {'error': "use POST"}
+
+        try:
+            query = json.loads(body)
+            source, target = query['source'], query['target']
+            arc_flags = query.get('arc_flags', True)
+            # bool - подкласс int, а int() молча обрезал бы 1.9 и принимал true
+            if not all(isinstance(v, int) and not isinstance(v, bool) for v in (source, target)):
+                raise TypeError("source and target must be integers")
+            if not isinstance(arc_flags, bool):
+                raise TypeError("arc_flags must be true or false")
+            if self.mapping is not None:
+                source, target = self.mapping.to_internal(source), self.mapping.to_internal(target)
+        except (ValueError, KeyError, TypeError) as e:
+            return 400, {'error': f"bad query: {e}"}
+        t0 = time.perf_counter()
+        try:
+            distance, edges, settled = await self.route(source, target, arc_flags)
+        except Overloaded:
+            return 503, {'error': "overloaded, retry later"}
+        except ValueError as e:
+            return 400, {'error': str(e)}
+        self.registry.record_query('service', arc_flags, time.perf_counter() - t0, distance != math.inf,
+                                   QueryStats(settled=settled))
+        return 200, {'distance': distance if distance != math.inf else None, 'edges': edges, 'settled': settled}
+
+
+async def read_request(reader: asyncio.StreamReader) -> tuple[str, str, dict[str, str], bytes] | None:
+    """
+    Прочитать запрос HTTP/1.1
+    :return: метод, путь, заголовки (имена в нижнем регистре), тело; None - клиент закрыл соединение
+    """
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, path, _ = line.decode('latin-1').split(' ', 2)
+    except ValueError:
+        raise HttpError(400, "bad request line") from None
+    headers = {}
+    while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    length = headers.get('content-length', '') or '0'
+    if not (length.isascii() and length.isdigit()):  # int() пропустил бы знак, пробелы и "_"
+        raise HttpError(400, "bad Content-Length")
+    length = int(length)
+    if length > MAX_BODY:
+        raise HttpError(413, "request body too large")
+    body = await reader.readexactly(length) if length else b''
+    return method, path.split('?', 1)[0], headers, body
+
+
+async def write_response(writer: asyncio.StreamWriter, status: int, payload: dict | str,
+                         keep_alive: bool = True) -> None:
+    """ Отправить ответ: словарь - как JSON, строка - как текст """
+    if isinstance(payload, str):
+        body, content_type = payload.encode('utf-8'), 'text/plain; version=0.0.4'
+    else:
+        body, content_type = json.dumps(payload).encode('utf-8'), 'application/json'
+    head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n")
+    if status == 503:
+        head += "Retry-After: 1\r\n"
+    writer.write(head.encode('latin-1') + b"\r\n" + body)
+    await writer.drain()
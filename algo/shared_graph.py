@@ -0,0 +1,134 @@
+"""
+Граф с флагами arc_flags в разделяемой памяти (multiprocessing.shared_memory).
+
+Списки смежности хранятся в виде CSR: ребра вершины u - позиции offsets[u]..offsets[u + 1] массивов
+targets, weights и edge_ids, флаг региона r ребра e - flags[e * K + r]. Все массивы лежат в одном блоке
+разделяемой памяти, процессы подключаются к нему по имени и читают массивы через memoryview без копирования
+"""
+from __future__ import annotations
+
+from array import array
+from heapq import heappop, heappush
+from multiprocessing import shared_memory
+from typing import NamedTuple
+
+from algo.graph import Graph
+
+# Массивы блока в порядке размещения: название, формат array/memoryview, длина как функция от (N, M, K)
+LAYOUT = (
+    ('offsets', 'q', lambda n, m, k: n + 1),
+    ('targets', 'q', lambda n, m, k: m),
+    ('weights', 'd', lambda n, m, k: m),
+    ('edge_ids', 'q', lambda n, m, k: m),
+    ('regions', 'q', lambda n, m, k: n),
+    ('flags', 'B', lambda n, m, k: m * k),
+)
+
+
+class SharedGraphInfo(NamedTuple):
+    """ Все, что нужно другому процессу, чтобы подключиться к графу """
+    name: str  # имя блока разделяемой памяти
+    vertex_count: int
+    edge_count: int
+    k: int
+
+
+class SharedGraph:
+    """
+    Граф в разделяемой памяти. Создается из Graph (create) одним процессом, остальные подключаются (attach).
+    Создатель освобождает память (unlink), остальные только закрывают (close)
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, info: SharedGraphInfo, owner: bool) -> None:
+        self.shm = shm
+        self.info = info
+        self.owner = owner
+        n, m, k = info.vertex_count, info.edge_count, info.k
+        self.k = k
+        position = 0
+        self._views = []
+        for name, fmt, length in LAYOUT:
+            size = length(n, m, k) * array(fmt).itemsize
+            view = shm.buf[position:position + size].cast(fmt)
+            self._views.append(view)
+            setattr(self, name, view)
+            position += size
+
+    @staticmethod
+    def size(n: int, m: int, k: int) -> int:
+        """ Размер блока в байтах """
+        return sum(length(n, m, k) * array(fmt).itemsize for _, fmt, length in LAYOUT)
+
+    @classmethod
+    def create(cls, weighted_graph: Graph, name: str | None = None) -> SharedGraph:
+        """ Скопировать граф (после предобработки arc_flags) в новый блок разделяемой памяти """
+        n, m, k = weighted_graph.vertex_count, weighted_graph.edges_count, weighted_graph.K
+        shm = shared_memory.SharedMemory(name=name, create=True, size=max(cls.size(n, m, k), 1))
+        graph = cls(shm, SharedGraphInfo(shm.name, n, m, k), owner=True)
+        position = 0
+        for u in range(n):
+            graph.offsets[u] = position
+            graph.regions[u] = weighted_graph.vertex_at(u).k
+            for edge in weighted_graph.edges_of_index(u):
+                graph.targets[position] = edge.v
+                graph.weights[position] = edge.weight
+                graph.edge_ids[position] = edge.id
+                graph.flags[position * k:(position + 1) * k] = bytes(edge._flags)
+                position += 1
+        graph.offsets[n] = position
+        return graph
+
+    @classmethod
+    def attach(cls, info: SharedGraphInfo) -> SharedGraph:
+        """ Подключиться к графу, созданному другим процессом """
+        return cls(shared_memory.SharedMemory(name=info.name), info, owner=False)
+
+    def close(self) -> None:
+        """ Отключиться от блока (создатель еще и освобождает его) """
+        for view in self._views:
+            view.release()
+        self._views.clear()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def shortest_path(self, source: int, target: int, arc_flags: bool = True) -> tuple[float, list[int], int]:
+        """
+        Однонаправленный поиск Дейкстры по CSR, останавливается, когда исследована конечная вершина
+        :param source: индекс вершины начала
+        :param target: индекс вершины конца
+        :param arc_flags: отбрасывать ребра без флага региона target
+        :return: расстояние (inf - пути нет), номера ребер пути (Edge.id), количество исследованных вершин
+        """
+        offsets, targets, weights, flags = self.offsets, self.targets, self.weights, self.flags
+        k, region = self.k, self.regions[target]
+        distances = {source: 0.0}
+        parent: dict[int, tuple[int, int]] = {}  # вершина -> (предыдущая вершина, позиция ребра из нее)
+        settled = set()
+        heap = [(0.0, source)]
+        while heap:
+            dist_u, u = heappop(heap)
+            if u in settled:
+                continue
+            settled.add(u)
+            if u == target:
+                break
+            for position in range(offsets[u], offsets[u + 1]):
+                if arc_flags and not flags[position * k + region]:
+                    continue
+                v = targets[position]
+                dist_v = dist_u + weights[position]
+                if dist_v < distances.get(v, float('inf')):
+                    distances[v] = dist_v
+                    parent[v] = (u, position)
+                    heappush(heap, (dist_v, v))
+        if target not in settled:
+            return float('inf'), [], len(settled)
+
+        path = []
+        v = target
+        while v != source:
+            v, position = parent[v]
+            path.append(self.edge_ids[position])
+        path.reverse()
+        return distances[target], path, len(settled)
@@ -0,0 +1,330 @@
+"""
+Хранение графа по регионам (тайлам) для графов, которые вместе с флагами arc_flags не помещаются в память.
+
+Папка графа (build_tiles):
+    index.json          количество вершин, ребер и регионов, границы тайлов, оценки расстояний между регионами
+    tile_<r>.npz        CSR тайла r: ребра, выходящие из вершин региона r (offsets, targets, weights, edge_ids, flags)
+    boundary.npz        ребра между тайлами (source, target, edge_ids, flags)
+    links.npy           (K, K, K) links[a, b, r] - есть ребро из тайла a в тайл b с флагом региона r
+    vertex_ids.npy      исходные номера вершин, sorted_ids.npy / sorted_index.npy - поиск внутреннего номера
+
+Вершины перенумерованы так, что тайл r - непрерывный диапазон номеров starts[r]..starts[r + 1], поэтому тайл
+вершины находится двоичным поиском по K + 1 числам. Номера вершин хранятся в .npy и читаются через mmap.
+
+TiledGraph загружает тайлы по мере того, как до них доходит поиск, и держит в памяти не больше max_tiles
+(вытесняется давно не использованный). По флагам ребер между тайлами до поиска определяется, какие тайлы
+вообще могут понадобиться для региона цели, остальные не загружаются
+"""
+from __future__ import annotations
+
+import json
+import os
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+from heapq import heappop, heappush
+from typing import NamedTuple
+
+import numpy as np
+
+from algo.dijkstra.structures import QueryStats
+from algo.graph_io import GraphData
+from algo.metrics import METRICS, MetricsRegistry
+
+INDEX_FILE = 'index.json'
+TILES_FORMAT = 1  # Версия формата папки (записывается в index.json)
+
+
+class Tile(NamedTuple):
+    """ CSR одного тайла: ребра локальной вершины i - позиции offsets[i]..offsets[i + 1] """
+    offsets: memoryview
+    targets: memoryview  # внутренние номера концов ребер (могут лежать в других тайлах)
+    weights: memoryview
+    edge_ids: memoryview
+    flags: memoryview | None  # флаг региона r ребра в позиции p - flags[p * K + r] (None - без предобработки)
+    nbytes: int
+
+
+def tile_file(directory: str, region: int) -> str:
+    return os.path.join(directory, f'tile_{region}.npz')
+
+
+def build_tiles(data: GraphData, directory: str) -> dict:
+    """
+    Разбить граф на тайлы по регионам и записать в папку directory
+    :return: содержимое index.json
+    """
+    k = data.arc_flags.shape[1] if data.arc_flags is not None else data.k
+    os.makedirs(directory, exist_ok=True)
+
+    # Внутренние номера: вершины упорядочены по регионам (внутри региона - в порядке data)
+    order = np.argsort(data.regions, kind='stable')
+    new_index = np.empty(data.vertex_count, dtype=np.int64)
+    new_index[order] = np.arange(data.vertex_count)
+    starts = np.searchsorted(data.regions[order], np.arange(k + 1))
+    adj = new_index[data.adj]
+    edge_order = np.argsort(adj[:, 0], kind='stable')
+    adj = adj[edge_order]
+    weights = data.weights()[edge_order]
+    edge_ids = data.ids()[edge_order]
+    flags = data.arc_flags[edge_order].astype(bool) if data.arc_flags is not None else None
+
+    tiles = []
+    edge_starts = np.searchsorted(adj[:, 0], starts)
+    for region in range(k):
+        first, last = edge_starts[region], edge_starts[region + 1]
+        local = adj[first:last, 0] - starts[region]
+        arrays = {
+            'offsets': np.searchsorted(local, np.arange(starts[region + 1] - starts[region] + 1)).astype(np.int64),
+            'targets': adj[first:last, 1],
+            'weights': weights[first:last],
+            'edge_ids': edge_ids[first:last],
+        }
+        if flags is not None:
+            arrays['flags'] = flags[first:last]
+        with open(tile_file(directory, region), 'wb') as f:
+            np.savez(f, **arrays)
+        tiles.append({'vertices': int(starts[region + 1] - starts[region]), 'edges': int(last - first),
+                      'bytes': int(sum(array.nbytes for array in arrays.values()))})
+
+    tile_of = np.searchsorted(starts, np.arange(data.vertex_count), side='right') - 1
+    source_tile, target_tile = tile_of[adj[:, 0]], tile_of[adj[:, 1]]
+    boundary = source_tile != target_tile
+    links = np.zeros((k, k, k), dtype=bool)
+    if flags is not None:
+        np.logical_or.at(links, (source_tile[boundary], target_tile[boundary]), flags[boundary])
+    else:
+        links[source_tile[boundary], target_tile[boundary]] = True
+    with open(os.path.join(directory, 'boundary.npz'), 'wb') as f:
+        np.savez(f, source=adj[boundary, 0], target=adj[boundary, 1], edge_ids=edge_ids[boundary],
+                 **({'flags': flags[boundary]} if flags is not None else {}))
+    np.save(os.path.join(directory, 'links.npy'), links)
+
+    vertex_ids = data.original_ids()[order].astype(np.int64)
+    sorted_index = np.argsort(vertex_ids, kind='stable')
+    np.save(os.path.join(directory, 'vertex_ids.npy'), vertex_ids)
+    np.save(os.path.join(directory, 'sorted_ids.npy'), vertex_ids[sorted_index])
+    np.save(os.path.join(directory, 'sorted_index.npy'), sorted_index)
+
+    index = {
+        'format': TILES_FORMAT,
+        'vertex_count': data.vertex_count,
+        'edge_count': data.edge_count,
+        'k': k,
+        'starts': starts.tolist(),
+        'arc_flags': flags is not None,
+        'region_bounds': data.region_bounds.tolist() if data.region_bounds is not None else None,
+        'boundary_edges': int(boundary.sum()),
+        'tiles': tiles,
+    }
+    with open(os.path.join(directory, INDEX_FILE), 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=1)
+    return index
+
+
+class TileCache:
+    """
+    Тайлы в памяти, не больше max_tiles (вытесняется давно не использованный).
+    Обращения записываются в метрики как кэш 'tiles'
+    """
+
+    def __init__(self, directory: str, k: int, max_tiles: int, registry: MetricsRegistry | None = None) -> None:
+        if max_tiles < 1:
+            raise ValueError(f"max_tiles must be positive, got {max_tiles}")
+        self.directory = directory
+        self.k = k
+        self.max_tiles = max_tiles
+        self.registry = registry if registry is not None else METRICS
+        self._tiles: OrderedDict[int, Tile] = OrderedDict()  # от давних к недавним
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+        self.bytes_loaded = 0
+        self.load_time = 0.0  # секунды чтения тайлов с диска
+
+    def __len__(self) -> int:
+        return len(self._tiles)
+
+    def get(self, region: int) -> Tile:
+        tile = self._tiles.pop(region, None)
+        hit = tile is not None
+        if hit:
+            self.hits += 1
+        else:
+            tile = self._load(region)
+        self.registry.record_cache('tiles', hit)
+        self._tiles[region] = tile
+        while len(self._tiles) > self.max_tiles:
+            self._tiles.popitem(last=False)
+            self.evictions += 1
+        return tile
+
+    def _load(self, region: int) -> Tile:
+        t0 = time.perf_counter()
+        with np.load(tile_file(self.directory, region)) as arrays:
+            loaded = {name: np.ascontiguousarray(arrays[name]) for name in arrays.files}
+        flags = loaded.get('flags')
+        tile = Tile(offsets=memoryview(loaded['offsets']),
+                    targets=memoryview(loaded['targets']),
+                    weights=memoryview(loaded['weights']),
+                    edge_ids=memoryview(loaded['edge_ids']),
+                    flags=memoryview(flags.reshape(-1)) if flags is not None else None,
+                    nbytes=sum(array.nbytes for array in loaded.values()))
+        self.loads += 1
+        self.bytes_loaded += tile.nbytes
+        self.load_time += time.perf_counter() - t0
+        return tile
+
+    def clear(self) -> None:
+        self._tiles.clear()
+
+
+class TiledGraph:
+    """ Граф из папки build_tiles: тайлы загружаются по мере продвижения фронта поиска """
+
+    def __init__(self, directory: str, max_tiles: int = 8, registry: MetricsRegistry | None = None) -> None:
+        """
+        :param directory: папка графа (build_tiles)
+        :param max_tiles: сколько тайлов держать в памяти одновременно
+        :param registry: куда записывать попадания и промахи кэша тайлов (по умолчанию METRICS)
+        """
+        with open(os.path.join(directory, INDEX_FILE), 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        if index.get('format') != TILES_FORMAT:
+            raise ValueError(f"Unsupported tiles format {index.get('format')!r} in {directory}")
+        self.directory = directory
+        self.vertex_count: int = index['vertex_count']
+        self.edge_count: int = index['edge_count']
+        self.k: int = index['k']
+        self.starts: list[int] = index['starts']
+        self.has_arc_flags: bool = index['arc_flags']
+        self.region_bounds: list[list[float]] | None = index['region_bounds']
+        self.tiles: list[dict] = index['tiles']
+        self.links = np.load(os.path.join(directory, 'links.npy'))
+        self.vertex_ids = np.load(os.path.join(directory, 'vertex_ids.npy'), mmap_mode='r')
+        self._sorted_ids = np.load(os.path.join(directory, 'sorted_ids.npy'), mmap_mode='r')
+        self._sorted_index = np.load(os.path.join(directory, 'sorted_index.npy'), mmap_mode='r')
+        self.cache = TileCache(directory, self.k, max_tiles, registry)
+        self.skipped = 0  # тайлов исключено по флагам (сумма по запросам)
+
+    def tile_of(self, vertex: int) -> int:
+        return bisect_right(self.starts, vertex) - 1
+
+    def to_internal(self, original: int) -> int:
+        """ Внутренний номер вершины по исходному (как во входных файлах) """
+        i = int(np.searchsorted(self._sorted_ids, original))
+        if i == self.vertex_count or self._sorted_ids[i] != original:
+            raise ValueError(f"Vertex {original} is not in graph")
+        return int(self._sorted_index[i])
+
+    def to_original(self, index: int) -> int:
+        return int(self.vertex_ids[index])
+
+    def candidate_tiles(self, source_tile: int, target_region: int) -> set[int]:
+        """
+        Тайлы, через которые может пройти поиск с arc_flags: достижимы из source_tile по ребрам между тайлами
+        с флагом target_region и сами ведут к тайлу target_region
+        """
+        links = self.links[:, :, target_region]
+        forward = _reachable(links, source_tile)
+        backward = _reachable(links.T, target_region)
+        return (forward & backward) | {source_tile, target_region}
+
+    def shortest_path(self, source: int, target: int, arc_flags: bool = True,
+                      stats: QueryStats = None) -> tuple[float, list[int], int]:
+        """
+        Однонаправленный поиск Дейкстры по тайлам, останавливается, когда исследована конечная вершина
+        :param source: внутренний номер вершины начала
+        :param target: внутренний номер вершины конца
+        :param arc_flags: отбрасывать ребра без флага региона target и тайлы, недостижимые по таким ребрам
+        :param stats: статистика запроса, которую нужно заполнить (None - не собирать)
+        :return: расстояние (inf - пути нет), номера ребер пути (Edge.id), количество исследованных вершин
+        """
+        if arc_flags and not self.has_arc_flags:
+            raise ValueError(f"Tiles in {self.directory} have no arc flags")
+        if stats is not None:
+            t0 = time.perf_counter()
+        starts, k = self.starts, self.k
+        region = self.tile_of(target)
+        allowed = None
+        if arc_flags:
+            allowed = self.candidate_tiles(self.tile_of(source), region)
+            self.skipped += self.k - len(allowed)
+
+        distances = {source: 0.0}
+        parent: dict[int, tuple[int, int]] = {}  # вершина -> (предыдущая вершина, номер ребра)
+        settled = set()
+        heap = [(0.0, source)]
+        current, tile = -1, None  # тайл последней исследованной вершины (соседние вершины обычно в том же тайле)
+        relaxed = pruned = stale_pops = 0
+        while heap:
+            dist_u, u = heappop(heap)
+            if u in settled:
+                stale_pops += 1
+                continue
+            settled.add(u)
+            if u == target:
+                break
+            if current < 0 or not starts[current] <= u < starts[current + 1]:
+                current = self.tile_of(u)
+                if allowed is not None and current not in allowed:
+                    current = -1
+                    continue  # по флагам из этого тайла регион цели не достижим
+                tile = self.cache.get(current)
+            local = u - starts[current]
+            flags = tile.flags
+            for position in range(tile.offsets[local], tile.offsets[local + 1]):
+                if arc_flags and not flags[position * k + region]:
+                    pruned += 1
+                    continue
+                relaxed += 1
+                v = tile.targets[position]
+                dist_v = dist_u + tile.weights[position]
+                if dist_v < distances.get(v, float('inf')):
+                    distances[v] = dist_v
+                    parent[v] = (u, tile.edge_ids[position])
+                    heappush(heap, (dist_v, v))
+
+        if stats is not None:
+            stats.settled += len(settled)
+            stats.relaxed += relaxed
+            stats.pruned += pruned
+            stats.stale_pops += stale_pops
+            stats.search_time += time.perf_counter() - t0
+        if target not in settled:
+            return float('inf'), [], len(settled)
+
+        path = []
+        v = target
+        while v != source:
+            v, edge_id = parent[v]
+            path.append(edge_id)
+        path.reverse()
+        return distances[target], path, len(settled)
+
+    def cache_stats(self) -> dict:
+        """ Счетчики кэша тайлов для подбора max_tiles """
+        cache = self.cache
+        requests = cache.hits + cache.loads
+        return {
+            'max_tiles': cache.max_tiles,
+            'hits': cache.hits,
+            'loads': cache.loads,
+            'hit_rate': cache.hits / requests if requests else None,
+            'evictions': cache.evictions,
+            'bytes_loaded': cache.bytes_loaded,
+            'load_time': cache.load_time,
+            'skipped_by_flags': self.skipped,
+        }
+
+
+def _reachable(adjacency: np.ndarray, start: int) -> set[int]:
+    """ Вершины, достижимые из start в графе с матрицей смежности adjacency (K x K) """
+    reached = {start}
+    stack = [start]
+    while stack:
+        for b in np.flatnonzero(adjacency[stack.pop()]).tolist():
+            if b not in reached:
+                reached.add(b)
+                stack.append(b)
+    return reached
@@ -0,0 +1,111 @@
+"""
+Наборы запросов (workload) для замеров.
+
+Случайные пары (s, t) почти всегда далеки друг от друга, поэтому кроме них строятся:
+    rank   - запросы по рангу Дейкстры: для источника s цель - вершина, которую алгоритм Дейкстры
+             из s исследует 2^i-ой по счету (ранг 2^i), от ближних запросов до самых дальних
+    same   - начало и конец в одном регионе
+    cross  - начало и конец в разных регионах
+
+Наборы сохраняются в CSV, чтобы все режимы поиска замерялись на одинаковых запросах.
+"""
+from __future__ import annotations
+
+import csv
+import random
+from typing import NamedTuple
+
+from algo.dijkstra.dijkstra import dijkstra
+from algo.graph import Graph
+
+WORKLOAD_FIELDS = ['source', 'target', 'kind', 'rank']
+
+
+class Query(NamedTuple):
+    """ Запрос: индексы вершин начала и конца, вид запроса и ранг Дейкстры (для вида rank) """
+    source: int
+    target: int
+    kind: str = 'random'
+    rank: int | None = None
+
+
+def dijkstra_order(graph: Graph, source: int) -> list[int]:
+    """ Вершины, достижимые из source, в порядке исследования алгоритмом Дейкстры (source первая) """
+    distances, _ = dijkstra(graph, graph.vertex_at(source))
+    reachable = [i for i, distance in enumerate(distances) if distance is not None]
+    reachable.sort(key=lambda i: distances[i])  # сортировка устойчивая: при равных расстояниях - по индексу
+    return reachable
+
+
+def rank_queries(graph: Graph, sources_count: int, seed: int | None = None) -> list[Query]:
+    """
+    Запросы по рангу Дейкстры: для каждого случайного источника - цели с рангами 2, 4, 8, ...
+    пока ранг меньше количества достижимых вершин
+    :param graph: граф
+    :param sources_count: количество случайных источников
+    :param seed: зерно выбора источников
+    """
+    rnd = random.Random(seed)
+    queries = []
+    for _ in range(sources_count):
+        source = rnd.randrange(graph.vertex_count)
+        order = dijkstra_order(graph, source)
+        rank = 2
+        while rank < len(order):
+            queries.append(Query(source, order[rank], 'rank', rank))
+            rank *= 2
+    return queries
+
+
+def region_queries(graph: Graph, count: int, same_region: bool, seed: int | None = None) -> list[Query]:
+    """
+    Запросы внутри одного региона (same_region=True) или между разными регионами
+    :param graph: граф
+    :param count: количество запросов
+    :param same_region: начало и конец в одном регионе или в разных
+    :param seed: зерно выбора вершин
+    """
+    by_region: dict[int, list[int]] = {}
+    for i in range(graph.vertex_count):
+        by_region.setdefault(graph.vertex_at(i).k, []).append(i)
+    regions = sorted(by_region)
+    if not same_region and len(regions) < 2:
+        raise ValueError("Для запросов между регионами нужно хотя бы два региона")
+
+    rnd = random.Random(seed)
+    kind = 'same' if same_region else 'cross'
+    queries = []
+    for _ in range(count):
+        source = rnd.randrange(graph.vertex_count)
+        region = graph.vertex_at(source).k
+        if not same_region:
+            region = rnd.choice([r for r in regions if r != region])
+        queries.append(Query(source, rnd.choice(by_region[region]), kind))
+    return queries
+
+
+def mixed_workload(graph: Graph, sources_count: int, region_count: int = 0,
+                   seed: int | None = None) -> list[Query]:
+    """ Запросы по рангу плюс по region_count запросов внутри регионов и между регионами """
+    queries = rank_queries(graph, sources_count, seed)
+    if region_count:
+        queries += region_queries(graph, region_count, True, seed)
+        if len({graph.vertex_at(i).k for i in range(graph.vertex_count)}) > 1:
+            queries += region_queries(graph, region_count, False, seed)
+    return queries
+
+
+def save_workload(queries: list[Query], path: str) -> None:
+    """ Сохранить набор запросов в CSV """
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(WORKLOAD_FIELDS)
+        writer.writerows((q.source, q.target, q.kind, '' if q.rank is None else q.rank) for q in queries)
+
+
+def load_workload(path: str) -> list[Query]:
+    """ Загрузить набор запросов из CSV """
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return [Query(int(row['source']), int(row['target']), row['kind'] or 'random',
+                      int(row['rank']) if row['rank'] else None)
+                for row in csv.DictReader(f)]
@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-import json
 import sys
 import time
 
@@ -8,18 +7,25 @@ import numpy as np
 import pyqtgraph as pg
 from PyQt6.QtCore import Qt, QThread, pyqtSignal, QPointF
 from PyQt6.QtGui import QAction, QPixmap, QColor, QIcon, QPainterPath
-from PyQt6.QtWidgets import QMainWindow, QApplication, QFileDialog, QMenu, QMessageBox
+from PyQt6.QtWidgets import QMainWindow, QApplication, QFileDialog, QMenu, QMessageBox, QLabel
 from pyqtgraph.GraphicsScene.mouseEvents import MouseClickEvent
 
 from algo.config import DEBUG
-from algo.dijkstra.arc_flags import arc_flags_preprocessing
+from algo.dijkstra.arc_flags import arc_flags_preprocessing, default_backend, PreprocessingCancelled
 from algo.dijkstra.dijkstra_bidirectional import dijkstra_bidirectional
 from algo.dijkstra.dijkstra_unidirectional import dijkstra_unidirectional
-from algo.dijkstra.structures import WeightedPath
+from algo.dijkstra.structures import WeightedPath, QueryStats, CancellationToken, QueryCancelled, SearchSpace
 from algo.graph import Graph
+from algo.graph_io import GraphData, edge_lengths, load_graph_data, save_graph_data
+from algo.metrics import METRICS, measured
 from algo.vertex import Vertex
 from gui.color_squares import ColorSquaresDialog
 from gui.config import DARK_GREEN, COLORS, K
+from gui.edges import EdgeLayer, HIGHLIGHTED
+from gui.benchmark_panel import BenchmarkPanel
+from gui.compare import CompareDialog, ModeRun
+from gui.search import HeatOverlay, SearchLayer
+from gui.viewport import LabelLayer
 
 
 class CustomViewBox(pg.ViewBox):
@@ -29,17 +35,53 @@ class CustomViewBox(pg.ViewBox):
         self.addItem(self.graph)
 
 
+def build_graph(texts, points_colors, pos, adjacency, edge_ids) -> Graph:
+    """ Построить Graph по данным GUI: регион вершины - номер её цвета в COLORS, вес ребра - длина отрезка """
+    regions = {color: i for i, color in enumerate(COLORS.values())}
+    # noinspection PyTypeChecker
+    vertices = [Vertex(text, regions[tuple(color)]) for text, color in zip(texts, points_colors)]
+    graph = Graph(k=K, vertices=vertices)
+    for (v1, v2), length, edge_id in zip(adjacency.tolist(), edge_lengths(pos, adjacency).tolist(),
+                                         edge_ids.tolist()):
+        graph.add_edge_by_indices(v1, v2, length, edge_id)
+    return graph
+
+
+def gui_fields(data: GraphData) -> dict:
+    """ Данные для GraphGUI.setData из графа, загруженного algo.graph_io (цвет вершины - цвет её региона) """
+    colors = list(COLORS.values())
+    return {
+        'pos': data.pos,
+        'adj': data.adj,
+        'edge_ids': data.ids(),
+        'points_colors': [colors[region] for region in data.regions.tolist()],
+        'texts': [data.text_at(i) for i in range(data.vertex_count)],
+    }
+
+
+def same_graph_source(first: tuple, second: tuple) -> bool:
+    """ Совпадают ли данные, по которым строится Graph (см. GraphGUI.graph_source) """
+    return all(np.array_equal(a, b) if isinstance(a, np.ndarray) else a == b for a, b in zip(first, second))
+
+
 class GraphGUI(pg.GraphItem):
     def __init__(self, main_window: MainWindow, **kwargs):
         self.data = {}
         self.main_window = main_window
-        self.textItems = []
+        self.labels = LabelLayer(self)  # Подписи вершин (только видимые)
         self.texts = []
         self.points_colors = []
-        self.arrows = []
-        self.edges = []  # Список графических элементов рёбер
+        self.edge_layer: EdgeLayer | None = None  # Графические элементы рёбер (создаются при первой отрисовке)
+        self.edge_ids = np.zeros(0, dtype=np.int64)  # Постоянные номера рёбер в порядке строк adjacency
+        self.edge_rows = np.zeros(0, dtype=np.int64)  # Строка adjacency по номеру ребра (-1 - ребра нет)
+        self._next_edge_id = 0  # Номер для следующего нового ребра (номера удаленных рёбер не переиспользуются)
 
         self.graph: Graph | None = None
+        self.arc_flags_ready = False  # Флаги self.graph посчитаны (иначе поиск с arc_flags недоступен)
+        self._graph_source: tuple | None = None  # Данные, по которым построен self.graph
+        self.preprocessing: PreprocessingWorker | None = None  # Текущая фоновая предобработка
+        self._preprocessing_generation = 0  # Номер последней запущенной предобработки
+        self._preprocessing_workers: set[PreprocessingWorker] = set()  # Потоки, которые ещё не завершились
 
         super().__init__(**kwargs)
 
@@ -65,54 +107,114 @@ class GraphGUI(pg.GraphItem):
             self.points_colors = self.data.pop('points_colors')
             self.data['symbolBrush'] = [pg.mkBrush(color=color) for color in self.points_colors]
             self.data['symbolPen'] = [pg.mkPen(width=0) for _ in self.points_colors]
+        edge_ids = self.data.pop('edge_ids', None)
         if 'adj' in self.data:
-            self.data['edgePen'] = [pg.mkPen(width=5) for _ in self.data['adj']]
-            self.data['arrowBrush'] = [pg.mkBrush(color='w') for _ in self.data['adj']]
+            edge_count = len(self.data['adj']) if self.data['adj'] is not None else 0
+            if edge_ids is None and len(self.edge_ids) != edge_count:
+                edge_ids = np.arange(edge_count)  # рёбра без номеров нумеруются по порядку
+            if edge_ids is not None:
+                self.set_edge_ids(edge_ids)
+            self.data['edgeState'] = np.zeros(edge_count, dtype=np.int8)  # состояние (стиль) рёбер
         self.data['pen'] = pg.mkPen(None)
         self.updateGraph()
 
+    def set_edge_ids(self, edge_ids):
+        """ Задать номера рёбер (по одному на строку adjacency) и таблицу строк по номерам """
+        self.edge_ids = np.asarray(edge_ids, dtype=np.int64).reshape(-1)
+        if len(np.unique(self.edge_ids)) != len(self.edge_ids):
+            raise ValueError("Номера рёбер должны быть различными")
+        self.edge_rows = np.full(int(self.edge_ids.max(initial=-1)) + 1, -1, dtype=np.int64)
+        self.edge_rows[self.edge_ids] = np.arange(len(self.edge_ids))
+        self._next_edge_id = max(self._next_edge_id, len(self.edge_rows))
+
     def setTexts(self, text):
-        for i in self.textItems:
-            i.scene().removeItem(i)
-        self.textItems = []
-        for t in text:
-            item = pg.TextItem(t)
-            self.textItems.append(item)
-            item.setParentItem(self)
+        # Подписи создаются при отрисовке и только для видимых вершин
+        self.texts = text
 
     def updateGraph(self):
         super().setData(**self.data)
-        for i, item in enumerate(self.textItems):
-            item.setPos(*self.pos[i])
+        if self.pos is not None:
+            self.labels.set_labels(self.pos, self.texts)
         self.scatter.setAcceptHoverEvents(True)
         self.drawArrows()
         self.fillGraph()
 
-    def fillGraph(self):
-        vertices = []
-        for text, color in zip(self.texts, self.points_colors):
-            # noinspection PyTypeChecker
-            vertices.append(Vertex(text, list(COLORS.values()).index(tuple(color))))
-
-        self.graph = Graph(k=K, vertices=vertices)
-
-        if self.adjacency is not None:
-            for (v1, v2), edge in zip(self.adjacency, self.edges):
-                x_data, y_data = edge.getData()
+    def graph_source(self) -> tuple:
+        """ Копия данных, по которым строится Graph: названия, цвета, координаты, рёбра и их номера """
+        pos = np.array(self.pos if self.pos is not None else np.zeros((0, 2)), dtype=float)
+        adjacency = np.array(self.adjacency if self.adjacency is not None else np.zeros((0, 2)), dtype=np.int64)
+        return (list(self.texts), [tuple(color) for color in self.points_colors], pos,
+                adjacency.reshape(-1, 2), self.edge_ids.copy())
 
-                # Вычисляем разности между соседними точками
-                dx = np.diff(x_data)
-                dy = np.diff(y_data)
+    def graph_data(self) -> GraphData:
+        """ Текущий граф в виде массивов (регион вершины - номер её цвета в COLORS) """
+        texts, colors, pos, adjacency, edge_ids = self.graph_source()
+        regions = {color: i for i, color in enumerate(COLORS.values())}
+        return GraphData(pos=pos, adj=adjacency, regions=np.array([regions[color] for color in colors], dtype=np.int64),
+                         texts=texts, edge_ids=edge_ids)
 
-                # Вычисляем длины отрезков между точками
-                segment_lengths = np.sqrt(dx ** 2 + dy ** 2)
-                self.graph.add_edge_by_indices(int(v1), int(v2), float(segment_lengths[0]))
-
-        arc_flags_preprocessing(self.graph)
+    def fillGraph(self):
+        """
+        Построить Graph для поиска (без флагов) и запустить предобработку arc_flags в фоне.
+        Если граф не изменился (например, изменилось только выделение), ничего не делается.
+        Текущий поиск отменяется: его результат и ход относятся к старым вершинам и номерам рёбер
+        """
+        source = self.graph_source()
+        if self._graph_source is not None and same_graph_source(source, self._graph_source):
+            return
+        first = self._graph_source is None  # первое построение (из конструктора) - поиска ещё нет
+        self._graph_source = source
+        self.graph = build_graph(*source)
+        self.set_arc_flags_ready(False)
+        self.start_preprocessing(source)
+        if not first:
+            if self.find_method:
+                self.main_window.cancel_and_reset()  # выбранные вершины тоже относятся к старому графу
+            else:
+                self.main_window.cancel_search()
 
         if DEBUG:
             print(self.graph)
 
+    def start_preprocessing(self, source: tuple):
+        """ Запустить предобработку в фоне, прервав предыдущую (её результат уже не нужен) """
+        if self.preprocessing is not None:
+            self.preprocessing.requestInterruption()
+        self._preprocessing_generation += 1
+        worker = PreprocessingWorker(source, self._preprocessing_generation)
+        worker.progress.connect(self.on_preprocessing_progress)
+        worker.ready.connect(self.on_preprocessing_ready)
+        worker.finished.connect(lambda: self._preprocessing_workers.discard(worker))
+        self._preprocessing_workers.add(worker)
+        self.preprocessing = worker
+        worker.start()
+
+    def stop_preprocessing(self):
+        """ Прервать фоновую предобработку и дождаться завершения потоков """
+        for worker in list(self._preprocessing_workers):
+            worker.requestInterruption()
+            worker.wait()
+        self.preprocessing = None
+
+    def on_preprocessing_progress(self, generation, done, total):
+        if generation == self._preprocessing_generation:
+            self.main_window.set_preprocessing_status(f"arc_flags: {100 * done // max(total, 1)}%")
+
+    def on_preprocessing_ready(self, generation, graph, elapsed):
+        if generation != self._preprocessing_generation:
+            return  # граф успели изменить
+        # Граф с флагами построен по тем же данным, что и self.graph - просто подменяем его
+        self.graph = graph
+        self.preprocessing = None
+        self.set_arc_flags_ready(True)
+        self.main_window.set_preprocessing_status(f"arc_flags готовы ({elapsed:.2f} с)")
+
+    def set_arc_flags_ready(self, ready):
+        self.arc_flags_ready = ready
+        self.main_window.set_arc_flags_available(ready)
+        if not ready:
+            self.main_window.set_preprocessing_status("arc_flags: 0%")
+
     def mouseDragEvent(self, ev):
         ev.accept()
         pos = ev.pos()
@@ -153,6 +255,7 @@ class GraphGUI(pg.GraphItem):
             if self.dragging_edge:
                 self.finish_adding_edge(None)
             if self.find_method:
+                self.main_window.cancel_search()
                 self.reset_find()
         elif event.button() == Qt.MouseButton.RightButton:
             context_menu = QMenu()
@@ -167,8 +270,7 @@ class GraphGUI(pg.GraphItem):
     def reset_find(self):
         self.main_window.statusBar().clearMessage()
         self.data['symbolPen'] = [pg.mkPen(width=0) for _ in self.points_colors]
-        self.data['edgePen'] = [pg.mkPen(width=5) for _ in self.data['adj']]
-        self.data['arrowBrush'] = [pg.mkBrush(color='w') for _ in self.data['adj']]
+        self.data['edgeState'] = np.zeros(len(self.data['adj']), dtype=np.int8)
 
         self.find_method = None
         self.start_vertex = None
@@ -177,57 +279,12 @@ class GraphGUI(pg.GraphItem):
         self.updateGraph()
 
     def drawArrows(self):
-        for arrow in self.arrows:
-            arrow.scene().removeItem(arrow)
-        self.arrows = []
-
-        # Удаляем предыдущие графические элементы рёбер
-        for edge in self.edges:
-            self.getViewBox().removeItem(edge)
-        self.edges = []
-
-        if self.adjacency is not None:
-            for edge, line_pen, arrow_brush in zip(self.adjacency, self.data['edgePen'], self.data['arrowBrush']):
-                start = self.pos[edge[0]]
-                end = self.pos[edge[1]]
-
-                # Проверка на наличие обратного ребра
-                reverse_edge_exists = any((rev_edge == [edge[1], edge[0]]).all() for rev_edge in self.adjacency)
-
-                if reverse_edge_exists:
-                    # Если существует обратное ребро, добавим изгиб для текущего ребра
-                    ctrl_offset = np.array([-(end[1] - start[1]), end[0] - start[0]]) * 0.2  # Перпендикулярное смещение
-                    ctrl_point = (start + end) / 2 + ctrl_offset
-
-                    # Создание кривой с использованием контрольной точки
-                    x_points = [start[0], ctrl_point[0], end[0]]
-                    y_points = [start[1], ctrl_point[1], end[1]]
-
-                    # Вычисление угла на основе направления касательной в конечной точке кривой
-                    angle = np.degrees(np.arctan2((end[1] - ctrl_point[1]), (end[0] - ctrl_point[0]))) + 180
-
-                else:
-                    # Прямое ребро
-                    x_points = [start[0], end[0]]
-                    y_points = [start[1], end[1]]
-
-                    angle = np.degrees(np.arctan2((end[1] - start[1]), (end[0] - start[0]))) + 180
-
-                line = pg.PlotCurveItem(x_points, y_points, pen=line_pen, clickable=True)
-
-                # Добавление события нажатия на ребро
-                line.sigClicked.connect(self.edge_click)
-
-                self.getViewBox().addItem(line)
-                self.edges.append(line)
-
-                arrow = pg.ArrowItem(pos=end,
-                                     angle=angle,
-                                     brush=arrow_brush,
-                                     headLen=0.7,
-                                     pxMode=False)
-                self.arrows.append(arrow)
-                self.getViewBox().addItem(arrow)
+        if self.getViewBox() is None:  # элемент еще не добавлен на сцену
+            return
+        if self.edge_layer is None:
+            self.edge_layer = EdgeLayer(self.getViewBox(), self.edge_click)
+            self.getViewBox().sigRangeChanged.connect(self.labels.render)
+        self.edge_layer.set_edges(self.pos, self.adjacency, self.data.get('edgeState', np.zeros(0, dtype=np.int8)))
 
     def scatter_right_click(self, scatter, points, event):
         if points:
@@ -307,40 +364,36 @@ class GraphGUI(pg.GraphItem):
         self.start_vertex = None
         self.temp_arrow = None
 
-    def edge_click(self, line, event):
+    def edge_click(self, index, event):
         if event.button() == Qt.MouseButton.LeftButton:
             # Контекстное меню для удаления ребра
             context_menu = QMenu()
             delete_action = QAction("Удалить ребро", context_menu)
-            delete_action.triggered.connect(lambda: self.remove_edge(line))
+            delete_action.triggered.connect(lambda: self.remove_edge(index))
             context_menu.addAction(delete_action)
 
             show_flags_action = QAction("Посмотреть флаги", context_menu)
-            show_flags_action.triggered.connect(lambda: self.show_flags(line))
+            show_flags_action.triggered.connect(lambda: self.show_flags(index))
             context_menu.addAction(show_flags_action)
             context_menu.exec(event.screenPos().toPoint())
 
-    def remove_edge(self, line):
-        # Удаление графического элемента ребра
-        self.getViewBox().removeItem(line)
-
-        # Удаление ребра из списка рёбер
-        if line in self.edges:
-            index = self.edges.index(line)
-            self.edges.pop(index)
-            # Также удаляем ребро из списка смежности
-            self.adjacency = np.delete(self.adjacency, index, axis=0)
-            # Обновляем граф без удалённого ребра
-            self.setData(**(self.data | {'adj': self.adjacency}))
+    def remove_edge(self, index):
+        # Удаляем ребро из списка смежности (номера остальных рёбер не меняются)
+        self.adjacency = np.delete(self.adjacency, index, axis=0)
+        edge_ids = np.delete(self.edge_ids, index)
+        # Обновляем граф без удалённого ребра
+        self.setData(**(self.data | {'adj': self.adjacency, 'edge_ids': edge_ids}))
 
     def add_edge(self, start_vertex, end_vertex):
         start_index = int(start_vertex.index())
         end_index = int(end_vertex.index())
 
+        adjacency = self.adjacency if self.adjacency is not None else np.zeros((0, 2), dtype=int)
         # Проверка, что такое ребро еще не существует
-        if not any((edge == [start_index, end_index]).all() for edge in self.adjacency):
-            self.adjacency = np.vstack([self.adjacency, [start_index, end_index]])
-            self.setData(**(self.data | {'adj': self.adjacency}))
+        if not np.all(adjacency == [start_index, end_index], axis=1).any():
+            self.adjacency = np.vstack([adjacency, [start_index, end_index]])
+            edge_ids = np.append(self.edge_ids, self._next_edge_id)  # новое ребро получает следующий номер
+            self.setData(**(self.data | {'adj': self.adjacency, 'edge_ids': edge_ids}))
 
     def add_vertex(self, pos):
         new_pos = np.array([pos.x(), pos.y()])
@@ -362,14 +415,16 @@ class GraphGUI(pg.GraphItem):
         self.points_colors.pop(index)
 
         # Удаляем все ребра, связанные с данной вершиной
-        self.adjacency = np.array([edge for edge in self.adjacency if index not in edge])
+        keep = np.all(self.adjacency != index, axis=1)
+        self.adjacency = self.adjacency[keep]
+        edge_ids = self.edge_ids[keep]
 
         # Обновляем индексы в ребрах после удаления вершины
-        self.adjacency = np.array([[i if i < index else i - 1 for i in edge] for edge in self.adjacency])
+        self.adjacency = self.adjacency - (self.adjacency > index)
 
         # Обновляем граф
-        self.setData(**(self.data | {"adj": self.adjacency, "pos": self.pos, "texts": self.texts,
-                                     "points_colors": self.points_colors}))
+        self.setData(**(self.data | {"adj": self.adjacency, "edge_ids": edge_ids, "pos": self.pos,
+                                     "texts": self.texts, "points_colors": self.points_colors}))
 
     def recolor_vertex(self, point, color):
         index = int(point.index())
@@ -380,59 +435,152 @@ class GraphGUI(pg.GraphItem):
 
     def highlight_path(self, path: WeightedPath):
         if path:
-            edge = None
+            # Строки рёбер пути находятся по их номерам
+            edge_ids = np.fromiter((edge.id for edge in path), dtype=np.int64, count=len(path))
+            self.data['edgeState'][self.edge_rows[edge_ids]] = HIGHLIGHTED
+
+            pen = pg.mkPen(width=5, color=DARK_GREEN)
             for edge in path:
-                self.data['symbolPen'][edge.u] = pg.mkPen(width=5, color=DARK_GREEN)
-                edge_arr = np.array([edge.u, edge.v])
-                edge_ind = None
-                for i, row in enumerate(self.adjacency):
-                    if np.array_equal(row, edge_arr):
-                        edge_ind = i
-                        break
-
-                self.data['edgePen'][edge_ind] = pg.mkPen(width=5, color=DARK_GREEN)
-                self.data['arrowBrush'][edge_ind] = pg.mkBrush(color=DARK_GREEN)
-
-            self.data['symbolPen'][edge.v] = pg.mkPen(width=5, color=DARK_GREEN)
+                self.data['symbolPen'][edge.u] = pen
+            self.data['symbolPen'][path[-1].v] = pen
             self.updateGraph()
 
-    def show_flags(self, line):
-        line_ind = self.edges.index(line)
-        start, end = self.adjacency[line_ind]
-        edge = [edge for edge in self.graph.edges_of_index(int(start)) if edge.v == int(end)][0]
+    def show_flags(self, index):
+        edge = self.graph.edge_by_id(int(self.edge_ids[index]))
 
         self.dialog = ColorSquaresDialog(edge._flags)
         self.dialog.show()
 
 
+# Запросы из GUI записываются в метрики процесса (Файл -> Экспорт метрик)
+measured_unidirectional = measured(dijkstra_unidirectional, 'unidirectional')
+measured_bidirectional = measured(dijkstra_bidirectional, 'bidirectional')
+MEASURED_QUERIES = {'unidirectional': measured_unidirectional, 'bidirectional': measured_bidirectional}
+
+
+class PreprocessingWorker(QThread):
+    """
+    Поток предобработки arc_flags. Строит свой Graph по копии данных GUI, поэтому GUI может
+    продолжать поиск без arc_flags по своему графу. Прерывается через requestInterruption()
+    """
+    progress = pyqtSignal(int, int, int)  # номер предобработки, обработано вершин, всего вершин
+    ready = pyqtSignal(int, object, float)  # номер предобработки, граф с флагами, время предобработки
+
+    def __init__(self, source: tuple, generation: int, parent=None):
+        super().__init__(parent)
+        self.source = source  # данные для build_graph
+        self.generation = generation
+        self.backend = default_backend()  # scipy, если установлен
+        self._percent = -1
+
+    def run(self):
+        t0 = time.perf_counter()
+        graph = build_graph(*self.source)
+        try:
+            arc_flags_preprocessing(graph, progress=self._progress, cancelled=self.isInterruptionRequested,
+                                    backend=self.backend)
+        except PreprocessingCancelled:
+            return
+        elapsed = time.perf_counter() - t0
+        METRICS.record_preprocessing(elapsed, self.backend)
+        self.ready.emit(self.generation, graph, elapsed)
+
+    def _progress(self, done, total):
+        # Сигнал отправляется, только когда меняется процент
+        percent = 100 * done // max(total, 1)
+        if percent != self._percent:
+            self._percent = percent
+            self.progress.emit(self.generation, done, total)
+
+
 class Worker(QThread):
     """
-    Поток для выполнения фоновой задачи (здесь это time.sleep)
+    Поток поиска кратчайшего пути. Поиск отменяется через self.cancel, ход поиска отправляется
+    сигналом snapshots, результат - сигналом finished (путь выделяется уже в потоке GUI)
     """
-    finished = pyqtSignal(bool, float, float, int)  # Сигнал, который передает время выполнения
+    # Сигнал с результатом: найден ли путь, время выполнения, расстояние, статистика, путь, пространство поиска
+    finished = pyqtSignal(bool, float, float, object, object, object)
+    snapshots = pyqtSignal(object)  # Снимки хода поиска (list[FrontierSnapshot]) с прошлой отправки
+    cancelled = pyqtSignal()  # Поиск отменен
+
+    SNAPSHOT_INTERVAL = 0.1  # Ход поиска отправляется в GUI не чаще, чем раз в столько секунд
 
     def __init__(self, graph, parent=None):
         super().__init__(parent)
-        self.graph: GraphGUI = graph  # Сохранение graph как атрибута экземпляра
+        # Всё, что нужно для поиска, запоминается в потоке GUI: пока поток работает, пользователь может
+        # изменить выделение, а предобработка - подменить граф. Если флаги ещё не готовы, выполняется обычный поиск
+        self.search_graph: Graph = graph.graph
+        self.arc_flags = graph.arc_flags and graph.arc_flags_ready
+        self.find_method = graph.find_method
+        self.start_index = int(graph.start_vertex.index())
+        self.end_index = int(graph.end_vertex.index())
+        self.cancel = CancellationToken()
+        self._pending = []  # Снимки, ещё не отправленные в GUI
+        self._last_sent = 0.0
 
     def run(self):
         start_time = time.time()
 
-        start_vertex = self.graph.graph.vertex_at(int(self.graph.start_vertex.index()))
-        end_vertex = self.graph.graph.vertex_at(int(self.graph.end_vertex.index()))
-
-        if self.graph.find_method == 'unidirectional':
-            distance, path, count_op = dijkstra_unidirectional(self.graph.graph, start_vertex, end_vertex,
-                                                               self.graph.arc_flags)
-        elif self.graph.find_method == 'bidirectional':
-            distance, path, count_op = dijkstra_bidirectional(self.graph.graph, start_vertex, end_vertex,
-                                                              self.graph.arc_flags)
+        start_vertex = self.search_graph.vertex_at(self.start_index)
+        end_vertex = self.search_graph.vertex_at(self.end_index)
+
+        stats = QueryStats()
+        space = SearchSpace()
+        query = MEASURED_QUERIES[self.find_method]
+        try:
+            distance, path, count_op = query(self.search_graph, start_vertex, end_vertex, self.arc_flags, stats=stats,
+                                             cancel=self.cancel, on_snapshot=self._snapshot, space=space)
+        except QueryCancelled:
+            self.cancelled.emit()
+            return
+        self._send_snapshots()
 
         elapsed_time = time.time() - start_time
 
-        self.graph.highlight_path(path)
+        # Эмитируем сигнал с результатом
+        self.finished.emit(distance != float('inf'), elapsed_time, distance, stats, path, space)
+
+    def _snapshot(self, snapshot):
+        self._pending.append(snapshot)
+        if time.perf_counter() - self._last_sent >= self.SNAPSHOT_INTERVAL:
+            self._send_snapshots()
+
+    def _send_snapshots(self):
+        if self._pending:
+            self.snapshots.emit(self._pending)
+            self._pending = []
+        self._last_sent = time.perf_counter()
 
-        self.finished.emit(distance != float('inf'), elapsed_time, distance, count_op)  # Эмитируем сигнал с результатом
+
+class CompareWorker(QThread):
+    """ Поток сравнения режимов: один и тот же запрос всеми режимами с записью пространства поиска """
+    finished = pyqtSignal(object)  # Результаты режимов (list[ModeRun])
+    cancelled = pyqtSignal()
+
+    def __init__(self, graph, parent=None):
+        super().__init__(parent)
+        self.search_graph: Graph = graph.graph
+        # Режимы с arc_flags сравниваются, только если флаги готовы
+        self.arc_flags_options = (False, True) if graph.arc_flags_ready else (False,)
+        self.start_index = int(graph.start_vertex.index())
+        self.end_index = int(graph.end_vertex.index())
+        self.cancel = CancellationToken()
+
+    def run(self):
+        start_vertex = self.search_graph.vertex_at(self.start_index)
+        end_vertex = self.search_graph.vertex_at(self.end_index)
+        runs = []
+        for mode, query in MEASURED_QUERIES.items():
+            for arc_flags in self.arc_flags_options:
+                stats, space = QueryStats(), SearchSpace()
+                try:
+                    distance, path, _ = query(self.search_graph, start_vertex, end_vertex, arc_flags, stats=stats,
+                                              cancel=self.cancel, space=space)
+                except QueryCancelled:
+                    self.cancelled.emit()
+                    return
+                runs.append(ModeRun(mode, arc_flags, distance, path, stats, space))
+        self.finished.emit(runs)
 
 
 class MainWindow(QMainWindow):
@@ -444,12 +592,30 @@ class MainWindow(QMainWindow):
         # Enable antialiasing for prettier plots
         pg.setConfigOptions(antialias=True)
 
+        # Ход предобработки arc_flags (справа в строке состояния)
+        self.preprocessing_label = QLabel()
+        self.statusBar().addPermanentWidget(self.preprocessing_label)
+        self.arc_flags_actions: list[QAction] = []  # Пункты меню поиска с arc_flags
+
         self.graph = GraphGUI(self)
 
         self.viewbx = CustomViewBox(graph=self.graph, enableMenu=False)
         self.graph_widget.addItem(self.viewbx)
         self.viewbx.setAspectLocked()
 
+        # Ход поиска (исследованные вершины и фронт)
+        self.search_layer = SearchLayer(self.viewbx)
+        self.heat = HeatOverlay(self.viewbx)  # Пространство поиска последнего запроса
+        self.compare_dialog: CompareDialog | None = None
+
+        # Панель замеров производительности (открывается из меню)
+        self.benchmark_panel = BenchmarkPanel(self.graph.graph_data, lambda: self.start_shortest_path('pick_pair'),
+                                              self)
+        self.addDockWidget(Qt.DockWidgetArea.RightDockWidgetArea, self.benchmark_panel)
+        self.benchmark_panel.hide()
+        self.worker: Worker | None = None  # Текущий поиск
+        self._workers: set[Worker] = set()  # Потоки поиска, которые ещё не завершились (в том числе отмененные)
+
         # Define positions of nodes
         pos = np.array([
             [0, 0],
@@ -504,6 +670,11 @@ class MainWindow(QMainWindow):
         export_action.triggered.connect(self.export_graph)
         fileMenu.addAction(export_action)
 
+        # Добавление опции экспорта метрик запросов
+        export_metrics_action = QAction('Экспорт метрик', self)
+        export_metrics_action.triggered.connect(self.export_metrics)
+        fileMenu.addAction(export_metrics_action)
+
         # Создание меню Run
         runMenu = menubar.addMenu('Запуск')
 
@@ -527,9 +698,44 @@ class MainWindow(QMainWindow):
         bidirectional_action.triggered.connect(lambda: self.start_shortest_path('bidirectional', True))
         dijkstra_menu.addAction(bidirectional_action)
 
+        compare_action = QAction('Сравнить режимы', self)
+        compare_action.triggered.connect(lambda: self.start_shortest_path('compare'))
+        runMenu.addAction(compare_action)
+
+        benchmark_action = self.benchmark_panel.toggleViewAction()
+        benchmark_action.setText('Замеры производительности')
+        runMenu.addAction(benchmark_action)
+
+        cancel_action = QAction('Отменить поиск', self)
+        cancel_action.setShortcut('Esc')
+        cancel_action.triggered.connect(self.cancel_and_reset)
+        runMenu.addAction(cancel_action)
+
+        # Пока идёт предобработка, поиск с arc_flags недоступен
+        self.arc_flags_actions = [unidirectional_action, bidirectional_action]
+        self.set_arc_flags_available(self.graph.arc_flags_ready)
+
         self.statusBar().showMessage("")
 
+    def set_arc_flags_available(self, available):
+        for action in self.arc_flags_actions:
+            action.setEnabled(available)
+
+    def set_preprocessing_status(self, text):
+        self.preprocessing_label.setText(text)
+
+    def closeEvent(self, event):
+        self.cancel_search()
+        for worker in list(self._workers):
+            worker.wait()
+        self.graph.stop_preprocessing()
+        self.benchmark_panel.stop()
+        super().closeEvent(event)
+
     def start_shortest_path(self, mode, arc_flags=False):
+        # Новый поиск отменяет текущий
+        if self.worker is not None:
+            self.cancel_and_reset()
         # Подсказка: выберите начальную вершину
         self.statusBar().showMessage("1. Выберите начальную вершину (или нажмите на поле чтобы отменить)")
 
@@ -537,49 +743,113 @@ class MainWindow(QMainWindow):
         self.graph.find_method = mode  # Сохранение выбранного режима
 
     def run_algorithm(self):
-        # Запуск алгоритма в отдельном потоке
-        self.worker = Worker(self.graph)
-        self.worker.finished.connect(self.on_algorithm_finished)  # Подключение сигнала к слоту
-        self.worker.start()
+        # Запуск алгоритма в отдельном потоке (текущий поиск, если он есть, отменяется)
+        self.cancel_search()
+        if self.graph.find_method == 'pick_pair':
+            # Пара вершин для панели замеров, поиск не запускается
+            self.benchmark_panel.add_pair(int(self.graph.start_vertex.index()), int(self.graph.end_vertex.index()))
+            self.graph.reset_find()
+            return
+        # Подключение сигналов к слотам
+        if self.graph.find_method == 'compare':
+            worker = CompareWorker(self.graph)
+            worker.finished.connect(self.on_compare_finished)
+        else:
+            worker = Worker(self.graph)
+            worker.snapshots.connect(self.on_search_progress)
+            worker.finished.connect(self.on_algorithm_finished)
+        worker.cancelled.connect(self.on_algorithm_cancelled)
+        self._workers.add(worker)
+        self.worker = worker
+        worker.start()
+
+    def cancel_search(self):
+        """ Отменить текущий поиск (поток завершится сам на ближайшем шаге алгоритма) """
+        if self.worker is not None:
+            self.worker.cancel.cancel()
+            self.worker = None
+            self.statusBar().showMessage("Поиск отменен")
+        self.search_layer.clear()
+        self.heat.clear()
+
+    def cancel_and_reset(self):
+        self.cancel_search()
+        self.graph.reset_find()
 
-    def on_algorithm_finished(self, exists, elapsed_time, distance, count_op):
+    def _forget_worker(self, worker):
+        # Поток уже отправил последний сигнал, поэтому дождаться его завершения можно сразу
+        worker.wait()
+        self._workers.discard(worker)
+
+    def on_search_progress(self, snapshots):
+        if self.sender() is self.worker:
+            self.search_layer.add(self.graph.pos, snapshots)
+
+    def on_algorithm_cancelled(self):
+        self._forget_worker(self.sender())
+
+    def on_algorithm_finished(self, exists, elapsed_time, distance, stats: QueryStats, path: WeightedPath,
+                              space: SearchSpace):
+        worker = self.sender()
+        self._forget_worker(worker)
+        if worker is not self.worker:
+            return  # результат отмененного поиска
+        self.worker = None
+        # Вместо хода поиска - тепловая карта всего пространства поиска
+        self.search_layer.clear()
+        self.heat.show(self.graph.pos, self.graph.adjacency, self.graph.edge_rows, space)
+        self.graph.highlight_path(path)
         self.statusBar().showMessage("Алгоритм завершен")
         message = "Путь "
         message += "найден ✅" if exists else "не найден ❌"
+        if self.graph.arc_flags and not worker.arc_flags:
+            message += "\narc_flags ещё не были готовы, выполнен поиск без них"
         message += f".\nВремя выполнения: {elapsed_time:.5f} секунд.\n"
-        message += f"Количество выполненных операций: {count_op}.\n"
+        message += (f"Поиск: {stats.search_time:.5f} с, место встречи: {stats.repair_time:.5f} с, "
+                    f"маршрут: {stats.path_time:.5f} с.\n")
+        message += f"Исследовано вершин: {stats.settled}.\n"
+        message += f"Рассмотрено ребер: {stats.relaxed}, отброшено arc_flags: {stats.pruned}.\n"
+        message += f"Очередь: добавлений {stats.pushes}, извлечений {stats.pops} (устаревших {stats.stale_pops}).\n"
         if exists:
             message += f"Расстояние пути: {distance:.2f}"
         # Показ информационного окна
         QMessageBox.information(self, "Результат", message)
+        self.heat.clear()
+        self.graph.reset_find()
+
+    def on_compare_finished(self, runs: list[ModeRun]):
+        worker = self.sender()
+        self._forget_worker(worker)
+        if worker is not self.worker:
+            return
+        self.worker = None
+        self.statusBar().showMessage("Сравнение завершено")
+        self.compare_dialog = CompareDialog(self.graph.pos, self.graph.adjacency, self.graph.edge_rows, runs, self)
+        self.compare_dialog.show()
         self.graph.reset_find()
 
     def export_graph(self):
-        file_name, _ = QFileDialog.getSaveFileName(self, "Save Graph", "", "JSON Files (*.json);;All Files (*)")
+        file_name, _ = QFileDialog.getSaveFileName(self, "Save Graph", "",
+                                                   "JSON Files (*.json);;NumPy (*.npz);;All Files (*)")
         if file_name:
-            self.export_graph_to_json(file_name)
+            save_graph_data(self.graph.graph_data(), file_name)
 
-    def import_graph(self):
-        file_name, _ = QFileDialog.getOpenFileName(self, "Open Graph", "", "JSON Files (*.json);;All Files (*)")
+    def export_metrics(self):
+        file_name, _ = QFileDialog.getSaveFileName(self, "Save Metrics", "",
+                                                   "Prometheus (*.prom);;JSON Files (*.json);;All Files (*)")
         if file_name:
-            self.graph.setData(**(self.graph.data | self.import_graph_from_json(file_name)))
-
-    def export_graph_to_json(self, file_path):
-        graph_data = {
-            "pos": self.graph.pos.tolist(),
-            "adj": self.graph.adjacency.tolist(),
-            "points_colors": self.graph.points_colors,
-            "texts": self.graph.texts,
-        }
-        with open(file_path, 'w') as f:
-            json.dump(graph_data, f)
-
-    def import_graph_from_json(self, file_path):
-        with open(file_path, 'r') as f:
-            graph_data = json.load(f)
-        graph_data['pos'] = np.array(graph_data["pos"])
-        graph_data['adj'] = np.array(graph_data["adj"])
-        return graph_data
+            METRICS.save(file_name)
+
+    def import_graph(self):
+        file_name, _ = QFileDialog.getOpenFileName(self, "Open Graph", "",
+                                                   "Graph Files (*.json *.npz);;All Files (*)")
+        if not file_name:
+            return
+        data = load_graph_data(file_name)
+        if data.k > K:
+            QMessageBox.warning(self, "Open Graph", f"В графе {data.k} регионов, а цветов регионов только {K}")
+            return
+        self.graph.setData(**(self.graph.data | gui_fields(data)))
 
 
 if __name__ == '__main__':
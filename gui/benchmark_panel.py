@@ -0,0 +1,204 @@
+""" Панель замеров производительности: все режимы поиска на текущем графе (algo.benchmark) """
+from __future__ import annotations
+
+import random
+from typing import Callable
+
+from PyQt6.QtCore import Qt, QThread, pyqtSignal
+from PyQt6.QtWidgets import (QCheckBox, QDockWidget, QFileDialog, QFormLayout, QHBoxLayout, QLabel, QLineEdit,
+                             QPushButton, QSpinBox, QTableWidget, QTableWidgetItem, QVBoxLayout, QWidget)
+
+from algo.benchmark import run_benchmark, save_results
+from algo.dijkstra.arc_flags import PreprocessingCancelled, default_backend
+from algo.dijkstra.structures import CancellationToken, QueryCancelled
+from algo.graph_io import GraphData
+from gui.compare import MODE_TITLES
+
+CURRENT_REGIONS = 'текущие регионы'  # Название графа в результатах для разбиения по цветам вершин
+STRIP_REGIONS = 'полосы'  # Название графа в результатах для разбиения assign_regions
+
+# Колонки таблицы: заголовок и функция, которая по строке результатов возвращает текст ячейки
+TABLE_COLUMNS: list[tuple[str, Callable[[dict], str]]] = [
+    ('Разбиение', lambda row: row['graph']),
+    ('K', lambda row: str(row['k'])),
+    ('Режим', lambda row: MODE_TITLES.get(row['mode'], row['mode']) + (' (arc_flags)' if row['arc_flags'] else '')),
+    ('Среднее, мс', lambda row: f"{row['time_mean'] * 1000:.3f}"),
+    ('p50, мс', lambda row: f"{row['time_p50'] * 1000:.3f}"),
+    ('p95, мс', lambda row: f"{row['time_p95'] * 1000:.3f}"),
+    ('Вершин', lambda row: f"{row['settled_mean']:.1f}"),
+    ('Ускорение', lambda row: f"x{row['speedup']:.2f}" if row.get('speedup') else ''),
+    ('Предобработка, с', lambda row: f"{row['preprocessing_time']:.2f}" if row['preprocessing_time'] else ''),
+]
+
+
+class BenchmarkWorker(QThread):
+    """ Поток замеров: run_benchmark для текущих регионов и (или) для разбиений на K полос """
+    progress = pyqtSignal(str)
+    finished = pyqtSignal(object)  # Строки результатов (list[dict])
+    cancelled = pyqtSignal()
+
+    def __init__(self, data: GraphData, ks: list[int], current_regions: bool, queries_count: int,
+                 pairs: list[tuple[int, int]] | None, parent=None):
+        super().__init__(parent)
+        self.data = data
+        self.ks = ks
+        self.current_regions = current_regions
+        self.queries_count = queries_count
+        self.pairs = pairs
+        self.seed = random.randrange(2 ** 31)  # одни и те же случайные пары для всех разбиений
+        self.cancel = CancellationToken()
+
+    def run(self):
+        runs = []
+        if self.current_regions:
+            runs.append((CURRENT_REGIONS, [None]))
+        if self.ks:
+            runs.append((STRIP_REGIONS, self.ks))
+        rows = []
+        try:
+            for name, ks in runs:
+                rows += run_benchmark({name: self.data}, ks, queries_count=self.queries_count, seed=self.seed,
+                                      measure_memory=False, progress=self.progress.emit, queries=self.pairs,
+                                      cancel=self.cancel, backend=default_backend())
+        except (QueryCancelled, PreprocessingCancelled):
+            self.cancelled.emit()
+            return
+        self.finished.emit(rows)
+
+
+class BenchmarkPanel(QDockWidget):
+    """
+    Панель замеров: N случайных или выбранных на графе пар (s, t) выполняются всеми режимами поиска в фоне.
+    Для каждого разбиения и K - среднее время и перцентили, исследованные вершины,
+    ускорение относительно обычного алгоритма Дейкстры и время предобработки
+    """
+
+    def __init__(self, graph_data: Callable[[], GraphData], pick_pair: Callable[[], None], parent=None):
+        """
+        :param graph_data: возвращает текущий граф
+        :param pick_pair: начинает выбор пары вершин на графе (результат передается в add_pair)
+        """
+        super().__init__("Замеры производительности", parent)
+        self.graph_data = graph_data
+        self.pairs: list[tuple[int, int]] = []
+        self.rows: list[dict] = []
+        self.worker: BenchmarkWorker | None = None
+
+        self.queries = QSpinBox()
+        self.queries.setRange(1, 100000)
+        self.queries.setValue(50)
+        self.ks = QLineEdit("1 2 4 8")
+        self.current_regions = QCheckBox("Текущие регионы (цвета вершин)")
+        self.current_regions.setChecked(True)
+        self.pairs_label = QLabel()
+        pick_button = QPushButton("Выбрать пару на графе")
+        pick_button.clicked.connect(pick_pair)
+        clear_button = QPushButton("Очистить пары")
+        clear_button.clicked.connect(self.clear_pairs)
+        self.run_button = QPushButton("Запустить")
+        self.run_button.clicked.connect(self.start)
+        self.cancel_button = QPushButton("Отменить")
+        self.cancel_button.clicked.connect(self.cancel)
+        self.save_button = QPushButton("Сохранить результаты")
+        self.save_button.clicked.connect(self.save)
+        self.status = QLabel()
+        self.table = QTableWidget(0, len(TABLE_COLUMNS))
+        self.table.setHorizontalHeaderLabels([title for title, _ in TABLE_COLUMNS])
+
+        form = QFormLayout()
+        form.addRow("Случайных пар", self.queries)
+        form.addRow("K (разбиение на полосы)", self.ks)
+        form.addRow(self.current_regions)
+        pairs_buttons = QHBoxLayout()
+        pairs_buttons.addWidget(pick_button)
+        pairs_buttons.addWidget(clear_button)
+        form.addRow(self.pairs_label)
+        form.addRow(pairs_buttons)
+        buttons = QHBoxLayout()
+        for button in (self.run_button, self.cancel_button, self.save_button):
+            buttons.addWidget(button)
+
+        layout = QVBoxLayout()
+        layout.addLayout(form)
+        layout.addLayout(buttons)
+        layout.addWidget(self.status)
+        layout.addWidget(self.table)
+        widget = QWidget()
+        widget.setLayout(layout)
+        self.setWidget(widget)
+        self.setAllowedAreas(Qt.DockWidgetArea.RightDockWidgetArea | Qt.DockWidgetArea.BottomDockWidgetArea)
+        self._update_controls()
+
+    def add_pair(self, start: int, end: int):
+        """ Добавить выбранную на графе пару: если пары заданы, замеряются они, а не случайные """
+        self.pairs.append((start, end))
+        self._update_controls()
+
+    def clear_pairs(self):
+        self.pairs.clear()
+        self._update_controls()
+
+    def start(self):
+        try:
+            ks = [int(k) for k in self.ks.text().replace(',', ' ').split()]
+        except ValueError:
+            self.status.setText("K - целые числа через пробел")
+            return
+        if not ks and not self.current_regions.isChecked():
+            self.status.setText("Задайте K или выберите текущие регионы")
+            return
+        data = self.graph_data()
+        if data.vertex_count == 0:
+            self.status.setText("Граф пуст")
+            return
+        if any(max(pair) >= data.vertex_count for pair in self.pairs):
+            self.clear_pairs()  # граф изменился после выбора пар
+        self.worker = BenchmarkWorker(data, ks, self.current_regions.isChecked(), self.queries.value(),
+                                      list(self.pairs) or None)
+        self.worker.progress.connect(self.status.setText)
+        self.worker.finished.connect(self.on_finished)
+        self.worker.cancelled.connect(self.on_cancelled)
+        self.worker.start()
+        self._update_controls()
+
+    def cancel(self):
+        if self.worker is not None:
+            self.worker.cancel.cancel()
+            self.status.setText("Отмена...")
+
+    def stop(self):
+        """ Отменить замеры и дождаться завершения потока (при закрытии окна) """
+        if self.worker is not None:
+            self.worker.cancel.cancel()
+            self.worker.wait()
+
+    def on_finished(self, rows: list[dict]):
+        self.worker.wait()
+        self.worker = None
+        self.rows = rows
+        self.status.setText(f"Готово: {len(rows)} строк")
+        self.table.setRowCount(len(rows))
+        for i, row in enumerate(rows):
+            for j, (_, cell) in enumerate(TABLE_COLUMNS):
+                self.table.setItem(i, j, QTableWidgetItem(cell(row)))
+        self.table.resizeColumnsToContents()
+        self._update_controls()
+
+    def on_cancelled(self):
+        self.worker.wait()
+        self.worker = None
+        self.status.setText("Замеры отменены")
+        self._update_controls()
+
+    def save(self):
+        file_name, _ = QFileDialog.getSaveFileName(self, "Save Results", "", "CSV (*.csv);;JSON Files (*.json)")
+        if file_name:
+            save_results(self.rows, file_name)
+
+    def _update_controls(self):
+        running = self.worker is not None
+        self.run_button.setEnabled(not running)
+        self.cancel_button.setEnabled(running)
+        self.save_button.setEnabled(not running and bool(self.rows))
+        self.queries.setEnabled(not self.pairs)
+        self.pairs_label.setText(f"Выбранных пар: {len(self.pairs)}" if self.pairs else "Пары: случайные")
@@ -0,0 +1,68 @@
+""" Сравнение пространств поиска разных режимов для одной пары вершин """
+from __future__ import annotations
+
+from typing import NamedTuple
+
+import numpy as np
+import pyqtgraph as pg
+from PyQt6.QtWidgets import QDialog, QVBoxLayout
+
+from algo.dijkstra.structures import QueryStats, SearchSpace, WeightedPath
+from gui.config import DARK_GREEN
+from gui.search import HeatOverlay, segments_data
+
+MODE_TITLES = {'unidirectional': 'Однонаправленный', 'bidirectional': 'Двунаправленный',
+               'unidirectional_bounds': 'Однонаправленный (оценки регионов)',
+               'unidirectional_early_stop': 'Однонаправленный (остановка в конечной вершине)'}
+
+
+class ModeRun(NamedTuple):
+    """ Результат одного режима поиска """
+    mode: str
+    arc_flags: bool
+    distance: float
+    path: WeightedPath
+    stats: QueryStats
+    space: SearchSpace
+
+    @property
+    def title(self) -> str:
+        return MODE_TITLES.get(self.mode, self.mode) + (' (arc_flags)' if self.arc_flags else '')
+
+
+class CompareDialog(QDialog):
+    """
+    Окно с видами графа рядом друг с другом: в каждом - тепловая карта пространства поиска одного режима
+    и найденный путь. Виды связаны: сдвиг и масштаб одного повторяются в остальных
+    """
+    COLUMNS = 2
+
+    def __init__(self, pos: np.ndarray, adjacency: np.ndarray, edge_rows: np.ndarray, runs: list[ModeRun],
+                 parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Сравнение режимов поиска")
+        self.resize(1000, 800)
+        widget = pg.GraphicsLayoutWidget()
+        layout = QVBoxLayout(self)
+        layout.addWidget(widget)
+
+        all_edges = segments_data(pos, adjacency, np.arange(len(adjacency)))
+        first_view = None
+        for i, run in enumerate(runs):
+            row, column = divmod(i, self.COLUMNS)
+            stats = run.stats
+            widget.addLabel(f"{run.title}: вершин {stats.settled}, рёбер {stats.relaxed}, "
+                            f"отброшено {stats.pruned}, {stats.total_time * 1000:.1f} мс",
+                            row=2 * row, col=column)
+            view = widget.addViewBox(row=2 * row + 1, col=column, enableMenu=False)
+            view.setAspectLocked()
+            view.addItem(pg.PlotCurveItem(*all_edges, connect='pairs', pen=pg.mkPen((90, 90, 90), width=1)))
+            HeatOverlay(view).show(pos, adjacency, edge_rows, run.space)
+            rows = edge_rows[[edge.id for edge in run.path]] if run.path else np.zeros(0, dtype=np.int64)
+            view.addItem(pg.PlotCurveItem(*segments_data(pos, adjacency, rows), connect='pairs',
+                                          pen=pg.mkPen(DARK_GREEN, width=4)))
+            if first_view is None:
+                first_view = view
+            else:
+                view.setXLink(first_view)
+                view.setYLink(first_view)
@@ -0,0 +1,226 @@
+""" Отрисовка ребер графа: все ребра одного стиля - один графический элемент """
+from __future__ import annotations
+
+import numpy as np
+import pyqtgraph as pg
+from PyQt6.QtWidgets import QGraphicsPathItem
+
+from gui.config import DARK_GREEN
+from gui.viewport import (GridIndex, OVERVIEW_CELL_PIXELS, OVERVIEW_LOCAL_LIMIT, Overview, decimate, intersects,
+                          view_state)
+
+NORMAL, HIGHLIGHTED = 0, 1  # Состояния ребра (индекс в EDGE_STYLES)
+
+# Стиль ребра для каждого состояния: параметры линии и цвет стрелки
+EDGE_STYLES = {
+    NORMAL: ({'width': 5}, 'w'),
+    HIGHLIGHTED: ({'width': 5, 'color': DARK_GREEN}, DARK_GREEN),
+}
+
+CURVE_OFFSET = 0.2  # Изгиб ребра, у которого есть обратное ребро (доля длины ребра)
+ARROW_LENGTH = 0.7  # Длина стрелки
+ARROW_HALF_WIDTH = ARROW_LENGTH * np.tan(np.radians(25 / 2))  # Полуширина основания стрелки (угол 25 градусов)
+ARROW_MIN_PIXELS = 12  # Стрелки видны, если типичное ребро на экране не короче этого (пиксели)
+MAX_DETAIL_EDGES = 20000  # Если видимых ребер больше, обычные ребра рисуются упрощенным обзорным слоем
+CLICK_PIXELS = 10  # На каком расстоянии от ребра (пиксели) ищется ребро при нажатии
+
+
+def edge_polylines(pos: np.ndarray, adj: np.ndarray) -> np.ndarray:
+    """
+    Ломаные ребер: для каждого ребра три точки - начало, середина и конец (E, 3, 2).
+    Если есть обратное ребро, середина смещается перпендикулярно, чтобы два ребра не сливались
+    """
+    start, end = pos[adj[:, 0]], pos[adj[:, 1]]
+    middle = (start + end) / 2
+
+    # Обратные ребра ищутся через хэш-множество ключей u * n + v
+    n = len(pos)
+    keys = adj[:, 0].astype(np.int64) * n + adj[:, 1]
+    reverse_keys = adj[:, 1].astype(np.int64) * n + adj[:, 0]
+    curved = np.isin(reverse_keys, keys)
+
+    delta = end - start
+    normal = np.column_stack([-delta[:, 1], delta[:, 0]]) * CURVE_OFFSET
+    middle[curved] += normal[curved]
+    return np.stack([start, middle, end], axis=1)
+
+
+def arrow_heads(polylines: np.ndarray) -> np.ndarray:
+    """ Треугольники стрелок на концах ребер: острие, два угла основания и снова острие (E, 4, 2) """
+    tip = polylines[:, 2]
+    direction = tip - polylines[:, 1]
+    length = np.hypot(direction[:, 0], direction[:, 1])
+    direction = direction / np.where(length > 0, length, 1)[:, None]
+    normal = np.column_stack([-direction[:, 1], direction[:, 0]])
+
+    base = tip - direction * ARROW_LENGTH
+    return np.stack([tip, base + normal * ARROW_HALF_WIDTH, base - normal * ARROW_HALF_WIDTH, tip], axis=1)
+
+
+def points_to_path(points: np.ndarray):
+    """ Путь QPainterPath из набора ломаных (M, P, 2): внутри ломаной точки соединены, между ломаными - разрыв """
+    count, per_item = points.shape[:2]
+    connect = np.ones((count, per_item), dtype=np.int32)
+    connect[:, -1] = 0
+    return pg.arrayToQPath(points[:, :, 0].ravel(), points[:, :, 1].ravel(), connect.ravel())
+
+
+def nearest_edge(polylines: np.ndarray, point: np.ndarray, candidates: np.ndarray | None = None) -> int | None:
+    """
+    Ребро, ближайшее к точке (по расстоянию до отрезков ломаной)
+    :param polylines: ломаные ребер (E, 3, 2)
+    :param point: точка (2,)
+    :param candidates: индексы ребер, среди которых искать (None - среди всех)
+    :return: индекс ребра или None, если ребер нет
+    """
+    if candidates is None:
+        candidates = np.arange(len(polylines))
+    if len(candidates) == 0:
+        return None
+    lines = polylines[candidates]
+    a = lines[:, :-1].reshape(-1, 2)  # начала отрезков
+    b = lines[:, 1:].reshape(-1, 2)  # концы отрезков
+    ab = b - a
+    length2 = np.einsum('ij,ij->i', ab, ab)
+    t = np.clip(np.einsum('ij,ij->i', point - a, ab) / np.where(length2 > 0, length2, 1), 0, 1)
+    distance2 = np.sum((a + ab * t[:, None] - point) ** 2, axis=1)
+    return int(candidates[np.argmin(distance2) // (lines.shape[1] - 1)])
+
+
+class EdgeLayer:
+    """
+    Ребра графа на ViewBox. Для каждого стиля (EDGE_STYLES) - одна линия PlotCurveItem со всеми ребрами
+    и один QGraphicsPathItem со всеми стрелками. При перерисовке элементы переиспользуются,
+    а геометрия пересчитывается, только если изменились координаты вершин или список ребер.
+
+    Рисуются только ребра в видимой области (пространственный индекс), при отдалении стрелки скрываются,
+    а при большом количестве видимых ребер обычные ребра заменяются обзорным слоем.
+    Перерисовка выполняется при каждом сдвиге и масштабировании вида
+    """
+
+    def __init__(self, view_box: pg.ViewBox, on_click) -> None:
+        """
+        :param view_box: куда добавлять элементы
+        :param on_click: обработчик нажатия на ребро (индекс ребра, событие мыши)
+        """
+        self.view_box = view_box
+        self.on_click = on_click
+        self.curves: dict[int, pg.PlotCurveItem] = {}
+        self.arrows: dict[int, QGraphicsPathItem] = {}
+        self.polylines = np.zeros((0, 3, 2))
+        self.states = np.zeros(0, dtype=np.int8)
+        self.index: GridIndex | None = None
+        self.overview: Overview | None = None
+        self.typical_length = 0.0  # медианная длина ребра
+        self.special = np.zeros(0, dtype=np.int64)  # ребра не в обычном состоянии (их немного)
+        self._pos = None
+        self._adj = None
+        view_box.sigRangeChanged.connect(self.render)
+
+    def set_edges(self, pos: np.ndarray, adj: np.ndarray | None, states: np.ndarray) -> None:
+        """
+        Нарисовать ребра
+        :param pos: координаты вершин (N, 2)
+        :param adj: ребра (E, 2) или None
+        :param states: состояние каждого ребра (E,) - ключ EDGE_STYLES
+        """
+        if adj is None or len(adj) == 0:
+            adj = np.zeros((0, 2), dtype=np.int64)
+        if self._pos is None or not (np.array_equal(pos, self._pos) and np.array_equal(adj, self._adj)):
+            self._pos, self._adj = np.array(pos, copy=True), np.array(adj, copy=True)
+            self.polylines = edge_polylines(self._pos, self._adj) if len(adj) else np.zeros((0, 3, 2))
+            self.index = GridIndex(self.polylines.min(axis=1), self.polylines.max(axis=1))
+            self.overview = Overview(self.polylines[:, 0], self.polylines[:, 2])
+            lengths = np.hypot(*(self.polylines[:, 2] - self.polylines[:, 0]).T)
+            self.typical_length = float(np.median(lengths)) if len(lengths) else 0.0
+        self.states = np.asarray(states)
+        self.special = np.flatnonzero(self.states != NORMAL)
+        self.render()
+
+    def render(self) -> None:
+        """ Перерисовать видимую часть ребер (вызывается и при изменении видимой области) """
+        state = view_state(self.view_box)
+        overview = None
+        if state is None:
+            rect, pixel = None, 0.0
+            visible = np.arange(len(self.polylines))
+        elif (count := self.index.count(*state[0])) > MAX_DETAIL_EDGES:
+            # Слишком много ребер: обычные ребра - упрощенными отрезками обзорного слоя без стрелок,
+            # остальные (выделенные) - полностью
+            rect, pixel = state
+            if count <= OVERVIEW_LOCAL_LIMIT:
+                # Видна часть графа: упрощаем только видимые ребра
+                local = self.index.query(*rect)
+                starts, ends = decimate(self.polylines[local, 0], self.polylines[local, 2],
+                                        self.overview.origin, pixel * OVERVIEW_CELL_PIXELS)
+            else:
+                starts, ends = self.overview.segments(self.overview.level_for(pixel))
+            inside = intersects(np.minimum(starts, ends), np.maximum(starts, ends), rect)
+            overview = np.stack([starts[inside], ends[inside]], axis=1)
+            special = self.special
+            visible = special[intersects(self.polylines[special].min(axis=1), self.polylines[special].max(axis=1),
+                                         rect)]
+        else:
+            rect, pixel = state
+            visible = self.index.query(*rect)
+        show_arrows = not pixel or self.typical_length / pixel >= ARROW_MIN_PIXELS
+        visible_states = self.states[visible]
+
+        for edge_state, (line_pen, arrow_brush) in EDGE_STYLES.items():
+            selected = visible[visible_states == edge_state]
+            if edge_state == NORMAL and overview is not None:
+                lines, arrows = overview, False
+            else:
+                lines, arrows = self.polylines[selected], show_arrows
+            if len(lines) == 0:
+                self._hide(edge_state)
+                continue
+            curve, arrow = self._items(edge_state, line_pen, arrow_brush)
+            if arrows:
+                arrow.setPath(points_to_path(arrow_heads(lines)))
+                arrow.show()
+            else:
+                arrow.hide()
+            connect = np.ones(lines.shape[:2], dtype=np.int32)
+            connect[:, -1] = 0
+            curve.setData(lines[:, :, 0].ravel(), lines[:, :, 1].ravel(), connect=connect.ravel())
+            curve.show()
+
+    def _items(self, state: int, line_pen: dict, arrow_brush) -> tuple[pg.PlotCurveItem, QGraphicsPathItem]:
+        """ Элементы стиля state (создаются при первом обращении) """
+        if state not in self.curves:
+            curve = pg.PlotCurveItem(pen=pg.mkPen(**line_pen), clickable=True)
+            curve.sigClicked.connect(lambda item, event, s=state: self._clicked(s, event))
+            self.view_box.addItem(curve)
+            arrow = QGraphicsPathItem()
+            arrow.setBrush(pg.mkBrush(arrow_brush))
+            arrow.setPen(pg.mkPen(None))
+            self.view_box.addItem(arrow)
+            self.curves[state], self.arrows[state] = curve, arrow
+        return self.curves[state], self.arrows[state]
+
+    def _hide(self, state: int) -> None:
+        if state in self.curves:
+            self.curves[state].hide()
+            self.arrows[state].hide()
+
+    def _clicked(self, state: int, event) -> None:
+        point = np.array([event.pos().x(), event.pos().y()])
+        # Кандидаты - ребра этого стиля рядом с точкой нажатия
+        view = view_state(self.view_box)
+        tolerance = CLICK_PIXELS * view[1] if view is not None else self.typical_length
+        candidates = self.index.query(*(point - tolerance), *(point + tolerance))
+        candidates = candidates[self.states[candidates] == state]
+        if len(candidates) == 0:
+            candidates = np.flatnonzero(self.states == state)
+        index = nearest_edge(self.polylines, point, candidates)
+        if index is not None:
+            self.on_click(index, event)
+
+    def clear(self) -> None:
+        """ Удалить все элементы с ViewBox """
+        for item in list(self.curves.values()) + list(self.arrows.values()):
+            self.view_box.removeItem(item)
+        self.curves.clear()
+        self.arrows.clear()
+        self._pos = self._adj = None
@@ -0,0 +1,106 @@
+""" Отображение поиска поверх графа: ход поиска (исследованные вершины и фронт) и тепловая карта пространства поиска """
+from __future__ import annotations
+
+import numpy as np
+import pyqtgraph as pg
+
+from algo.dijkstra.structures import FrontierSnapshot, SearchSpace
+
+# Цвета исследованных вершин: прямой поиск (от начала) и обратный (от конца)
+SETTLED_COLORS = {False: (0, 160, 255, 110), True: (255, 150, 0, 110)}
+FRONTIER_COLOR = (255, 255, 255, 180)
+SEARCH_POINT_SIZE = 1.8  # Размер отметки (в координатах графа, вершины графа - размера 1)
+HEAT_COLORMAP = 'inferno'  # Палитра тепловой карты (раньше исследована вершина - темнее)
+HEAT_LEVELS = 8  # Количество оттенков тепловой карты
+PRUNED_COLOR = (255, 60, 60, 160)  # Цвет ребер, отброшенных arc_flags
+
+
+class SearchLayer:
+    """
+    Отметки под вершинами графа: исследованные вершины (свой цвет для каждого направления поиска)
+    и текущий фронт поиска. Снимки приходят порциями, отметки накапливаются до clear()
+    """
+
+    def __init__(self, view_box: pg.ViewBox) -> None:
+        self.view_box = view_box
+        self.settled: dict[bool, pg.ScatterPlotItem] = {}
+        self.frontier = pg.ScatterPlotItem(size=SEARCH_POINT_SIZE, pxMode=False, pen=pg.mkPen(None),
+                                           brush=pg.mkBrush(FRONTIER_COLOR))
+        self.frontier.setZValue(-1)
+        view_box.addItem(self.frontier)
+        for reverse, color in SETTLED_COLORS.items():
+            item = pg.ScatterPlotItem(size=SEARCH_POINT_SIZE, pxMode=False, pen=pg.mkPen(None),
+                                      brush=pg.mkBrush(color))
+            item.setZValue(-2)  # под фронтом и под вершинами графа
+            view_box.addItem(item)
+            self.settled[reverse] = item
+        self._settled: dict[bool, list[np.ndarray]] = {False: [], True: []}
+        self._frontier: dict[bool, list[int]] = {False: [], True: []}
+
+    def add(self, pos: np.ndarray, snapshots: list[FrontierSnapshot]) -> None:
+        """ Добавить снимки хода поиска и перерисовать отметки """
+        for snapshot in snapshots:
+            self._settled[snapshot.reverse].append(np.asarray(snapshot.settled, dtype=np.int64))
+            self._frontier[snapshot.reverse] = snapshot.frontier
+        for reverse, item in self.settled.items():
+            if self._settled[reverse]:
+                item.setData(pos=pos[np.concatenate(self._settled[reverse])])
+        frontier = np.asarray(self._frontier[False] + self._frontier[True], dtype=np.int64)
+        self.frontier.setData(pos=pos[frontier] if len(frontier) else np.zeros((0, 2)))
+
+    def clear(self) -> None:
+        for item in list(self.settled.values()) + [self.frontier]:
+            item.clear()
+        self._settled = {False: [], True: []}
+        self._frontier = {False: [], True: []}
+
+
+def segments_data(pos: np.ndarray, adjacency: np.ndarray, rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """ Координаты x и y для PlotCurveItem(connect='pairs'): отрезки рёбер с индексами rows """
+    ends = pos[adjacency[rows]]  # (M, 2, 2)
+    return ends[:, :, 0].ravel(), ends[:, :, 1].ravel()
+
+
+class HeatOverlay:
+    """
+    Тепловая карта пространства поиска (SearchSpace): исследованные вершины раскрашены по порядку исследования
+    (для двунаправленного поиска - в каждом направлении отдельно), рёбра, отброшенные arc_flags, - красным
+    """
+
+    def __init__(self, view_box: pg.ViewBox) -> None:
+        self.points = pg.ScatterPlotItem(size=SEARCH_POINT_SIZE, pxMode=False, pen=pg.mkPen(None))
+        self.points.setZValue(-2)
+        self.pruned = pg.PlotCurveItem(pen=pg.mkPen(PRUNED_COLOR, width=2))
+        self.pruned.setZValue(-1)
+        view_box.addItem(self.points)
+        view_box.addItem(self.pruned)
+        lut = pg.colormap.get(HEAT_COLORMAP).getLookupTable(0.2, 1.0, nPts=HEAT_LEVELS, alpha=False)
+        self.brushes = [pg.mkBrush(*color, 170) for color in lut.tolist()]
+
+    def show(self, pos: np.ndarray, adjacency: np.ndarray, edge_rows: np.ndarray, space: SearchSpace) -> None:
+        """
+        Показать пространство поиска
+        :param pos: координаты вершин
+        :param adjacency: рёбра (строки)
+        :param edge_rows: строка adjacency по номеру ребра (-1 - ребра нет)
+        :param space: записанное пространство поиска
+        """
+        vertices, levels = [], []
+        for settled in (space.settled, space.settled_reverse):
+            order = np.frombuffer(settled, dtype=np.int64) if len(settled) else np.zeros(0, dtype=np.int64)
+            vertices.append(order)
+            levels.append(np.arange(len(order)) * HEAT_LEVELS // max(len(order), 1))
+        vertices, levels = np.concatenate(vertices), np.concatenate(levels)
+        inside = vertices < len(pos)  # граф могли изменить, пока шел поиск
+        vertices, levels = vertices[inside], levels[inside]
+        self.points.setData(pos=pos[vertices], brush=[self.brushes[level] for level in levels.tolist()])
+
+        pruned = np.frombuffer(space.pruned, dtype=np.int64) if len(space.pruned) else np.zeros(0, dtype=np.int64)
+        pruned = pruned[pruned < len(edge_rows)]
+        rows = edge_rows[pruned]
+        x, y = segments_data(pos, adjacency, rows[rows >= 0])
+        self.pruned.setData(x, y, connect='pairs')
+
+    def clear(self) -> None:
+        self.points.clear()
+        self.pruned.setData([], [])
@@ -0,0 +1,170 @@
+""" Отрисовка только видимой части графа: пространственный индекс, упрощенный обзорный слой и подписи """
+from __future__ import annotations
+
+import math
+
+import numpy as np
+import pyqtgraph as pg
+
+MAX_LABELS = 300  # Больше подписей одновременно не показываем
+LABEL_MIN_PIXELS = 40  # Подписи видны, если вершины в среднем не ближе этого расстояния на экране (пиксели)
+OVERVIEW_CELL_PIXELS = 3  # Размер клетки обзорного слоя на экране (пиксели)
+OVERVIEW_LOCAL_LIMIT = 200000  # До стольких видимых ребер обзорный слой строится только по ним, без кэша
+
+
+class GridIndex:
+    """
+    Пространственный индекс: равномерная сетка по центрам прямоугольников объектов.
+    Объекты одной клетки лежат подряд, а клетки одной строки сетки - подряд друг за другом,
+    поэтому выбор прямоугольной области - один срез на каждую строку сетки
+    """
+
+    def __init__(self, lo: np.ndarray, hi: np.ndarray, per_cell: int = 8) -> None:
+        """
+        :param lo: левые нижние углы прямоугольников объектов (M, 2)
+        :param hi: правые верхние углы прямоугольников объектов (M, 2)
+        :param per_cell: желаемое среднее количество объектов в клетке
+        """
+        self.lo, self.hi = lo, hi
+        count = len(lo)
+        self.origin = lo.min(axis=0) if count else np.zeros(2)
+        extent = (hi.max(axis=0) - self.origin) if count else np.ones(2)
+        extent = np.maximum(extent, 1e-9)
+        cells = max(1, count // per_cell)
+        self.cell = math.sqrt(extent[0] * extent[1] / cells) or float(extent.max())
+        self.shape = np.maximum(np.ceil(extent / self.cell).astype(np.int64), 1)  # клеток по x и по y
+        # Объект попадает в клетку своего центра, поэтому область запроса расширяется на половину размера объекта
+        self.margin = ((hi - lo).max(axis=0) / 2) if count else np.zeros(2)
+
+        cell_xy = self._cell_of((lo + hi) / 2)
+        cell_id = cell_xy[:, 1] * self.shape[0] + cell_xy[:, 0]
+        self.order = np.argsort(cell_id, kind='stable')
+        self.starts = np.searchsorted(cell_id[self.order], np.arange(self.shape[0] * self.shape[1] + 1))
+
+    def _cell_of(self, points: np.ndarray) -> np.ndarray:
+        return np.clip(((points - self.origin) / self.cell).astype(np.int64), 0, self.shape - 1)
+
+    def _row_ranges(self, x_min: float, y_min: float, x_max: float, y_max: float) -> list[tuple[int, int]]:
+        """ Диапазоны позиций в self.order (по одному на строку сетки), где лежат кандидаты для области """
+        (cx0, cy0), (cx1, cy1) = self._cell_of(np.array([[x_min, y_min], [x_max, y_max]]) +
+                                                [-self.margin, self.margin])
+        row_width = self.shape[0]
+        return [(self.starts[y * row_width + cx0], self.starts[y * row_width + cx1 + 1]) for y in range(cy0, cy1 + 1)]
+
+    def count(self, x_min: float, y_min: float, x_max: float, y_max: float) -> int:
+        """ Оценка сверху количества объектов в области (без выборки самих объектов) """
+        if len(self.lo) == 0:
+            return 0
+        return int(sum(end - start for start, end in self._row_ranges(x_min, y_min, x_max, y_max)))
+
+    def query(self, x_min: float, y_min: float, x_max: float, y_max: float) -> np.ndarray:
+        """ Индексы объектов, прямоугольники которых пересекают заданную область """
+        if len(self.lo) == 0:
+            return np.zeros(0, dtype=np.int64)
+        slices = [self.order[start:end] for start, end in self._row_ranges(x_min, y_min, x_max, y_max)]
+        found = np.concatenate(slices) if slices else np.zeros(0, dtype=np.int64)
+        return found[intersects(self.lo[found], self.hi[found], (x_min, y_min, x_max, y_max))]
+
+
+def intersects(lo: np.ndarray, hi: np.ndarray, rect: tuple[float, float, float, float]) -> np.ndarray:
+    """ Маска прямоугольников (lo, hi), пересекающих область rect = (x_min, y_min, x_max, y_max) """
+    x_min, y_min, x_max, y_max = rect
+    return (hi[:, 0] >= x_min) & (lo[:, 0] <= x_max) & (hi[:, 1] >= y_min) & (lo[:, 1] <= y_max)
+
+
+def decimate(starts: np.ndarray, ends: np.ndarray, origin: np.ndarray, size: float) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Упростить отрезки: концы притягиваются к центрам клеток сетки размера size,
+    совпадающие отрезки объединяются, отрезки внутри одной клетки отбрасываются
+    :return: начала и концы упрощенных отрезков
+    """
+    a = np.maximum(((starts - origin) / size).astype(np.int64), 0)
+    b = np.maximum(((ends - origin) / size).astype(np.int64), 0)
+    grid = int(max(a.max(initial=0), b.max(initial=0))) + 1
+    keys = ((a[:, 0] * grid + a[:, 1]) * grid + b[:, 0]) * grid + b[:, 1]
+    keys = np.unique(keys[np.any(a != b, axis=1)])
+    rest, by = np.divmod(keys, grid)
+    rest, bx = np.divmod(rest, grid)
+    ax, ay = np.divmod(rest, grid)
+    to_point = lambda x, y: origin + (np.column_stack([x, y]) + 0.5) * size
+    return to_point(ax, ay), to_point(bx, by)
+
+
+class Overview:
+    """
+    Обзорный слой всего графа: упрощенные отрезки для сеток 2^level x 2^level.
+    Для каждого уровня слой строится один раз и кэшируется
+    """
+
+    def __init__(self, starts: np.ndarray, ends: np.ndarray) -> None:
+        self.starts, self.ends = starts, ends
+        points = np.concatenate([starts, ends]) if len(starts) else np.zeros((1, 2))
+        self.origin = points.min(axis=0)
+        self.extent = max(float((points.max(axis=0) - self.origin).max()), 1e-9)
+        self._levels: dict[int, tuple[np.ndarray, np.ndarray]] = {}
+
+    def level_for(self, pixel_size: float) -> int:
+        """ Уровень, у которого клетка не меньше OVERVIEW_CELL_PIXELS пикселей """
+        cells = self.extent / max(pixel_size * OVERVIEW_CELL_PIXELS, 1e-12)
+        return int(np.clip(np.floor(np.log2(max(cells, 1))), 0, 15))
+
+    def segments(self, level: int) -> tuple[np.ndarray, np.ndarray]:
+        """ Упрощенные отрезки уровня level: начала и концы """
+        if level not in self._levels:
+            self._levels[level] = decimate(self.starts, self.ends, self.origin, self.extent / (1 << level))
+        return self._levels[level]
+
+
+def view_state(view_box: pg.ViewBox) -> tuple[tuple[float, float, float, float], float] | None:
+    """ Видимая область (x_min, y_min, x_max, y_max) и размер пикселя в координатах графа, None - вид не готов """
+    rect = view_box.viewRect()
+    pixel_width, pixel_height = view_box.viewPixelSize()
+    pixel = max(pixel_width, pixel_height)
+    if not pixel or not math.isfinite(pixel):
+        return None
+    return (rect.left(), rect.top(), rect.right(), rect.bottom()), pixel
+
+
+class LabelLayer:
+    """
+    Подписи вершин: показываются только для видимых вершин и только при достаточном приближении.
+    Элементы TextItem переиспользуются, их не больше MAX_LABELS
+    """
+
+    def __init__(self, parent: pg.GraphicsObject) -> None:
+        self.parent = parent
+        self.items: list[pg.TextItem] = []
+        self.texts: list[str] = []
+        self.pos = np.zeros((0, 2))
+        self.index: GridIndex | None = None
+        self.spacing = 0.0  # типичное расстояние между соседними вершинами
+
+    def set_labels(self, pos: np.ndarray, texts: list[str]) -> None:
+        if self.index is None or not np.array_equal(pos, self.pos):
+            self.pos = np.array(pos, copy=True).reshape(-1, 2)
+            self.index = GridIndex(self.pos, self.pos)
+            self.spacing = self.index.cell / math.sqrt(8)  # в клетке в среднем 8 вершин
+        self.texts = list(texts)
+        self.render()
+
+    def render(self) -> None:
+        view_box = self.parent.getViewBox()
+        state = view_box and view_state(view_box)
+        visible = np.zeros(0, dtype=np.int64)
+        if state is not None and self.index is not None and len(self.texts):
+            rect, pixel = state
+            if len(self.texts) <= MAX_LABELS or self.spacing / pixel >= LABEL_MIN_PIXELS:
+                visible = self.index.query(*rect)[:MAX_LABELS]
+            visible = visible[visible < len(self.texts)]
+
+        while len(self.items) < len(visible):
+            item = pg.TextItem()
+            item.setParentItem(self.parent)
+            self.items.append(item)
+        for item, i in zip(self.items, visible.tolist()):
+            if item.toPlainText() != self.texts[i]:
+                item.setText(self.texts[i])
+            item.setPos(*self.pos[i])
+            item.show()
+        for item in self.items[len(visible):]:
+            item.hide()
@@ -2,10 +2,21 @@ from algo.config import DEBUG
 from algo.dijkstra.arc_flags import arc_flags_preprocessing
 from algo.dijkstra.dijkstra_bidirectional import dijkstra_bidirectional
 from algo.dijkstra.dijkstra_unidirectional import dijkstra_unidirectional
+from algo.dijkstra.structures import QueryStats
 from algo.dijkstra.utils import print_weighted_path
 from algo.graph import Graph
 from algo.vertex import Vertex
 
+
+def print_stats(stats: QueryStats) -> None:
+    """ Вывести статистику запроса """
+    print(f"Исследовано вершин: {stats.settled}, рассмотрено ребер: {stats.relaxed}, "
+          f"отброшено arc_flags: {stats.pruned}")
+    print(f"Очередь: добавлений {stats.pushes}, извлечений {stats.pops} (устаревших {stats.stale_pops})")
+    print(f"Время: поиск {stats.search_time:.8f}s, место встречи {stats.repair_time:.8f}s, "
+          f"маршрут {stats.path_time:.8f}s")
+
+
 if __name__ == '__main__':
     K = 3  # Количество регионов
 
@@ -71,24 +82,32 @@ if __name__ == '__main__':
                 print(f"|{str(edge): ^10}| {flags[0] * 1} | {flags[1] * 1} | {flags[2] * 1 } |")
 
     print("\n\n*** Однонаправленный поиск (без оптимизации arc_flags): ***")
-    distance, path, count_op = dijkstra_unidirectional(city_graph, los_angeles, boston, arc_flags=False)
+    stats = QueryStats()
+    distance, path, count_op = dijkstra_unidirectional(city_graph, los_angeles, boston, arc_flags=False, stats=stats)
     print(f"Количество выполненных операций: {count_op}")
+    print_stats(stats)
     print("Кратчайший путь из Los Angeles в Boston:")
     print_weighted_path(city_graph, path)
     print("\n*** Однонаправленный поиск (с оптимизацией arc_flags): ***")
-    distance, path, count_op = dijkstra_unidirectional(city_graph, los_angeles, boston, arc_flags=True)
+    stats = QueryStats()
+    distance, path, count_op = dijkstra_unidirectional(city_graph, los_angeles, boston, arc_flags=True, stats=stats)
     print(f"Количество выполненных операций: {count_op}")
+    print_stats(stats)
     print("Кратчайший путь из Los Angeles в Boston:")
     print_weighted_path(city_graph, path)
 
     print("\n\n*** Двунаправленный поиск (без оптимизации arc_flags): ***")
-    distance, path, count_op = dijkstra_bidirectional(city_graph, los_angeles, boston, arc_flags=False)
+    stats = QueryStats()
+    distance, path, count_op = dijkstra_bidirectional(city_graph, los_angeles, boston, arc_flags=False, stats=stats)
     print(f"Количество выполненных операций: {count_op}")
+    print_stats(stats)
     print("Кратчайший путь из Los Angeles в Boston:")
     print_weighted_path(city_graph, path)
     print("\n*** Двунаправленный поиск (с оптимизацией arc_flags): ***")
-    distance, path, count_op = dijkstra_bidirectional(city_graph, los_angeles, boston, arc_flags=True)
+    stats = QueryStats()
+    distance, path, count_op = dijkstra_bidirectional(city_graph, los_angeles, boston, arc_flags=True, stats=stats)
     print(f"Количество выполненных операций: {count_op}")
+    print_stats(stats)
     print("Кратчайший путь из Los Angeles в Boston:")
     print_weighted_path(city_graph, path)
 
@@ -0,0 +1,138 @@
+"""
+Замеры производительности запросов и предобработки (обертка командной строки над algo.benchmark).
+
+Граф задается файлом (.json / .npz) или описанием генератора "форма:количество_вершин",
+например grid:10000, geometric:50000, delaunay:2000.
+
+Запуск из корня репозитория:
+    python -m scripts.benchmark --graphs grid:1000 grid:4000 graph.json --k 1 2 4 8 --queries 200 -o run.csv --plot run.png
+    python -m scripts.benchmark --compare base.csv run.csv --threshold 0.1
+
+С отфильтрованными списками смежности для 1, 2 и 4 самых популярных регионов (время запросов против памяти):
+    python -m scripts.benchmark --graphs grid:4000 --k 8 --arc-flags on --region-views 1 2 4
+
+Предобработка на scipy.sparse (--backend sparse) и ее проверка против обычной (время, флаги, расстояния):
+    python -m scripts.benchmark --graphs grid:3000 --k 8 --backend sparse
+    python -m scripts.benchmark --graphs grid:3000 --k 8 --compare-backends
+
+С набором запросов из scripts/workload.py (граф один, регионы берутся из файла графа):
+    python -m scripts.benchmark --graphs graph.json --workload workload.csv -o ranks.csv --plot ranks.png
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+
+from algo.benchmark import (QUERY_MODES, compare_backends, compare_results, load_results, plot_results,
+                            run_benchmark, run_workload, save_results)
+from algo.dijkstra.arc_flags import PREPROCESSING_BACKENDS
+from algo.graph_io import GraphData, load_graph_data
+from algo.workload import load_workload
+from scripts.generate_graph import GENERATORS, generate_road_network
+
+DEFAULT_K = [1, 2, 4, 8]  # Количества регионов, если --k не задан
+
+
+def resolve_graph(spec: str, seed: int | None) -> GraphData:
+    """ Загрузить граф из файла или сгенерировать по описанию "форма:количество_вершин" """
+    shape, _, size = spec.partition(':')
+    if shape in GENERATORS and size.isdigit() and not os.path.exists(spec):
+        return generate_road_network(shape, int(size), seed=seed)
+    return load_graph_data(spec)
+
+
+def print_comparison(comparison: list[dict]) -> None:
+    """ Вывести таблицу сравнения двух запусков """
+    for row in comparison:
+        mark = 'РЕГРЕССИЯ' if row['regression'] else 'ок'
+        flags = ' (arc_flags)' if row['arc_flags'] else ''
+        print(f"{row['graph']:>20} K={row['k']:<3} {row['mode'] + flags:<30} "
+              f"{row['baseline']:.6f} -> {row['current']:.6f} (x{row['ratio']:.2f}) {mark}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Замеры производительности arc flags")
+    parser.add_argument("--graphs", nargs="+", default=["grid:1000"], help="файлы графов или форма:размер")
+    parser.add_argument("--k", nargs="+", type=int,
+                        help="количества регионов (по умолчанию 1 2 4 8; с --workload - регионы из файла графа)")
+    parser.add_argument("--modes", nargs="+", choices=sorted(QUERY_MODES), default=list(QUERY_MODES))
+    parser.add_argument("--arc-flags", choices=["on", "off", "both"], default="both")
+    parser.add_argument("--queries", type=int, default=100, help="количество случайных запросов")
+    parser.add_argument("--workload", help="файл набора запросов (scripts/workload.py) вместо случайных")
+    parser.add_argument("--seed", type=int, default=0, help="зерно генерации графов и запросов")
+    parser.add_argument("--region-views", nargs="+", type=int, default=[],
+                        help="количества популярных регионов с отфильтрованными списками смежности")
+    parser.add_argument("--backend", choices=PREPROCESSING_BACKENDS, default="python",
+                        help="способ предобработки arc_flags")
+    parser.add_argument("--compare-backends", action="store_true",
+                        help="сравнить способы предобработки (время и результат) вместо замера запросов")
+    parser.add_argument("--no-memory", action="store_true", help="не замерять память предобработки")
+    parser.add_argument("-o", "--output", help="файл результатов .csv или .json")
+    parser.add_argument("--plot", help="файл с графиками (.png, .svg)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"),
+                        help="сравнить два сохраненных запуска вместо нового замера")
+    parser.add_argument("--metric", default="time_mean", help="метрика для сравнения и графиков")
+    parser.add_argument("--threshold", type=float, default=0.1, help="допустимое ухудшение при сравнении")
+    args = parser.parse_args()
+
+    if args.compare:
+        comparison = compare_results(load_results(args.compare[0]), load_results(args.compare[1]),
+                                     args.metric, args.threshold)
+        print_comparison(comparison)
+        return 1 if any(row['regression'] for row in comparison) else 0
+
+    arc_flags_options = {"on": [True], "off": [False], "both": [False, True]}[args.arc_flags]
+    graphs = {spec: resolve_graph(spec, args.seed) for spec in args.graphs}
+    progress = lambda message: print(message, file=sys.stderr)
+    if args.compare_backends:
+        rows = [row | {'graph': name} for name, data in graphs.items() for k in args.k or DEFAULT_K
+                for row in compare_backends(data, k, args.queries, args.seed)]
+        for row in rows:
+            speedup = f"x{row['speedup']:.1f}" if row['speedup'] else ''
+            print(f"{row['graph']:>20} K={row['k']:<3} {row['backend']:<8} "
+                  f"{row['preprocessing_time']:9.3f} с {speedup:>7}  отличается флагов: {row['flags_differ']}  неверных расстояний: {row['wrong_distances']}")
+        if args.output:
+            save_results(rows, args.output)
+        return 1 if any(row['wrong_distances'] for row in rows) else 0
+    if args.workload:
+        if len(graphs) != 1:
+            parser.error("с --workload задается ровно один граф")
+        if args.k:
+            parser.error("с --workload регионы берутся из файла графа, --k не задается")
+        if args.region_views:
+            parser.error("--region-views не поддерживается вместе с --workload")
+        (name, data), = graphs.items()
+        graph = data.to_graph()
+        # Флаги из файла (scripts/pipeline.py preprocess) используются как есть, предобработка не повторяется
+        preprocess = data.arc_flags is None or data.arc_flags.shape[1] != graph.K
+        if not preprocess:
+            progress("флаги arc_flags загружены из файла, предобработка не выполняется")
+        rows = run_workload(graph, load_workload(args.workload), name, args.modes, arc_flags_options,
+                            progress=progress, preprocess=preprocess, backend=args.backend,
+                            measure_memory=not args.no_memory)
+    else:
+        rows = run_benchmark(graphs, args.k or DEFAULT_K, args.modes, arc_flags_options, args.queries, args.seed,
+                             measure_memory=not args.no_memory, progress=progress, region_views=args.region_views,
+                             backend=args.backend)
+
+    for row in rows:
+        flags = ' (arc_flags)' if row['arc_flags'] else ''
+        group = f" {row['kind']}" + (f" ранг {row['rank']}" if row['rank'] else '') if row.get('kind') else ''
+        speedup = f"  x{row['speedup']:.2f}" if row.get('speedup') else ''
+        if row.get('region_views'):
+            flags += (f" +{row['region_views']} рег. ({row['region_views_memory'] / 1024:.0f} КБ, "
+                      f"{row['region_views_coverage']:.0%} запросов)")
+        print(f"{row['graph']:>20} K={row['k']:<3} {row['mode'] + flags:<30} "
+              f"{row['time_mean'] * 1000:9.3f} мс  вершин: {row['settled_mean']:.1f}  ребер: {row['relaxed_mean']:.1f}"
+              f"{speedup}{group}")
+
+    if args.output:
+        save_results(rows, args.output)
+    if args.plot:
+        plot_results(rows, args.plot, args.metric, x='rank' if args.workload else 'k')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,596 @@
+"""
+Проверка всех режимов поиска: сравнение с обычным алгоритмом Дейкстры и бюджеты производительности.
+
+Корректность: генерируются --graphs случайных графов (форма, размер, разбиение на регионы и односторонние ребра
+зависят от --seed). Для каждого графа предобработка arc_flags выполняется каждым доступным способом
+(PREPROCESSING_BACKENDS), и все режимы (ENGINES) отвечают на набор запросов. Ответ сравнивается с расстоянием
+dijkstra, путь проверяется по ребрам (начинается в source, заканчивается в target, длина равна расстоянию).
+Кроме режимов поиска проверяются представления регионов (build_region_views), поиск до всех вершин региона
+(dijkstra_to_region - весь вектор расстояний) и изменение весов: запросы, пока флаги части регионов устарели
+(update_weights), после восстановления флагов (repair_arc_flags) и после полной предобработки - флаги
+должны отсекать ребра так же, как на графе с теми же весами, предобработанном с нуля.
+Ошибочный случай уменьшается (удаляются ребра, вершины, регионы объединяются, пока ошибка сохраняется),
+минимальный граф сохраняется в --failures (JSON, открывается в GUI).
+
+Производительность: на одном графе (--perf-vertices) каждый режим выполняет один и тот же набор запросов,
+записываются количество исследованных вершин и время (для каждого запроса - лучшее из --repeat).
+С --baseline результаты сравниваются с сохраненным запуском: вершин больше чем на --settled-threshold
+или время больше чем на --time-threshold (и больше чем на --min-delta-ms) - регрессия.
+
+Код возврата 1, если найдена ошибка или регрессия. GUI не нужен.
+
+Запуск из корня репозитория:
+    python -m scripts.check_engines --graphs 200 --seed 1 -o engines.json
+    python -m scripts.check_engines --baseline engines.json --failures failures/
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+import numpy as np
+
+from algo.benchmark import QUERY_MODES, random_queries
+from algo.dijkstra.arc_flags import PREPROCESSING_BACKENDS, arc_flags_preprocessing, default_backend, repair_arc_flags
+from algo.dijkstra.dijkstra import dijkstra
+from algo.dijkstra.dijkstra_region import dijkstra_to_region
+from algo.dijkstra.region_view import build_region_views
+from algo.dijkstra.resumable import SearchPool
+from algo.dijkstra.structures import QueryStats
+from algo.graph import Graph
+from algo.graph_io import GraphData, save_graph_data
+from algo.metrics import MetricsRegistry
+from algo.partition import assign_regions
+from algo.planner import QueryPlanner, route
+from algo.shared_graph import SharedGraph
+from algo.tiles import TiledGraph, build_tiles
+from scripts.generate_graph import GENERATORS, generate_road_network
+
+WEIGHT_FACTORS = (0.0, 0.3, 0.7, 1.5, 4.0)  # Во сколько раз меняются веса ребер в проверке update_weights
+
+
+def weight_changes(graph: Graph) -> list[tuple[int, float]]:
+    """ Пакет изменений весов для проверки update_weights: пятая часть ребер (не меньше одного) легче или тяжелее """
+    rnd = random.Random(graph.edges_count)
+    edges = list(graph._edges_by_id.values())
+    changed = rnd.sample(edges, min(len(edges), max(1, len(edges) // 5)))
+    return [(edge.id, edge.weight * rnd.choice(WEIGHT_FACTORS)) for edge in changed]
+
+
+class Prepared:
+    """ Граф случая и все, что строится по нему для разных режимов (создается при первом обращении) """
+
+    def __init__(self, data: GraphData, backend: str | None, max_tiles: int = 2) -> None:
+        """
+        :param backend: способ предобработки arc_flags (None - без предобработки)
+        :param max_tiles: размер кэша тайлов (маленький - чтобы вытеснение и повторная загрузка тоже проверялись)
+        """
+        self.data = data
+        self.backend = backend
+        self.max_tiles = max_tiles
+        self.graph = data.to_graph()
+        if backend is not None:
+            arc_flags_preprocessing(self.graph, backend=backend)
+        self.registry = MetricsRegistry()  # не смешивать проверочные запросы с метриками процесса
+        self.planner = QueryPlanner(registry=self.registry)
+        self._shared: SharedGraph | None = None
+        self._pool: SearchPool | None = None
+        self._tiles_dir: tempfile.TemporaryDirectory | None = None
+        self._tiled: TiledGraph | None = None
+        self._views: Graph | None = None
+        self._updated: Graph | None = None
+        self._repaired: Graph | None = None
+        self._reprocessed: Graph | None = None
+        self._fresh: Graph | None = None
+        self._references: dict[tuple[int, int], list[float | None]] = {}  # (id графа, source) -> расстояния
+
+    def base(self) -> Graph:
+        return self.graph
+
+    def copy(self) -> Graph:
+        """ Копия графа с флагами: изменения в ней не видны режимам, которые используют self.graph """
+        return self.data.with_arc_flags(self.graph).to_graph()
+
+    def views(self) -> Graph:
+        """ Копия графа с представлениями всех регионов (build_region_views) """
+        if self._views is None:
+            self._views = self.copy()
+            build_region_views(self._views, range(self._views.K))
+        return self._views
+
+    def updated(self) -> Graph:
+        """ Копия графа после изменения весов (weight_changes): флаги части регионов устарели """
+        if self._updated is None:
+            self._updated = self.copy()
+            self._updated.update_weights(weight_changes(self._updated))
+        return self._updated
+
+    def repaired(self) -> Graph:
+        """ Копия графа после того же изменения весов и восстановления флагов (repair_arc_flags) """
+        if self._repaired is None:
+            graph = self.copy()
+            graph.update_weights(weight_changes(graph))
+            repair_arc_flags(graph, backend=self.backend)
+            if graph.stale_regions:
+                raise RuntimeError(f"regions {sorted(graph.stale_regions)} are still stale after repair")
+            self._repaired = graph
+        return self._repaired
+
+    def reprocessed(self) -> Graph:
+        """ Копия графа после того же изменения весов и полной предобработки (arc_flags_preprocessing) """
+        if self._reprocessed is None:
+            graph = self.copy()
+            graph.update_weights(weight_changes(graph))
+            arc_flags_preprocessing(graph, backend=self.backend)
+            if graph.stale_regions:
+                raise RuntimeError(f"regions {sorted(graph.stale_regions)} are still stale after preprocessing")
+            self._reprocessed = graph
+        return self._reprocessed
+
+    def fresh(self) -> Graph:
+        """ Граф с теми же новыми весами, предобработанный с нуля (без update_weights) """
+        if self._fresh is None:
+            graph = self.data.to_graph()
+            for edge_id, weight in weight_changes(graph):
+                graph.edge_by_id(edge_id).weight = weight
+            arc_flags_preprocessing(graph, backend=self.backend)
+            self._fresh = graph
+        return self._fresh
+
+    def reference(self, graph: Graph, s: int) -> list[float | None]:
+        """ Расстояния dijkstra из s в графе graph (один из графов этого случая) """
+        key = (id(graph), s)
+        if key not in self._references:
+            self._references[key] = dijkstra(graph, graph.vertex_at(s))[0]
+        return self._references[key]
+
+    def shared(self) -> SharedGraph:
+        if self._shared is None:
+            self._shared = SharedGraph.create(self.graph)
+        return self._shared
+
+    def pool(self) -> SearchPool:
+        if self._pool is None:
+            self._pool = SearchPool(self.graph, registry=self.registry)
+        return self._pool
+
+    def tiled(self) -> TiledGraph:
+        if self._tiled is None:
+            self._tiles_dir = tempfile.TemporaryDirectory(prefix='arcflags-tiles-')
+            data = self.data.with_arc_flags(self.graph) if self.backend is not None else self.data
+            build_tiles(data, self._tiles_dir.name)
+            self._tiled = TiledGraph(self._tiles_dir.name, max_tiles=self.max_tiles, registry=self.registry)
+        return self._tiled
+
+    def close(self) -> None:
+        if self._shared is not None:
+            self._shared.close()
+        if self._tiles_dir is not None:
+            self._tiles_dir.cleanup()
+
+    def __enter__(self) -> Prepared:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+@dataclass(frozen=True)
+class Engine:
+    """
+    Проверяемый режим: run(prepared, source, target, stats) -> (расстояние, номера ребер пути;
+    None - режим строит только расстояния)
+    """
+    name: str
+    arc_flags: bool | None  # нужна ли предобработка (None - режим проверяется и с ней, и без нее)
+    run: Callable[[Prepared, int, int, QueryStats], tuple[float, list[int] | None]]
+    deterministic: bool = True  # количество исследованных вершин не зависит от времени выполнения
+    graph: Callable[[Prepared], Graph] = Prepared.base  # граф, в котором проверяется ответ
+    # Дополнительная проверка запроса (source, target): описание ошибки или None
+    check: Callable[[Prepared, int, int], str | None] | None = None
+
+
+def _query_mode(mode: str, arc_flags: bool, graph_of: Callable[[Prepared], Graph] = Prepared.base) -> Callable:
+    def run(prepared: Prepared, s: int, t: int, stats: QueryStats) -> tuple[float, list[int]]:
+        graph = graph_of(prepared)
+        distance, path, _ = QUERY_MODES[mode](graph, graph.vertex_at(s), graph.vertex_at(t), arc_flags=arc_flags,
+                                              stats=stats)
+        return distance, [edge.id for edge in path]
+    return run
+
+
+def _route(prepared: Prepared, s: int, t: int, stats: QueryStats) -> tuple[float, list[int]]:
+    graph = prepared.graph
+    distance, path, _ = route(graph, graph.vertex_at(s), graph.vertex_at(t), planner=prepared.planner, stats=stats)
+    return distance, [edge.id for edge in path]
+
+
+def _shared(arc_flags: bool) -> Callable:
+    def run(prepared: Prepared, s: int, t: int, stats: QueryStats) -> tuple[float, list[int]]:
+        distance, path, settled = prepared.shared().shortest_path(s, t, arc_flags=arc_flags)
+        stats.settled += settled
+        return distance, list(path)
+    return run
+
+
+def _tiles(arc_flags: bool) -> Callable:
+    def run(prepared: Prepared, s: int, t: int, stats: QueryStats) -> tuple[float, list[int]]:
+        tiled = prepared.tiled()
+        distance, path, _ = tiled.shortest_path(tiled.to_internal(s), tiled.to_internal(t), arc_flags=arc_flags,
+                                                stats=stats)
+        return distance, path
+    return run
+
+
+def _resumable(prepared: Prepared, s: int, t: int, stats: QueryStats) -> tuple[float, list[int]]:
+    graph = prepared.graph
+    distance, path, _ = prepared.pool().query(graph.vertex_at(s), graph.vertex_at(t), stats=stats)
+    return distance, [edge.id for edge in path]
+
+
+def _to_region(arc_flags: bool) -> Callable:
+    def run(prepared: Prepared, s: int, t: int, stats: QueryStats) -> tuple[float, None]:
+        graph = prepared.graph
+        targets, distances = dijkstra_to_region(graph, graph.vertex_at(s), graph.vertex_at(t).k, arc_flags,
+                                                stats=stats)
+        return distances[targets.index(t)], None
+    return run
+
+
+def _check_region(arc_flags: bool) -> Callable:
+    """ Весь вектор расстояний dijkstra_to_region до региона target совпадает с расстояниями dijkstra """
+    def check(prepared: Prepared, s: int, t: int) -> str | None:
+        graph = prepared.graph
+        region = graph.vertex_at(t).k
+        targets, distances = dijkstra_to_region(graph, graph.vertex_at(s), region, arc_flags)
+        reference = prepared.reference(graph, s)
+        for i, distance in zip(targets, distances):
+            expected = reference[i] if reference[i] is not None else math.inf
+            if not same_distance(distance, expected):
+                return f"расстояние до вершины {i} региона {region}: {distance}, ожидалось {expected}"
+        return None
+    return check
+
+
+def _check_reprocessed(mode: str) -> Callable:
+    """ После update_weights и полной предобработки флаги отсекают столько же, сколько на графе с нуля """
+    def check(prepared: Prepared, s: int, t: int) -> str | None:
+        counts = []
+        for graph in (prepared.reprocessed(), prepared.fresh()):
+            stats = QueryStats()
+            QUERY_MODES[mode](graph, graph.vertex_at(s), graph.vertex_at(t), arc_flags=True, stats=stats)
+            counts.append((stats.settled, stats.pruned))
+        if counts[0] != counts[1]:
+            return (f"исследовано вершин и отброшено ребер {counts[0]}, "
+                    f"на графе, предобработанном с нуля, {counts[1]}")
+        return None
+    return check
+
+
+ENGINES: list[Engine] = [
+    *(Engine(f'{mode}{suffix}', arc_flags, _query_mode(mode, arc_flags))
+      for mode in QUERY_MODES for arc_flags, suffix in ((False, ''), (True, '+flags'))),
+    Engine('route', None, _route, deterministic=False),  # выбор режима зависит от замеров времени
+    Engine('shared', False, _shared(False)),
+    Engine('shared+flags', True, _shared(True)),
+    Engine('tiles', False, _tiles(False)),
+    Engine('tiles+flags', True, _tiles(True)),
+    Engine('resumable', False, _resumable),
+    Engine('to_region', False, _to_region(False), check=_check_region(False)),
+    Engine('to_region+flags', True, _to_region(True), check=_check_region(True)),
+    # Представления регионов, устаревшие флаги после изменения весов и восстановленные флаги - на копиях графа
+    *(Engine(f'{mode}+{suffix}', True, _query_mode(mode, True, graph_of), graph=graph_of)
+      for suffix, graph_of in (('views', Prepared.views), ('stale', Prepared.updated),
+                               ('repaired', Prepared.repaired))
+      for mode in QUERY_MODES),
+    *(Engine(f'{mode}+reprocessed', True, _query_mode(mode, True, Prepared.reprocessed), graph=Prepared.reprocessed,
+             check=_check_reprocessed(mode))
+      for mode in QUERY_MODES),
+]
+
+
+def available_backends() -> list[str]:
+    """ Способы предобработки, которые можно выполнить (sparse - только с scipy) """
+    return [backend for backend in PREPROCESSING_BACKENDS if backend != 'sparse' or default_backend() == 'sparse']
+
+
+def engines_for(backend: str | None) -> list[Engine]:
+    return [engine for engine in ENGINES if engine.arc_flags is None or engine.arc_flags == (backend is not None)]
+
+
+# ---------- Корректность ----------
+
+def random_case(seed: int, max_vertices: int) -> tuple[GraphData, str]:
+    """
+    Случайный граф: форма из GENERATORS, регионы - по координатам (assign_regions) или случайные номера,
+    часть ребер может остаться только в одном направлении
+    :return: граф и его описание для отчета
+    """
+    rnd = random.Random(seed)
+    shape = rnd.choice(sorted(GENERATORS))
+    n = rnd.randint(2, max_vertices)
+    k = rnd.randint(1, 6)
+    pos, adj = GENERATORS[shape](n, seed=seed)
+    if rnd.random() < 0.5:
+        regions, partition = assign_regions(pos, k), 'geometric'
+    else:
+        regions, partition = np.array([rnd.randrange(k) for _ in range(len(pos))], dtype=np.int64), 'random'
+    one_way = rnd.choice((0.0, 0.0, 0.2, 0.5))
+    if one_way and len(adj):
+        adj = adj[np.random.default_rng(seed).random(len(adj)) >= one_way]
+    description = f"seed={seed} {shape} n={len(pos)} m={len(adj)} k={k} регионы={partition} односторонних={one_way}"
+    return GraphData(pos=pos, adj=adj, regions=regions), description
+
+
+def case_queries(vertex_count: int, count: int, seed: int) -> list[tuple[int, int]]:
+    """ Все пары для маленьких графов, иначе count случайных (и хотя бы один запрос source == target) """
+    if vertex_count * vertex_count <= count:
+        return [(s, t) for s in range(vertex_count) for t in range(vertex_count)]
+    pairs = random_queries(vertex_count, count - 1, seed)
+    return pairs + [(pairs[0][0], pairs[0][0])]
+
+
+def same_distance(a: float, b: float) -> bool:
+    return a == b or math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9)
+
+
+def check_query(prepared: Prepared, engine: Engine, s: int, t: int) -> str | None:
+    """ Описание ошибки режима engine на запросе (s, t) или None, если ответ верный """
+    try:
+        graph = engine.graph(prepared)
+        distance, path = engine.run(prepared, s, t, QueryStats())
+        problem = engine.check(prepared, s, t) if engine.check is not None else None
+    except Exception as error:  # ошибка режима - тоже расхождение
+        return f"исключение {type(error).__name__}: {error}"
+    if problem is not None:
+        return problem
+    expected = prepared.reference(graph, s)[t]
+    expected = expected if expected is not None else math.inf
+    if not same_distance(distance, expected):
+        return f"расстояние {distance}, ожидалось {expected}"
+    if path is None:
+        return None
+    if distance == math.inf or s == t:
+        return f"путь {path} при расстоянии {distance}" if path else None
+    edges = [graph.edge_by_id(edge_id) for edge_id in path]
+    if not edges or edges[0].u != s or edges[-1].v != t:
+        return f"путь {path} не соединяет {s} и {t}"
+    if any(a.v != b.u for a, b in zip(edges, edges[1:])):
+        return f"путь {path} разрывается"
+    length = sum(edge.weight for edge in edges)
+    if not same_distance(length, distance):
+        return f"длина пути {length} не равна расстоянию {distance}"
+    return None
+
+
+def fails(data: GraphData, backend: str | None, engine: Engine, s: int, t: int) -> str | None:
+    """ Ошибка режима на графе data (с новой предобработкой) """
+    with Prepared(data, backend) as prepared:
+        return check_query(prepared, engine, s, t)
+
+
+def subgraph(data: GraphData, keep_vertices: np.ndarray, keep_edges: np.ndarray) -> tuple[GraphData, np.ndarray]:
+    """
+    Граф из вершин keep_vertices и ребер keep_edges (булевы маски; ребра с удаленными концами отбрасываются)
+    :return: граф и новые номера вершин (-1 - вершина удалена)
+    """
+    new_index = np.full(data.vertex_count, -1, dtype=np.int64)
+    new_index[keep_vertices] = np.arange(int(keep_vertices.sum()))
+    adj = new_index[data.adj[keep_edges]]
+    adj = adj[(adj >= 0).all(axis=1)]
+    return GraphData(pos=data.pos[keep_vertices], adj=adj, regions=data.regions[keep_vertices]), new_index
+
+
+def shrink(data: GraphData, backend: str | None, engine: Engine, s: int, t: int,
+           budget: float = 60.0) -> tuple[GraphData, int, int, str]:
+    """
+    Уменьшить граф, на котором режим ошибается: удаляются группы ребер (половины, четверти, ... по одному),
+    затем вершины, затем регионы объединяются - пока ошибка сохраняется. Повторяется, пока граф уменьшается
+    :param budget: наибольшее время уменьшения, секунды
+    :return: минимальный граф, запрос (s, t) в его номерах и описание ошибки
+    """
+    deadline = time.monotonic() + budget
+    problem = fails(data, backend, engine, s, t)
+
+    def attempt(candidate: GraphData, new_s: int, new_t: int) -> bool:
+        nonlocal data, s, t, problem
+        if time.monotonic() > deadline:
+            return False
+        found = fails(candidate, backend, engine, new_s, new_t)
+        if found is None:
+            return False
+        data, s, t, problem = candidate, new_s, new_t, found
+        return True
+
+    changed = True
+    while changed and time.monotonic() < deadline:
+        changed = False
+        chunk = max(1, data.edge_count // 2)
+        while chunk >= 1:
+            start = 0
+            while start < data.edge_count:
+                keep = np.ones(data.edge_count, dtype=bool)
+                keep[start:start + chunk] = False
+                candidate, _ = subgraph(data, np.ones(data.vertex_count, dtype=bool), keep)
+                if attempt(candidate, s, t):
+                    changed = True
+                else:
+                    start += chunk
+            chunk //= 2
+
+        for v in reversed(range(data.vertex_count)):
+            if v in (s, t) or v >= data.vertex_count:
+                continue
+            keep = np.ones(data.vertex_count, dtype=bool)
+            keep[v] = False
+            candidate, new_index = subgraph(data, keep, np.ones(data.edge_count, dtype=bool))
+            changed |= attempt(candidate, int(new_index[s]), int(new_index[t]))
+
+        for region in reversed(range(1, data.k)):
+            for target in range(region):  # регион region присоединяется к региону target
+                regions = np.where(data.regions == region, target, data.regions)
+                regions = np.where(regions > region, regions - 1, regions)  # номера регионов без пропусков
+                candidate = GraphData(pos=data.pos, adj=data.adj, regions=regions)
+                if attempt(candidate, s, t):
+                    changed = True
+                    break
+    return data, s, t, problem
+
+
+@dataclass
+class Failure:
+    engine: str
+    backend: str | None
+    case: str
+    source: int
+    target: int
+    problem: str
+    vertices: int
+    edges: int
+    graph_file: str | None = None
+
+
+def check_correctness(args, log: Callable[[str], None]) -> tuple[list[Failure], int]:
+    """ :return: найденные ошибки (по одной на режим и граф) и количество проверенных запросов """
+    backends: list[str | None] = [None] + list(args.backends)
+    failures: list[Failure] = []
+    checked = 0
+    for i in range(args.graphs):
+        seed = args.seed * 1_000_003 + i
+        data, description = random_case(seed, args.max_vertices)
+        queries = case_queries(data.vertex_count, args.queries, seed)
+        for backend in backends:
+            with Prepared(data, backend) as prepared:
+                for engine in engines_for(backend):
+                    for s, t in queries:
+                        checked += 1
+                        problem = check_query(prepared, engine, s, t)
+                        if problem is None:
+                            continue
+                        log(f"ОШИБКА {engine.name} (предобработка: {backend}) {description} запрос {s} -> {t}: "
+                            f"{problem}")
+                        small, small_s, small_t, small_problem = shrink(data, backend, engine, s, t, args.shrink_time)
+                        failure = Failure(engine.name, backend, description, small_s, small_t, small_problem,
+                                          small.vertex_count, small.edge_count)
+                        if args.failures:
+                            os.makedirs(args.failures, exist_ok=True)
+                            failure.graph_file = os.path.join(args.failures,
+                                                              f"{engine.name}-{backend}-{seed}.json")
+                            save_graph_data(small, failure.graph_file)
+                        log(f"    уменьшено до {small.vertex_count} вершин, {small.edge_count} ребер: "
+                            f"запрос {small_s} -> {small_t}: {small_problem}"
+                            + (f" ({failure.graph_file})" if failure.graph_file else ""))
+                        failures.append(failure)
+                        break  # одна ошибка на режим и граф
+        if (i + 1) % 10 == 0 or i + 1 == args.graphs:
+            log(f"Графов проверено: {i + 1}/{args.graphs}, запросов: {checked}, ошибок: {len(failures)}")
+    return failures, checked
+
+
+# ---------- Производительность ----------
+
+PERF_REGIONS = 8  # Количество регионов графа замеров
+
+
+def measure_performance(args, log: Callable[[str], None]) -> dict[str, dict[str, float]]:
+    """
+    Режимы с флагами используют предобработку default_backend()
+    :return: для каждого режима: 'settled' - сумма исследованных вершин по запросам,
+    'time' - сумма по запросам лучшего из --repeat времени запроса (всплески нагрузки на машине
+    портят отдельные запросы, а не весь набор), секунды
+    """
+    data = generate_road_network('delaunay', args.perf_vertices, PERF_REGIONS, seed=args.seed)
+    queries = random_queries(data.vertex_count, args.perf_queries, args.seed)
+    backend = default_backend()
+    with Prepared(data, None, max_tiles=PERF_REGIONS) as plain, \
+            Prepared(data, backend, max_tiles=PERF_REGIONS) as flagged:
+        runs = [(engine.name + ('+flags' if engine.arc_flags is None and prepared is flagged else ''), engine, prepared)
+                for prepared in (plain, flagged) for engine in engines_for(prepared.backend)]
+        times = {name: [math.inf] * len(queries) for name, _, _ in runs}
+        settled = {}
+        # Повторы чередуются по режимам: долгое замедление машины портит один повтор каждого режима,
+        # а не все повторы одного режима
+        for repeat in range(args.repeat + 1):  # первый проход - разогрев (для tiles/shared - построение)
+            for name, engine, prepared in runs:
+                prepared.pool().clear()  # каждый повтор resumable начинает без сохраненных поисков
+                stats = QueryStats()
+                for i, (s, t) in enumerate(queries):
+                    t0 = time.perf_counter()
+                    engine.run(prepared, s, t, stats)
+                    if repeat:
+                        times[name][i] = min(times[name][i], time.perf_counter() - t0)
+                settled.setdefault(name, stats.settled)
+    results = {}
+    for name, engine, _ in runs:
+        results[name] = {'settled': settled[name], 'time': sum(times[name]), 'deterministic': engine.deterministic}
+        log(f"{name:<40} {results[name]['time'] * 1000:9.2f} мс  вершин: {settled[name]}")
+    return results
+
+
+def compare(baseline: dict[str, dict[str, float]], current: dict[str, dict[str, float]], args) -> list[str]:
+    """ Регрессии относительно сохраненного запуска (по режимам, которые есть в обоих) """
+    regressions = []
+    for name in sorted(baseline.keys() & current.keys()):
+        before, after = baseline[name], current[name]
+        if after['deterministic'] and after['settled'] > before['settled'] * (1 + args.settled_threshold):
+            regressions.append(f"{name}: исследовано вершин {before['settled']} -> {after['settled']}")
+        if (after['time'] > before['time'] * (1 + args.time_threshold)
+                and after['time'] - before['time'] > args.min_delta_ms / 1000):
+            regressions.append(f"{name}: время {before['time'] * 1000:.2f} -> {after['time'] * 1000:.2f} мс "
+                               f"(x{after['time'] / before['time']:.2f})")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Проверка режимов поиска и бюджетов производительности")
+    parser.add_argument("--graphs", type=int, default=100, help="количество случайных графов (0 - не проверять)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-vertices", type=int, default=60, help="наибольший размер случайного графа")
+    parser.add_argument("--queries", type=int, default=30, help="запросов на граф")
+    parser.add_argument("--backends", nargs="*", choices=PREPROCESSING_BACKENDS, default=available_backends(),
+                        help="способы предобработки (по умолчанию - все доступные)")
+    parser.add_argument("--shrink-time", type=float, default=60.0, help="наибольшее время уменьшения случая, секунды")
+    parser.add_argument("--failures", help="папка для минимальных графов с ошибками")
+    parser.add_argument("--perf-vertices", type=int, default=1500, help="размер графа замеров (0 - не замерять)")
+    parser.add_argument("--perf-queries", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5, help="повторов набора запросов (берется лучшее время)")
+    parser.add_argument("-o", "--output", help="сохранить результаты в JSON (можно использовать как --baseline)")
+    parser.add_argument("--baseline", help="сравнить замеры с сохраненными результатами")
+    parser.add_argument("--settled-threshold", type=float, default=0.0,
+                        help="допустимый относительный рост количества исследованных вершин")
+    parser.add_argument("--time-threshold", type=float, default=0.25, help="допустимое относительное ухудшение времени")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0,
+                        help="меньшие изменения времени не считаются регрессией (шум измерений)")
+    args = parser.parse_args()
+
+    def log(message: str) -> None:
+        print(message, file=sys.stderr, flush=True)
+
+    failures, checked = check_correctness(args, log) if args.graphs else ([], 0)
+    performance = measure_performance(args, log) if args.perf_vertices else {}
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(json.load(f)['performance'], performance, args)
+        for regression in regressions:
+            log(f"РЕГРЕССИЯ {regression}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'checked_queries': checked, 'failures': [vars(failure) for failure in failures],
+                       'performance': performance}, f, indent=2, ensure_ascii=False)
+
+    log(f"Проверено запросов: {checked}, ошибок: {len(failures)}, регрессий: {len(regressions)}")
+    return 1 if failures or regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
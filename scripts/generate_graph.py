@@ -1,6 +1,29 @@
-import json
+"""
+Генератор синтетических дорожных сетей.
+
+Формы графа:
+    grid      - решетка со смещенными узлами (кварталы города)
+    geometric - случайный геометрический граф (соединяются точки ближе radius)
+    delaunay  - планарная триангуляция решетки, в каждой клетке выбирается короче диагональ
+
+Все вычисления векторизованы на NumPy, поэтому можно генерировать графы из миллионов вершин.
+Веса ребер равны евклидовым длинам, каждая связь добавляется в обе стороны.
+
+Запуск из корня репозитория:
+    python -m scripts.generate_graph --shape grid -n 10000 -k 8 --seed 1 -o grid.json
+    python -m scripts.generate_graph --shape geometric -n 1000000 -k 64 -o big.npz
+"""
+from __future__ import annotations
+
+import argparse
+import math
 import random
 
+import numpy as np
+
+from algo.graph_io import GraphData, save_graph_data, save_json
+from algo.partition import assign_regions
+
 COLORS = {
     'Красный': (255, 0, 0),
     'Зеленый': (0, 255, 0),
@@ -8,7 +31,11 @@ COLORS = {
     'Голубой': (0, 255, 255),
 }
 
+PAIRS_CHUNK = 1 << 20  # Сколько вершин обрабатывается за раз при поиске соседей
+
+
 def generate_random_graph(K, filename="random_graph.json"):
+    """ Старый генератор: случайные связи между случайными точками (не планарный граф) """
     # Определяем границы для координат вершин
     x_range = (0, 20)
     y_range = (0, 20)
@@ -18,34 +45,180 @@ def generate_random_graph(K, filename="random_graph.json"):
 
     # Генерация связей между вершинами (ребер)
     adj = []
+    seen = set()  # уже добавленные ребра (проверка за O(1))
     for i in range(K):
         # Добавляем случайное количество связей для каждой вершины
-        connections = random.sample(range(K), random.randint(1, 3))
+        connections = random.sample(range(K), min(K, random.randint(1, 3)))
         for j in connections:
-            if i != j and [i, j] not in adj:
+            if i != j and (i, j) not in seen:
+                seen.add((i, j))
                 adj.append([i, j])
 
-    # Генерация цветов вершин
-    points_colors = [random.choice(list(COLORS.values())) for _ in range(K)]
+    # Генерация регионов вершин (номер цвета из COLORS)
+    regions = np.array([random.randrange(len(COLORS)) for _ in range(K)], dtype=np.int64)
 
-    # Генерация названий вершин
-    texts = [f"Point {i}" for i in range(K)]
+    save_json(GraphData(pos=np.array(pos), adj=np.array(adj, dtype=np.int64).reshape(-1, 2), regions=regions),
+              filename)
 
-    # Собираем все в один словарь
-    graph_data = {
-        "pos": pos,
-        "adj": adj,
-        "points_colors": points_colors,
-        "texts": texts
-    }
+    print(f"Граф с {K} вершинами успешно сгенерирован и сохранен в файл '{filename}'.")
 
-    # Запись в файл .json
-    with open(filename, "w", encoding="utf-8") as f:
-        json.dump(graph_data, f, ensure_ascii=False, indent=4)
 
-    print(f"Граф с {K} вершинами успешно сгенерирован и сохранен в файл '{filename}'.")
+def _grid_shape(n: int) -> tuple[int, int]:
+    """ Размер решетки (строки, столбцы), близкой к квадрату, с не менее чем n узлами """
+    cols = max(1, math.ceil(math.sqrt(n)))
+    rows = max(1, math.ceil(n / cols))
+    return rows, cols
+
+
+def _both_directions(links: np.ndarray) -> np.ndarray:
+    """ Каждую неориентированную связь превратить в два встречных ребра """
+    return np.concatenate([links, links[:, ::-1]]).astype(np.int64)
+
+
+def _perturbed_grid(rows: int, cols: int, jitter: float, rng: np.random.Generator) -> np.ndarray:
+    """ Узлы решетки с шагом 1, сдвинутые на случайную величину в пределах jitter """
+    y, x = np.divmod(np.arange(rows * cols), cols)
+    pos = np.column_stack([x, y]).astype(np.float64)
+    pos += rng.uniform(-jitter / 2, jitter / 2, size=pos.shape)
+    return pos
+
+
+def generate_grid(n: int, jitter: float = 0.4, drop: float = 0.0, seed: int | None = None) -> tuple[
+    np.ndarray, np.ndarray]:
+    """
+    Решетка со смещенными узлами
+    :param n: минимальное количество вершин (решетка дополняется до прямоугольника)
+    :param jitter: величина случайного смещения узлов (в шагах решетки)
+    :param drop: доля случайно удаляемых связей (имитация тупиков и перекрытых улиц)
+    :param seed: зерно генератора случайных чисел
+    :return: координаты вершин (N, 2) и ребра (M, 2)
+    """
+    rng = np.random.default_rng(seed)
+    rows, cols = _grid_shape(n)
+    pos = _perturbed_grid(rows, cols, jitter, rng)
+
+    index = np.arange(rows * cols).reshape(rows, cols)
+    horizontal = np.column_stack([index[:, :-1].ravel(), index[:, 1:].ravel()])
+    vertical = np.column_stack([index[:-1, :].ravel(), index[1:, :].ravel()])
+    links = np.concatenate([horizontal, vertical])
+    if drop > 0:
+        links = links[rng.random(len(links)) >= drop]
+    return pos, _both_directions(links)
+
+
+def generate_delaunay(n: int, jitter: float = 0.6, seed: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Планарная триангуляция: смещенная решетка, где каждая клетка разбивается
+    более короткой диагональю (так же, как это сделала бы триангуляция Делоне для четырехугольника)
+    :param n: минимальное количество вершин
+    :param jitter: величина случайного смещения узлов (меньше 1, чтобы клетки не выворачивались)
+    :param seed: зерно генератора случайных чисел
+    :return: координаты вершин (N, 2) и ребра (M, 2)
+    """
+    rng = np.random.default_rng(seed)
+    rows, cols = _grid_shape(n)
+    pos = _perturbed_grid(rows, cols, jitter, rng)
+
+    index = np.arange(rows * cols).reshape(rows, cols)
+    horizontal = np.column_stack([index[:, :-1].ravel(), index[:, 1:].ravel()])
+    vertical = np.column_stack([index[:-1, :].ravel(), index[1:, :].ravel()])
+
+    # Углы каждой клетки: a - левый нижний, b - правый нижний, c - левый верхний, d - правый верхний
+    a, b = index[:-1, :-1].ravel(), index[:-1, 1:].ravel()
+    c, d = index[1:, :-1].ravel(), index[1:, 1:].ravel()
+    main_diagonal = np.hypot(*(pos[d] - pos[a]).T)
+    anti_diagonal = np.hypot(*(pos[c] - pos[b]).T)
+    use_main = main_diagonal <= anti_diagonal
+    diagonals = np.where(use_main[:, None], np.column_stack([a, d]), np.column_stack([b, c]))
+
+    links = np.concatenate([horizontal, vertical, diagonals])
+    return pos, _both_directions(links)
+
+
+def generate_geometric(n: int, radius: float = 1.5, seed: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Случайный геометрический граф: n точек равномерно в квадрате со стороной sqrt(n)
+    (плотность - одна точка на единицу площади), связь между точками ближе radius.
+    Соседи ищутся через разбиение плоскости на клетки размера radius
+    :param n: количество вершин
+    :param radius: радиус связи (средняя степень вершины около pi * radius^2)
+    :param seed: зерно генератора случайных чисел
+    :return: координаты вершин (N, 2) и ребра (M, 2)
+    """
+    rng = np.random.default_rng(seed)
+    side = math.sqrt(n)
+    pos = rng.uniform(0, side, size=(n, 2))
+
+    cells_per_side = max(1, int(side // radius))
+    cell_xy = np.minimum((pos / side * cells_per_side).astype(np.int64), cells_per_side - 1)
+    cell = cell_xy[:, 1] * cells_per_side + cell_xy[:, 0]
+
+    # Вершины, отсортированные по клеткам, и начало каждой клетки в этом порядке
+    order = np.argsort(cell, kind="stable")
+    counts = np.bincount(cell, minlength=cells_per_side ** 2)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+    links = []
+    # Половина окрестности клетки: каждая пара соседних клеток рассматривается один раз
+    for dx, dy in ((0, 0), (1, 0), (-1, 1), (0, 1), (1, 1)):
+        for chunk in range(0, n, PAIRS_CHUNK):
+            i = np.arange(chunk, min(chunk + PAIRS_CHUNK, n))
+            nx, ny = cell_xy[i, 0] + dx, cell_xy[i, 1] + dy
+            inside = (nx >= 0) & (nx < cells_per_side) & (ny < cells_per_side)
+            i, other = i[inside], (ny * cells_per_side + nx)[inside]
+
+            # Все кандидаты из соседней клетки для каждой вершины i
+            repeat = counts[other]
+            first = np.repeat(i, repeat)
+            offset = np.arange(repeat.sum()) - np.repeat(np.cumsum(repeat) - repeat, repeat)
+            second = order[np.repeat(starts[other], repeat) + offset]
+
+            keep = np.hypot(*(pos[first] - pos[second]).T) <= radius
+            if (dx, dy) == (0, 0):
+                keep &= first < second
+            links.append(np.column_stack([first[keep], second[keep]]))
+
+    return pos, _both_directions(np.concatenate(links))
+
+
+GENERATORS = {
+    "grid": generate_grid,
+    "geometric": generate_geometric,
+    "delaunay": generate_delaunay,
+}
+
+
+def generate_road_network(shape: str, n: int, k: int = 1, seed: int | None = None, **options) -> GraphData:
+    """
+    Сгенерировать дорожную сеть заданной формы
+    :param shape: форма графа (grid, geometric, delaunay)
+    :param n: количество вершин
+    :param k: количество регионов (1 - без разбиения на регионы)
+    :param seed: зерно генератора случайных чисел (одинаковое зерно - одинаковый граф)
+    :param options: дополнительные параметры генератора (jitter, drop, radius)
+    """
+    pos, adj = GENERATORS[shape](n, seed=seed, **options)
+    return GraphData(pos=pos, adj=adj, regions=assign_regions(pos, k))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Генератор синтетических дорожных сетей")
+    parser.add_argument("--shape", choices=sorted(GENERATORS), default="grid", help="форма графа")
+    parser.add_argument("-n", type=int, default=100, help="количество вершин")
+    parser.add_argument("-k", type=int, default=1, help="количество регионов")
+    parser.add_argument("--seed", type=int, default=None, help="зерно генератора случайных чисел")
+    parser.add_argument("--jitter", type=float, help="смещение узлов решетки (grid, delaunay)")
+    parser.add_argument("--drop", type=float, help="доля удаляемых связей (grid)")
+    parser.add_argument("--radius", type=float, help="радиус связи (geometric)")
+    parser.add_argument("-o", "--output", default="random_graph.json", help="файл .json или .npz")
+    args = parser.parse_args()
+
+    options = {name: getattr(args, name) for name in ("jitter", "drop", "radius") if getattr(args, name) is not None}
+    data = generate_road_network(args.shape, args.n, args.k, args.seed, **options)
+    save_graph_data(data, args.output)
+    print(f"Граф ({args.shape}) с {data.vertex_count} вершинами и {data.edge_count} ребрами "
+          f"успешно сгенерирован и сохранен в файл '{args.output}'.")
 
 
 if __name__ == '__main__':
-    # Пример использования
-    generate_random_graph(50)
+    main()
@@ -0,0 +1,91 @@
+"""
+Нагрузочная проверка сервиса запросов (scripts/serve.py): пропускная способность и задержки.
+
+Клиенты держат по одному соединению keep-alive и отправляют запросы между случайными вершинами
+(количество вершин берется из /health) друг за другом. Задержки собираются в LatencyHistogram.
+
+Запуск из корня репозитория (сервис уже запущен):
+    python -m scripts.load_test --port 8080 --requests 5000 --concurrency 64
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import Counter
+
+from algo.metrics import LatencyHistogram
+
+
+async def request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, method: str, path: str,
+                  payload: dict | None = None) -> tuple[int, bytes]:
+    """ Отправить запрос по открытому соединению и прочитать ответ: (код, тело) """
+    body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode('latin-1') + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while (line := await reader.readline()) not in (b'\r\n', b''):
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+
+async def client(host: str, port: int, queries: list[tuple[int, int]], arc_flags: bool,
+                 latency: LatencyHistogram, statuses: Counter) -> None:
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for source, target in queries:
+            t0 = time.perf_counter()
+            status, _ = await request(reader, writer, 'POST', '/route',
+                                      {'source': source, 'target': target, 'arc_flags': arc_flags})
+            statuses[status] += 1
+            if status == 200:
+                latency.record(time.perf_counter() - t0)
+    finally:
+        writer.close()
+
+
+async def run(args) -> int:
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    _, body = await request(reader, writer, 'GET', '/health')
+    writer.close()
+    n = json.loads(body)['vertices']
+
+    rng = random.Random(args.seed)
+    queries = [(rng.randrange(n), rng.randrange(n)) for _ in range(args.requests)]
+    latency, statuses = LatencyHistogram(), Counter()
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client(args.host, args.port, queries[i::args.concurrency], not args.no_arc_flags,
+                                  latency, statuses) for i in range(args.concurrency)))
+    elapsed = time.perf_counter() - t0
+
+    print(f"Запросов: {args.requests} за {elapsed:.2f} с ({args.requests / elapsed:.1f} в секунду), "
+          f"клиентов: {args.concurrency}")
+    print("Ответы: " + ', '.join(f"{status}: {count}" for status, count in sorted(statuses.items())))
+    if latency.count:
+        print(f"Задержка успешных, мс: p50 {latency.percentile(0.5) * 1000:.2f}  "
+              f"p95 {latency.percentile(0.95) * 1000:.2f}  p99 {latency.percentile(0.99) * 1000:.2f}  "
+              f"max {latency.max * 1000:.2f}")
+    return 0 if statuses[200] + statuses[503] == args.requests else 1
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Нагрузочная проверка сервиса кратчайших путей")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--requests", type=int, default=1000, help="всего запросов")
+    parser.add_argument("--concurrency", type=int, default=32, help="одновременных соединений")
+    parser.add_argument("--no-arc-flags", action="store_true", help="запросы без оптимизации arc_flags")
+    parser.add_argument("--seed", type=int, default=0, help="зерно выбора вершин")
+    args = parser.parse_args()
+    return asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
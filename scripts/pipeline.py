@@ -0,0 +1,307 @@
+"""
+Конвейер командной строки без GUI: каждый шаг читает и пишет файлы, поэтому шаги можно запускать
+по отдельности, повторять и соединять.
+
+    import      перевести входной файл (.json, .npz или DIMACS .gr + .co) во внутренний формат (.json / .npz)
+    partition   разбить вершины на K регионов (сохраненные флаги сбрасываются)
+    reorder     перенумеровать вершины для локальности памяти (algo.reorder), исходные номера сохраняются
+    preprocess  предобработка arc_flags (флаги сохраняются в файл графа), с кэшем по хешу графа
+    tile        разбить граф на тайлы по регионам (algo.tiles) для графов, которые не помещаются в память
+    query       один запрос или набор запросов из CSV (колонки source, target), результаты выводятся по мере готовности
+                (номера вершин - исходные, даже если граф перенумерован); --mode auto - режим поиска для
+                каждого запроса выбирает планировщик (algo.planner); для папки тайлов - однонаправленный
+                поиск с загрузкой тайлов по требованию, статистика кэша тайлов выводится в конце
+    bench       замер режимов поиска на наборе запросов (scripts/workload.py) или на случайных запросах
+
+Запуск из корня репозитория:
+    python -m scripts.pipeline import road.gr --coordinates road.co -o road.npz
+    python -m scripts.pipeline partition road.npz -k 16 -o road16.npz
+    python -m scripts.pipeline reorder road16.npz --method hilbert -o road16.npz
+    python -m scripts.pipeline preprocess road16.npz -o road16.npz --workers 4 --cache .arcflags-cache
+    python -m scripts.pipeline tile road16.npz -o road16.tiles
+    python -m scripts.pipeline query road16.npz --pair 0 100
+    python -m scripts.pipeline query road16.tiles --queries workload.csv --tile-cache 4 -o routes.csv
+    python -m scripts.pipeline query road16.npz --queries workload.csv -o routes.csv
+    python -m scripts.pipeline bench road16.npz --workload workload.csv -o bench.csv
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import os
+import sys
+import time
+from dataclasses import replace
+from functools import partial
+from typing import Callable, Iterator, TextIO
+
+import numpy as np
+
+from algo.benchmark import QUERY_MODES, random_queries, run_workload, save_results
+from algo.dijkstra.arc_flags import PREPROCESSING_BACKENDS, arc_flags_preprocessing, default_backend
+from algo.dijkstra.structures import QueryStats
+from algo.graph_io import REGION_COLORS, load_dimacs, load_graph_data, save_graph_data
+from algo.partition import assign_regions
+from algo.planner import QueryPlanner, route
+from algo.reorder import REORDER_METHODS, VertexMapping, edge_span, reorder
+from algo.tiles import TiledGraph, build_tiles
+from algo.workload import Query, load_workload
+
+# Колонки результатов query
+QUERY_FIELDS = ['source', 'target', 'distance', 'settled', 'relaxed', 'time', 'path']
+
+
+def log(message: str) -> None:
+    print(message, file=sys.stderr)
+
+
+def check_output(parser: argparse.ArgumentParser, path: str, k: int) -> None:
+    """ В JSON регион хранится цветом вершины, поэтому регионов не больше, чем цветов """
+    if not path.endswith(".npz") and k > len(REGION_COLORS):
+        parser.error(f"в JSON не больше {len(REGION_COLORS)} регионов, сохраните граф в .npz")
+
+
+def cmd_import(args, parser) -> int:
+    if args.input.endswith(".gr"):
+        if not args.coordinates:
+            parser.error("для DIMACS .gr нужен файл координат --coordinates .co")
+        data = load_dimacs(args.input, args.coordinates)
+    else:
+        data = load_graph_data(args.input)
+    check_output(parser, args.output, data.k)
+    save_graph_data(data, args.output)
+    log(f"{args.input}: вершин {data.vertex_count}, ребер {data.edge_count} -> {args.output}")
+    return 0
+
+
+def cmd_partition(args, parser) -> int:
+    check_output(parser, args.output, args.k)
+    data = load_graph_data(args.graph)
+    data = replace(data, regions=assign_regions(data.pos, args.k), arc_flags=None, region_bounds=None)
+    save_graph_data(data, args.output)
+    sizes = np.bincount(data.regions, minlength=args.k)
+    log(f"{args.graph}: {args.k} регионов (вершин в регионе от {sizes.min()} до {sizes.max()}) -> {args.output}")
+    return 0
+
+
+def cmd_reorder(args, parser) -> int:
+    data = load_graph_data(args.graph)
+    reordered = reorder(data, args.method)
+    save_graph_data(reordered, args.output or args.graph)
+    log(f"{args.graph}: средняя разность номеров концов ребра {edge_span(data):.1f} -> {edge_span(reordered):.1f}")
+    return 0
+
+
+def cmd_preprocess(args, parser) -> int:
+    data = load_graph_data(args.graph)
+    cache_path = os.path.join(args.cache, data.fingerprint() + ".npz") if args.cache else None
+    if cache_path and os.path.exists(cache_path) and not args.force:
+        with np.load(cache_path) as cached:
+            data = replace(data, arc_flags=cached["arc_flags"], region_bounds=cached["region_bounds"])
+        log(f"Флаги взяты из кэша {cache_path}")
+    else:
+        graph = data.to_graph()
+        t0 = time.perf_counter()
+        arc_flags_preprocessing(graph, backend=args.backend, workers=args.workers)
+        log(f"Предобработка ({args.backend}, процессов: {args.workers}): {time.perf_counter() - t0:.2f} с")
+        data = data.with_arc_flags(graph)
+        if cache_path:
+            os.makedirs(args.cache, exist_ok=True)
+            with open(cache_path, "wb") as f:
+                np.savez(f, arc_flags=data.arc_flags, region_bounds=data.region_bounds)
+    save_graph_data(data, args.output or args.graph)
+    return 0
+
+
+def cmd_tile(args, parser) -> int:
+    data = load_graph_data(args.graph)
+    if data.arc_flags is None:
+        log(f"В {args.graph} нет флагов arc_flags: запросы по тайлам будут возможны только с --no-arc-flags")
+    index = build_tiles(data, args.output)
+    sizes = [tile['bytes'] for tile in index['tiles']]
+    log(f"{args.graph}: {index['k']} тайлов (от {min(sizes) / 2 ** 20:.1f} до {max(sizes) / 2 ** 20:.1f} МБ), "
+        f"ребер между тайлами {index['boundary_edges']} -> {args.output}")
+    return 0
+
+
+def read_pairs(path: str) -> Iterator[tuple[int, int]]:
+    """ Пары (source, target) из CSV с заголовком (формат scripts/workload.py), '-' - стандартный ввод """
+    f = sys.stdin if path == '-' else open(path, 'r', encoding='utf-8', newline='')
+    try:
+        for row in csv.DictReader(f):
+            yield int(row['source']), int(row['target'])
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+# Поиск для query: (source, target, stats) -> (расстояние, номера ребер пути) и вывод итогов после всех запросов
+Solver = tuple[Callable[[int, int, QueryStats], tuple[float, list[int]]], Callable[[], None]]
+
+
+def memory_solver(args, parser) -> Solver:
+    """ Поиск по графу, загруженному в память целиком (--mode auto - режим выбирает планировщик algo.planner) """
+    data = load_graph_data(args.graph)
+    if not args.no_arc_flags and data.arc_flags is None:
+        parser.error(f"в {args.graph} нет флагов arc_flags: выполните preprocess или укажите --no-arc-flags")
+    graph = data.to_graph()
+    mapping = VertexMapping.of(data)
+    planner = QueryPlanner()
+    if args.mode == "auto":
+        query = partial(route, planner=planner, arc_flags=False if args.no_arc_flags else None)
+    else:
+        query = partial(QUERY_MODES[args.mode or "bidirectional"], arc_flags=not args.no_arc_flags)
+
+    def solve(source: int, target: int, stats: QueryStats) -> tuple[float, list[int]]:
+        start, end = graph.vertex_at(mapping.to_internal(source)), graph.vertex_at(mapping.to_internal(target))
+        distance, path, _ = query(graph, start, end, stats=stats)
+        return distance, [edge.id for edge in path]
+
+    def report() -> None:
+        for row in planner.summary():
+            flags = " (arc_flags)" if row['engine_arc_flags'] else ""
+            log(f"Планировщик: класс {row['distance_class']}{' с флагами' if row['arc_flags'] else ''}, "
+                f"{row['mode'] + flags}: запросов {row['count']}, среднее {row['mean'] * 1000:.3f} мс")
+    return solve, report
+
+
+def tiled_solver(args, parser) -> Solver:
+    """ Однонаправленный поиск по папке тайлов (algo.tiles) """
+    if args.mode not in (None, "unidirectional"):
+        parser.error("по тайлам выполняется только однонаправленный поиск (--mode unidirectional)")
+    tiled = TiledGraph(args.graph, max_tiles=args.tile_cache)
+    if not args.no_arc_flags and not tiled.has_arc_flags:
+        parser.error(f"в {args.graph} нет флагов arc_flags: выполните preprocess и tile или укажите --no-arc-flags")
+
+    def solve(source: int, target: int, stats: QueryStats) -> tuple[float, list[int]]:
+        distance, path, _ = tiled.shortest_path(tiled.to_internal(source), tiled.to_internal(target),
+                                                arc_flags=not args.no_arc_flags, stats=stats)
+        return distance, path
+
+    def report() -> None:
+        cache = tiled.cache_stats()
+        hit_rate = f"{cache['hit_rate']:.1%}" if cache['hit_rate'] is not None else "-"
+        log(f"Кэш тайлов ({cache['max_tiles']}): попаданий {cache['hits']}, загрузок {cache['loads']} "
+            f"({hit_rate} попаданий), вытеснено {cache['evictions']}, "
+            f"прочитано {cache['bytes_loaded'] / 2 ** 20:.1f} МБ за {cache['load_time']:.2f} с, "
+            f"пропущено по флагам {cache['skipped_by_flags']}")
+    return solve, report
+
+
+def cmd_query(args, parser) -> int:
+    solve, report = tiled_solver(args, parser) if os.path.isdir(args.graph) else memory_solver(args, parser)
+    pairs = [tuple(args.pair)] if args.pair else read_pairs(args.queries)
+
+    out: TextIO = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8', newline='')
+    try:
+        writer = csv.writer(out)
+        writer.writerow(QUERY_FIELDS)
+        for source, target in pairs:
+            stats = QueryStats()
+            t0 = time.perf_counter()
+            distance, path = solve(source, target, stats)
+            elapsed = time.perf_counter() - t0
+            found = distance != float('inf')
+            writer.writerow([source, target, distance if found else '', stats.settled, stats.relaxed,
+                             f"{elapsed:.6f}", ' '.join(map(str, path))])
+            out.flush()  # следующий шаг конвейера получает результаты сразу
+    except BrokenPipeError:
+        # Получатель закрыл вывод (например, head): остальные результаты не нужны
+        os.dup2(os.open(os.devnull, os.O_WRONLY), out.fileno())
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    report()
+    return 0
+
+
+def cmd_bench(args, parser) -> int:
+    data = load_graph_data(args.graph)
+    if args.workload:
+        queries = load_workload(args.workload)
+    else:
+        queries = [Query(s, t, 'random', None) for s, t in random_queries(data.vertex_count, args.queries, args.seed)]
+    arc_flags_options = {"on": [True], "off": [False], "both": [False, True]}[args.arc_flags]
+    graph = data.to_graph()
+    # Флаги из файла (scripts/pipeline.py preprocess) используются как есть, предобработка не повторяется
+    preprocess = data.arc_flags is None or data.arc_flags.shape[1] != graph.K
+    if not preprocess:
+        log("флаги arc_flags загружены из файла, предобработка не выполняется")
+    rows = run_workload(graph, queries, os.path.basename(args.graph), args.modes, arc_flags_options,
+                        progress=log, preprocess=preprocess, backend=args.backend, workers=args.workers)
+    for row in rows:
+        flags = ' (arc_flags)' if row['arc_flags'] else ''
+        print(f"{row['mode'] + flags:<30} {row['kind']:<8} {row['time_mean'] * 1000:9.3f} мс  "
+              f"вершин: {row['settled_mean']:.1f}")
+    if args.output:
+        save_results(rows, args.output)
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Конвейер arc flags: импорт, регионы, предобработка, запросы")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("import", help="перевести граф во внутренний формат")
+    command.add_argument("input", help="файл .json, .npz или DIMACS .gr")
+    command.add_argument("--coordinates", help="координаты DIMACS .co (для .gr)")
+    command.add_argument("-o", "--output", required=True, help="файл графа .json / .npz")
+    command.set_defaults(run=cmd_import)
+
+    command = commands.add_parser("partition", help="разбить вершины на регионы")
+    command.add_argument("graph")
+    command.add_argument("-k", type=int, required=True, help="количество регионов")
+    command.add_argument("-o", "--output", required=True)
+    command.set_defaults(run=cmd_partition)
+
+    command = commands.add_parser("reorder", help="перенумеровать вершины для локальности памяти")
+    command.add_argument("graph")
+    command.add_argument("--method", choices=REORDER_METHODS, default="hilbert")
+    command.add_argument("-o", "--output", help="файл результата (по умолчанию - тот же файл)")
+    command.set_defaults(run=cmd_reorder)
+
+    command = commands.add_parser("preprocess", help="предобработка arc_flags")
+    command.add_argument("graph")
+    command.add_argument("-o", "--output", help="файл результата (по умолчанию - тот же файл)")
+    command.add_argument("--backend", choices=PREPROCESSING_BACKENDS, default=default_backend())
+    command.add_argument("--workers", type=int, default=1, help="количество процессов (для --backend sparse)")
+    command.add_argument("--cache", help="папка кэша флагов (ключ - хеш графа и регионов)")
+    command.add_argument("--force", action="store_true", help="пересчитать, даже если флаги есть в кэше")
+    command.set_defaults(run=cmd_preprocess)
+
+    command = commands.add_parser("tile", help="разбить граф на тайлы по регионам")
+    command.add_argument("graph")
+    command.add_argument("-o", "--output", required=True, help="папка тайлов")
+    command.set_defaults(run=cmd_tile)
+
+    command = commands.add_parser("query", help="кратчайшие пути")
+    command.add_argument("graph", help="файл графа или папка тайлов")
+    pairs = command.add_mutually_exclusive_group(required=True)
+    pairs.add_argument("--pair", nargs=2, type=int, metavar=("SOURCE", "TARGET"), help="один запрос")
+    pairs.add_argument("--queries", help="CSV с колонками source, target ('-' - стандартный ввод)")
+    command.add_argument("--mode", choices=sorted(QUERY_MODES) + ["auto"],
+                         help="режим поиска (по умолчанию bidirectional, auto - выбирает планировщик)")
+    command.add_argument("--no-arc-flags", action="store_true", help="поиск без arc_flags")
+    command.add_argument("--tile-cache", type=int, default=8, help="сколько тайлов держать в памяти (для папки тайлов)")
+    command.add_argument("-o", "--output", default="-", help="CSV результатов ('-' - стандартный вывод)")
+    command.set_defaults(run=cmd_query)
+
+    command = commands.add_parser("bench", help="замер режимов поиска")
+    command.add_argument("graph")
+    command.add_argument("--workload", help="набор запросов (scripts/workload.py)")
+    command.add_argument("--queries", type=int, default=100, help="количество случайных запросов без --workload")
+    command.add_argument("--seed", type=int, default=0)
+    command.add_argument("--modes", nargs="+", choices=sorted(QUERY_MODES), default=list(QUERY_MODES))
+    command.add_argument("--arc-flags", choices=["on", "off", "both"], default="both")
+    command.add_argument("--backend", choices=PREPROCESSING_BACKENDS, default=default_backend(),
+                         help="способ предобработки, если в файле нет флагов")
+    command.add_argument("--workers", type=int, default=1, help="количество процессов (для --backend sparse)")
+    command.add_argument("-o", "--output", help="файл результатов .csv или .json")
+    command.set_defaults(run=cmd_bench)
+
+    args = parser.parse_args()
+    return args.run(args, parser)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
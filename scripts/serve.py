@@ -0,0 +1,72 @@
+"""
+Запуск HTTP/JSON сервиса запросов (algo.service).
+
+Граф загружается из файла (.json / .npz). Если в файле есть сохраненные флаги arc_flags для того же
+количества регионов, они используются, иначе предобработка выполняется при запуске.
+
+Запуск из корня репозитория:
+    python -m scripts.serve graph.json --port 8080 --workers 4
+    curl -d '{"source": 0, "target": 100}' http://127.0.0.1:8080/route
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+import time
+
+from algo.dijkstra.arc_flags import PREPROCESSING_BACKENDS, arc_flags_preprocessing, default_backend
+from algo.graph_io import load_graph_data
+from algo.reorder import VertexMapping
+from algo.service import QueryService
+from algo.shared_graph import SharedGraph
+
+
+async def serve(service: QueryService, host: str, port: int) -> None:
+    await service.start(host, port)
+    print(f"Сервис запущен: http://{host}:{service.port} (процессов: {service.workers})", file=sys.stderr)
+    try:
+        await service.serve_forever()
+    finally:
+        await service.stop()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="HTTP/JSON сервис кратчайших путей")
+    parser.add_argument("graph", help="файл графа .json / .npz")
+    parser.add_argument("--k", type=int, help="количество регионов (по умолчанию - из файла)")
+    parser.add_argument("--backend", choices=PREPROCESSING_BACKENDS, default=default_backend(),
+                        help="способ предобработки, если в файле нет флагов")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=2, help="количество процессов-обработчиков")
+    parser.add_argument("--max-pending", type=int, default=1024,
+                        help="сколько запросов может быть в работе (остальные получают 503)")
+    parser.add_argument("--batch-window", type=float, default=0.002, help="время сбора пачки, секунды")
+    parser.add_argument("--max-batch", type=int, default=64, help="наибольший размер пачки")
+    args = parser.parse_args()
+
+    data = load_graph_data(args.graph)
+    graph = data.to_graph(args.k)
+    if data.arc_flags is None or data.arc_flags.shape[1] != graph.K:
+        t0 = time.perf_counter()
+        arc_flags_preprocessing(graph, backend=args.backend)
+        print(f"Предобработка ({args.backend}): {time.perf_counter() - t0:.2f} с", file=sys.stderr)
+
+    # Перенумерованный граф (scripts/pipeline.py reorder): запросы приходят с исходными номерами вершин
+    mapping = VertexMapping.of(data) if data.vertex_ids is not None else None
+    shared = SharedGraph.create(graph)
+    del graph, data  # дальше нужен только граф в разделяемой памяти
+    service = QueryService(shared, workers=args.workers, max_pending=args.max_pending,
+                           batch_window=args.batch_window, max_batch=args.max_batch, mapping=mapping)
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        shared.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
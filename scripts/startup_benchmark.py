@@ -0,0 +1,152 @@
+"""
+Замер времени запуска: импорт модулей ядра (python -X importtime) и первый запрос на загруженном графе.
+
+Каждый замер выполняется в новом процессе интерпретатора (холодный импорт), берется медиана из --runs запусков.
+Модули ядра не должны загружать GUI и тяжелые библиотеки (FORBIDDEN) - это проверяется по списку импортов.
+С --baseline результаты сравниваются с сохраненным запуском: код возврата 1, если что-то стало медленнее
+больше чем на --threshold (и больше чем на --min-delta-ms) или ядро загрузило запрещенный модуль.
+
+Запуск из корня репозитория:
+    python -m scripts.startup_benchmark --graph graph.json -o startup.json
+    python -m scripts.startup_benchmark --graph graph.json --baseline startup.json --threshold 0.2
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+# Модули, которые нужны обработчикам запросов и инструментам командной строки
+CORE_MODULES = (
+    'algo.graph',
+    'algo.graph_io',
+    'algo.dijkstra.dijkstra_unidirectional',
+    'algo.dijkstra.dijkstra_bidirectional',
+    'algo.dijkstra.arc_flags',
+    'algo.metrics',
+    'algo.benchmark',
+    'algo.planner',
+)
+
+# Эти модули ядро загружает только при первом использовании (или не загружает вовсе)
+FORBIDDEN = ('PyQt6', 'pyqtgraph', 'numpy', 'scipy', 'matplotlib', 'multiprocessing', 'concurrent.futures')
+
+# Первый запрос: импорт, загрузка графа, один двунаправленный поиск (с arc_flags, если в файле есть предобработка)
+FIRST_QUERY = """
+import json, time
+t0 = time.perf_counter()
+from algo.graph_io import load_graph
+from algo.dijkstra.dijkstra_bidirectional import dijkstra_bidirectional
+t1 = time.perf_counter()
+graph = load_graph({path!r})
+t2 = time.perf_counter()
+dijkstra_bidirectional(graph, graph.vertex_at(0), graph.vertex_at(graph.vertex_count - 1),
+                       arc_flags=graph.region_bounds is not None)
+t3 = time.perf_counter()
+print(json.dumps({{'first_query_import': t1 - t0, 'first_query_load': t2 - t1, 'first_query_search': t3 - t2,
+                  'first_query_total': t3 - t0}}))
+"""
+
+
+def import_time(module: str) -> tuple[float, set[str]]:
+    """
+    Холодный импорт модуля в новом процессе
+    :return: время импорта вместе с зависимостями (секунды) и имена всех загруженных модулей
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True, check=True)
+    cumulative, loaded = None, set()
+    for line in result.stderr.splitlines():
+        # import time:       self [us] |  cumulative | imported package
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, total, name = line[len('import time:'):].split('|')
+        if not total.strip().isdigit():
+            continue  # заголовок
+        loaded.add(name.strip())
+        if name.strip() == module:
+            cumulative = int(total) / 1e6
+    return cumulative, loaded
+
+
+def interpreter_time() -> float:
+    """ Время запуска и завершения пустого интерпретатора (для сравнения с импортом) """
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable, '-c', 'pass'], check=True)
+    return time.perf_counter() - t0
+
+
+def first_query(path: str) -> dict[str, float]:
+    result = subprocess.run([sys.executable, '-c', FIRST_QUERY.format(path=path)],
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+
+def measure(graph_path: str | None, runs: int) -> tuple[dict[str, float], dict[str, list[str]]]:
+    """
+    :return: медианы замеров (секунды) по названиям и запрещенные модули, загруженные модулями ядра
+    """
+    samples: dict[str, list[float]] = {}
+    forbidden: dict[str, list[str]] = {}
+    for _ in range(runs):
+        samples.setdefault('interpreter', []).append(interpreter_time())
+        for module in CORE_MODULES:
+            seconds, loaded = import_time(module)
+            samples.setdefault(f'import:{module}', []).append(seconds)
+            bad = sorted(heavy for heavy in FORBIDDEN if any(name == heavy or name.startswith(heavy + '.')
+                                                             for name in loaded))
+            if bad:
+                forbidden[module] = bad
+        if graph_path:
+            for name, seconds in first_query(graph_path).items():
+                samples.setdefault(name, []).append(seconds)
+    return {name: statistics.median(values) for name, values in samples.items()}, forbidden
+
+
+def compare(baseline: dict[str, float], current: dict[str, float], threshold: float,
+            min_delta: float) -> list[tuple[str, float, float, bool]]:
+    """ Строки (замер, было, стало, регрессия) для замеров, которые есть в обоих запусках """
+    rows = []
+    for name in sorted(baseline.keys() & current.keys()):
+        before, after = baseline[name], current[name]
+        rows.append((name, before, after, after > before * (1 + threshold) and after - before > min_delta))
+    return rows
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Время холодного импорта ядра и первого запроса")
+    parser.add_argument("--graph", help="файл графа для замера первого запроса (.json / .npz)")
+    parser.add_argument("--runs", type=int, default=5, help="количество запусков (берется медиана)")
+    parser.add_argument("-o", "--output", help="сохранить результаты в JSON")
+    parser.add_argument("--baseline", help="сравнить с сохраненными результатами")
+    parser.add_argument("--threshold", type=float, default=0.2, help="допустимое относительное ухудшение")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0,
+                        help="меньшие изменения не считаются регрессией (шум измерений)")
+    args = parser.parse_args()
+
+    results, forbidden = measure(args.graph, args.runs)
+    for name, seconds in results.items():
+        print(f"{name:<50} {seconds * 1000:9.2f} мс")
+    for module, names in forbidden.items():
+        print(f"ОШИБКА: {module} загружает {', '.join(names)}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        for name, before, after, regression in compare(baseline, results, args.threshold, args.min_delta_ms / 1000):
+            mark = 'РЕГРЕССИЯ' if regression else 'ок'
+            print(f"{name:<50} {before * 1000:9.2f} -> {after * 1000:9.2f} мс (x{after / before:.2f}) {mark}")
+            if regression:
+                regressions.append(name)
+    return 1 if forbidden or regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,33 @@
+"""
+Генерация набора запросов для замеров (обертка командной строки над algo.workload).
+
+Запуск из корня репозитория:
+    python -m scripts.workload graph.json --sources 50 --regions 200 --seed 1 -o workload.csv
+"""
+from __future__ import annotations
+
+import argparse
+from collections import Counter
+
+from algo.graph_io import load_graph
+from algo.workload import mixed_workload, save_workload
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Набор запросов по рангу Дейкстры и по регионам")
+    parser.add_argument("graph", help="файл графа .json или .npz")
+    parser.add_argument("--sources", type=int, default=20, help="количество источников для запросов по рангу")
+    parser.add_argument("--regions", type=int, default=0,
+                        help="количество запросов внутри регионов и между регионами (каждого вида)")
+    parser.add_argument("--seed", type=int, default=0, help="зерно выбора вершин")
+    parser.add_argument("-o", "--output", default="workload.csv", help="файл набора запросов .csv")
+    args = parser.parse_args()
+
+    queries = mixed_workload(load_graph(args.graph), args.sources, args.regions, args.seed)
+    save_workload(queries, args.output)
+    kinds = ", ".join(f"{kind}: {count}" for kind, count in Counter(q.kind for q in queries).items())
+    print(f"Сохранено {len(queries)} запросов ({kinds}) в файл '{args.output}'.")
+
+
+if __name__ == '__main__':
+    main()